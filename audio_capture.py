@@ -0,0 +1,243 @@
+
+# audio_capture.py (Long-lived microphone stream with background noise calibration)
+
+import threading
+import queue
+import time
+import collections
+
+# --- Configuration Constants ---
+RING_SECONDS = 5.0 # Recent audio kept for pre-roll and diagnostics
+INITIAL_CALIBRATION_SEC = 1.0 # One-time ambient calibration when the stream opens
+ENERGY_THRESHOLD_FLOOR = 400 # Never trigger below this (the old listen() default)
+DYNAMIC_DAMPING = 0.15 # Same meaning as speech_recognition's dynamic_energy_adjustment_damping
+DYNAMIC_RATIO = 1.5 # Threshold = ambient energy * ratio
+PRE_ROLL_SEC = 0.3 # Audio kept from before speech onset so first syllables aren't clipped
+
+def chunk_rms(chunk: bytes, sample_width: int) -> float:
+    """RMS energy of a PCM chunk (audioop is gone in Python 3.13, so fall back to numpy)."""
+    try:
+        import audioop
+        return float(audioop.rms(chunk, sample_width))
+    except ImportError:
+        import numpy as np
+        samples = np.frombuffer(chunk, dtype={1: np.int8, 2: np.int16, 4: np.int32}[sample_width]).astype(np.float64)
+        return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+class AudioCaptureService:
+    """
+    Keeps one microphone stream open for the life of the app. A reader thread pushes every
+    chunk into a ring buffer and to whoever is currently listening, and keeps the energy
+    threshold calibrated against ambient noise while nobody is speaking. listen_phrase()
+    then costs nothing up front: no reopen, no adjust_for_ambient_noise.
+    """
+    def __init__(self, microphone_factory=None, pause_threshold: float = 0.8):
+        self.microphone_factory = microphone_factory # Returns an sr.Microphone-like source
+        self.pause_threshold = pause_threshold
+        self.energy_threshold = ENERGY_THRESHOLD_FLOOR
+        self.source = None
+        self.sample_rate = None
+        self.sample_width = None
+        self.chunk_size = None
+        self.ring = None
+        self.in_phrase = False # Set while a listener is inside a phrase (calibration pauses)
+        self.stats = {"chunks": 0, "overflows": 0, "phrases": 0}
+        self.last_phrase = None # {"speech_started_at", "ended_at"} (monotonic) of the last phrase returned
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._calibrated = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.error = None
+
+    # --- Lifecycle ---
+    def start(self, timeout: float = 5.0):
+        if self._thread and self._thread.is_alive(): return self
+        self._stop_event.clear(); self.error = None
+        self._thread = threading.Thread(target=self._reader_loop, name="AudioCapture", daemon=True)
+        self._thread.start()
+        self._calibrated.wait(timeout)
+        if self.error: raise self.error
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread: self._thread.join(timeout=2.0)
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _open_source(self):
+        if self.microphone_factory: return self.microphone_factory()
+        import speech_recognition as sr
+        return sr.Microphone()
+
+    def _reader_loop(self):
+        try:
+            source = self._open_source()
+            source.__enter__()
+        except Exception as e:
+            self.error = e; self._calibrated.set(); return
+        self.source = source
+        self.sample_rate, self.sample_width, self.chunk_size = source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK
+        seconds_per_chunk = self.chunk_size / self.sample_rate
+        self.ring = collections.deque(maxlen=max(1, int(RING_SECONDS / seconds_per_chunk)))
+        calibration = []; calibration_chunks = max(1, int(INITIAL_CALIBRATION_SEC / seconds_per_chunk))
+        try:
+            while not self._stop_event.is_set():
+                try: chunk = source.stream.read(self.chunk_size)
+                except OSError: # Input overflow etc.; keep the stream alive
+                    self.stats["overflows"] += 1; continue
+                if not chunk: continue
+                energy = chunk_rms(chunk, self.sample_width)
+                item = (time.monotonic(), chunk, energy)
+                self.stats["chunks"] += 1
+
+                if not self._calibrated.is_set(): # One-time calibration on the first second
+                    calibration.append(energy)
+                    if len(calibration) >= calibration_chunks:
+                        self.energy_threshold = max(ENERGY_THRESHOLD_FLOOR, DYNAMIC_RATIO * sum(calibration) / len(calibration))
+                        print(f"Robot Log: Microphone calibrated, energy threshold {self.energy_threshold:.0f}.")
+                        self._calibrated.set()
+                elif not self.in_phrase and energy < self.energy_threshold: # Track ambient noise continuously
+                    damping = DYNAMIC_DAMPING ** seconds_per_chunk
+                    target = max(ENERGY_THRESHOLD_FLOOR, energy * DYNAMIC_RATIO)
+                    self.energy_threshold = self.energy_threshold * damping + target * (1 - damping)
+
+                with self._lock: # Ring and listeners together, so a new listener's lookback has no gap or overlap
+                    self.ring.append(item)
+                    for q in self._listeners:
+                        try: q.put_nowait(item)
+                        except queue.Full: pass # A stalled listener must not block capture
+        except Exception as e: # Anything else ends capture; listeners see it through self.error
+            self.error = e; print(f"Robot Warning: Microphone capture stopped: {e}")
+            self._calibrated.set()
+        finally:
+            try: source.__exit__(None, None, None)
+            except Exception: pass
+            self.source = None
+
+    # --- Consumer side ---
+    def recent_audio(self, seconds: float) -> bytes:
+        """Last `seconds` of raw audio from the ring buffer."""
+        with self._lock: items = self._recent_items(time.monotonic() - seconds)
+        return b"".join(chunk for _, chunk, _ in items)
+
+    def _recent_items(self, since: float) -> list: # Caller holds _lock
+        if not self.ring: return []
+        return [item for item in self.ring if item[0] >= since]
+
+    def _subscribe(self, maxsize: int, lookback: float = 0.0) -> queue.Queue:
+        """Registers a listener queue, seeded with ring audio captured in the last lookback seconds."""
+        since = time.monotonic() - lookback
+        if self.last_phrase: since = max(since, self.last_phrase["ended_at"]) # Never hear the last phrase twice
+        q = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            for item in self._recent_items(since) if lookback > 0 else (): q.put_nowait(item)
+            self._listeners.append(q)
+        return q
+
+    def _check_running(self):
+        if not self.is_running(): raise self.error or RuntimeError("Microphone capture stopped")
+
+    def wait_for_wake_word(self, spotter, timeout: float = None, vad=None) -> bool:
+        """
+        Feeds the live stream to a wake_word spotter until it fires (True) or timeout passes
+        (False). Nothing is recorded or recognized meanwhile; the idle time and the process
+        CPU used over it are reported to the spotter.
+        """
+        if not self.is_running(): self.start()
+        if vad is not None:
+            vad.configure(self.sample_rate, self.sample_width, lambda: self.energy_threshold)
+            is_speech = vad.is_speech
+        else: is_speech = lambda chunk, energy: energy > self.energy_threshold
+        spotter.configure(self.sample_rate, self.sample_width)
+        q = self._subscribe(int(60 * self.sample_rate / self.chunk_size))
+        started, cpu_started = time.monotonic(), time.process_time()
+        try:
+            while timeout is None or time.monotonic() - started < timeout:
+                try: _, chunk, energy = q.get(timeout=0.25)
+                except queue.Empty:
+                    if not self.is_running(): return False
+                    continue
+                if spotter.feed(chunk, is_speech(chunk, energy)): return True
+            return False
+        finally:
+            with self._lock: self._listeners.remove(q)
+            spotter.note_idle(time.monotonic() - started, time.process_time() - cpu_started)
+
+    def listen_phrase(self, timeout: float = None, phrase_time_limit: float = None, is_speech=None, on_chunk=None, vad=None):
+        """
+        Blocks until a phrase has been spoken and returns (raw bytes, sample_rate, sample_width).
+        Raises TimeoutError if no speech starts within timeout. is_speech(chunk, energy) can
+        replace the energy-threshold test. on_chunk(chunk) sees each phrase chunk as it arrives,
+        so a streaming recognizer can decode while the user is still talking. The last
+        PRE_ROLL_SEC of the ring is replayed first, so speech that started just before the
+        call (e.g. right after the wake word) is still caught with its first syllables.
+        Raises the capture error if the microphone stream dies while waiting.
+
+        With vad (a vad.VoiceActivityDetector) the detector classifies chunks, bursts shorter
+        than its min_speech_sec are discarded instead of being recognized, the end-of-phrase
+        pause adapts to the utterance length, leading/trailing silence is trimmed from the
+        returned audio, and the utterance's endpointing latency is recorded on the detector.
+        """
+        if not self.is_running(): self.start()
+        if vad is not None:
+            vad.configure(self.sample_rate, self.sample_width, lambda: self.energy_threshold)
+            is_speech = vad.is_speech
+        elif is_speech is None:
+            is_speech = lambda chunk, energy: energy > self.energy_threshold
+        seconds_per_chunk = self.chunk_size / self.sample_rate
+        min_speech = vad.min_speech_sec if vad is not None else 0.0
+        q = self._subscribe(int(60 / seconds_per_chunk), PRE_ROLL_SEC)
+        try:
+            pre_roll = collections.deque(maxlen=max(1, int(PRE_ROLL_SEC / seconds_per_chunk)))
+            started = time.monotonic()
+            while True:
+                while True: # Wait for speech onset
+                    remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                    if remaining is not None and remaining <= 0: raise TimeoutError("No speech before timeout")
+                    try: captured_at, chunk, energy = q.get(timeout=min(remaining, 1.0) if remaining is not None else 1.0)
+                    except queue.Empty: self._check_running(); continue
+                    if is_speech(chunk, energy): break
+                    pre_roll.append(chunk)
+
+                self.in_phrase = True; onset_at = captured_at
+                frames = list(pre_roll) + [chunk]; voiced = [False] * len(pre_roll) + [True]
+                phrase_start = time.monotonic(); silence = 0.0; speech_sec = seconds_per_chunk
+                last_speech_at = captured_at; fed = 0
+                while True: # Collect until enough trailing silence or the phrase limit
+                    if on_chunk and speech_sec >= min_speech: # Only confirmed speech reaches the recognizer
+                        for frame in frames[fed:]: on_chunk(frame)
+                        fed = len(frames)
+                    try: captured_at, chunk, energy = q.get(timeout=1.0)
+                    except queue.Empty: self._check_running(); continue
+                    speech = is_speech(chunk, energy)
+                    frames.append(chunk); voiced.append(speech)
+                    if speech: silence = 0.0; speech_sec += seconds_per_chunk; last_speech_at = captured_at
+                    else: silence += seconds_per_chunk
+                    end_silence = vad.end_silence_for(speech_sec) if vad is not None else self.pause_threshold
+                    if silence >= end_silence: break
+                    if phrase_time_limit and time.monotonic() - phrase_start >= phrase_time_limit: break
+                self.in_phrase = False
+                if speech_sec >= min_speech: break
+                vad.rejected_bursts += 1 # Noise burst: back to waiting, nothing was sent on
+                pre_roll.clear()
+
+            if on_chunk:
+                for frame in frames[fed:]: on_chunk(frame)
+            self.stats["phrases"] += 1
+            self.last_phrase = {"speech_started_at": onset_at, "ended_at": time.monotonic()}
+            if vad is not None:
+                pad = int(round(vad.padding_sec / seconds_per_chunk))
+                first = voiced.index(True); last = len(voiced) - 1 - voiced[::-1].index(True)
+                kept = frames[max(0, first - pad):last + 1 + pad]
+                vad.record({"speech_sec": round(speech_sec, 3),
+                            "captured_sec": round(len(frames) * seconds_per_chunk, 3),
+                            "trimmed_sec": round((len(frames) - len(kept)) * seconds_per_chunk, 3),
+                            "endpoint_latency_ms": round((time.monotonic() - last_speech_at) * 1000.0, 1)})
+                frames = kept
+            return b"".join(frames), self.sample_rate, self.sample_width
+        finally:
+            self.in_phrase = False
+            with self._lock: self._listeners.remove(q)
@@ -0,0 +1,293 @@
+
+# bench_e2e.py (Offline end-to-end benchmark: replayed audio/video fixtures, no devices needed)
+#
+# Usage: python bench_e2e.py [--fixtures DIR] [--speed 4] [--sr file|vosk] [--tts-wpm 180]
+#                            [--video clip.mp4 --faces known_faces/] [--json results.json]
+#
+# Drives robot_dialogGPT.assistant_main_cycle() turn by turn from WAV fixtures (or synthetic
+# voiced audio when no fixtures are given) through the real capture/VAD/recognition/intent/
+# handler/TTS path, with a null TTS sink and a stub LLM, and optionally runs the face pipeline
+# over a video file. Runs headless on a CPU-only box. A fixtures DIR holds manifest.json:
+#   [{"wav": "turn1.wav", "transcript": "what time is it", "intent": "time"}, ...]
+# "transcript" feeds the file-based recognizer (--sr file); "intent" is checked when present.
+
+import os
+import sys
+import json
+import math
+import time
+import wave
+import argparse
+import statistics
+import tempfile
+import threading
+
+os.environ.setdefault("LOKI_HEADLESS", "1")
+
+# --- Configuration Constants ---
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHUNK = 1024
+WORD_SEC = 0.35 # Synthetic speech: one voiced burst per word
+WORD_GAP_SEC = 0.08
+LEAD_SILENCE_SEC = 0.3
+TURN_TIMEOUT_SEC = 30.0
+DEFAULT_SCRIPT = [ # Fast paths, slot extraction, and the local AI fallback; nothing needs the network
+    ("what time is it", "time"), ("what is the date today", "date"), ("how are you", "how_are_you"),
+    ("my name is ada", "set_user_name"), ("what is my name", "user_name"), ("i am happy", "feel_happy"),
+    ("what is your favorite color", "favorite_color"), ("sometimes i wonder about life", None),
+    ("tell me something interesting", None), ("what can you do", "help"),
+]
+
+# --- Audio fixtures ---
+def synthesize_utterance(text: str, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Voiced-sounding 16-bit PCM (harmonics of 140 Hz under a per-word envelope)."""
+    import numpy as np
+    pieces = [np.zeros(int(LEAD_SILENCE_SEC * sample_rate))]
+    for _ in text.split():
+        t = np.arange(int(WORD_SEC * sample_rate)) / sample_rate
+        voiced = sum(np.sin(2 * math.pi * 140 * k * t) / k for k in (1, 2, 3))
+        pieces += [voiced * np.sin(math.pi * t / WORD_SEC) * 6000, np.zeros(int(WORD_GAP_SEC * sample_rate))]
+    return np.concatenate(pieces).astype(np.int16).tobytes()
+
+def load_wav(path: str, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Mono 16-bit PCM at sample_rate (stereo is mixed down, other rates linearly resampled)."""
+    import numpy as np
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2: raise ValueError(f"{path}: only 16-bit WAV fixtures are supported")
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).astype(np.float64)
+        if w.getnchannels() > 1: samples = samples.reshape(-1, w.getnchannels()).mean(axis=1)
+        if w.getframerate() != sample_rate:
+            positions = np.arange(0, len(samples), w.getframerate() / sample_rate)
+            samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.int16).tobytes()
+
+def load_script(fixtures_dir: str):
+    """[(transcript, expected_intent, pcm_bytes)] from a fixtures dir, or the synthetic default."""
+    if not fixtures_dir:
+        return [(text, intent, synthesize_utterance(text)) for text, intent in DEFAULT_SCRIPT]
+    with open(os.path.join(fixtures_dir, "manifest.json"), encoding="utf-8") as f: manifest = json.load(f)
+    return [(item.get("transcript", ""), item.get("intent"), load_wav(os.path.join(fixtures_dir, item["wav"])))
+            for item in manifest]
+
+class _FixtureStream:
+    def __init__(self, microphone): self.microphone = microphone
+    def read(self, n: int) -> bytes: return self.microphone.read(n)
+
+class FixtureMicrophone:
+    """
+    sr.Microphone stand-in for AudioCaptureService. Plays low-level room noise until cue()
+    queues an utterance, paced at `speed` x real time so endpointing behaves as it would live.
+    """
+    SAMPLE_RATE = SAMPLE_RATE
+    SAMPLE_WIDTH = SAMPLE_WIDTH
+    CHUNK = CHUNK
+
+    def __init__(self, speed: float = 4.0):
+        import numpy as np
+        self.speed = speed
+        self.stream = None
+        self._pending = b""
+        self._lock = threading.Lock()
+        self._noise = (np.random.default_rng(0).normal(0, 30, CHUNK * 64)).astype(np.int16).tobytes()
+        self._noise_pos = 0
+        self._next_at = None
+
+    def __enter__(self):
+        self.stream = _FixtureStream(self); self._next_at = time.monotonic(); return self
+
+    def __exit__(self, *exc):
+        self.stream = None
+
+    def cue(self, pcm: bytes):
+        with self._lock: self._pending += pcm
+
+    def read(self, n: int) -> bytes:
+        size = n * SAMPLE_WIDTH
+        self._next_at += n / SAMPLE_RATE / self.speed # Pace like a real device
+        delay = self._next_at - time.monotonic()
+        if delay > 0: time.sleep(delay)
+        with self._lock:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+        if len(chunk) < size: # Pad with room noise
+            start = self._noise_pos % (len(self._noise) - size)
+            chunk += self._noise[start:start + size - len(chunk)]; self._noise_pos += size
+        return chunk
+
+# --- Stub local AI ---
+class _StubConversation:
+    stats = {"stub": True}
+    def __len__(self): return 0
+    def report(self): return self.stats
+
+class StubChatModel:
+    """LocalChatModel stand-in: a canned reply streamed word by word with model-like delays."""
+    def __init__(self, first_token_sec: float = 0.15, per_token_sec: float = 0.03):
+        self.first_token_sec = first_token_sec
+        self.per_token_sec = per_token_sec
+        self.tokenizer = None
+        self.last_metrics = None
+
+    def new_conversation(self, token_budget: int = None):
+        return _StubConversation()
+
+    def _words(self, prompt: str):
+        return f"That is an interesting thought about {' '.join(prompt.split()[-2:])}. Tell me more about it.".split()
+
+    def stream(self, state, prompt: str, stop_event=None, metrics=None):
+        from chat_engine import StreamMetrics
+        metrics = self.last_metrics = metrics or StreamMetrics()
+        time.sleep(self.first_token_sec)
+        for i, word in enumerate(self._words(prompt)):
+            if stop_event is not None and stop_event.is_set(): break
+            if i: time.sleep(self.per_token_sec)
+            if metrics.first_token_at is None: metrics.first_token_at = time.monotonic()
+            metrics.pieces += 1
+            yield (" " if i else "") + word
+        metrics.finished_at = time.monotonic()
+
+    def reply(self, state, prompt: str, stop_event=None) -> str:
+        return "".join(self.stream(state, prompt, stop_event))
+
+# --- Benchmarks ---
+def _percentiles(values) -> dict:
+    values = sorted(v for v in values if v is not None)
+    if not values: return {}
+    return {"p50_ms": round(statistics.median(values), 1), "p95_ms": round(values[min(len(values) - 1, int(0.95 * len(values)))], 1),
+            "n": len(values)}
+
+def run_voice_benchmark(robot, script, speed: float, sr_backend: str, tts_wpm: float, stub_llm: bool) -> dict:
+    from speech_backends import create_backend, FileBackend
+    from tts_engine import NullSpeechEngine
+    from gui_channel import GuiCommandChannel
+    from response_cache import ResponseCache
+    from profile_store import ProfileStore
+    from tracing import Tracer
+
+    workdir = tempfile.mkdtemp(prefix="loki_bench_")
+    robot.PROFILE_STORE = ProfileStore(os.path.join(workdir, "profiles.db")) # Never touch the real profiles/cache/trace
+    robot.RESPONSE_CACHE = ResponseCache(os.path.join(workdir, "response_cache.json"))
+    robot.TRACER = Tracer(os.path.join(workdir, "trace.jsonl"))
+    gui = GuiCommandChannel(); robot.set_global_gui_queue(gui)
+    microphone = FixtureMicrophone(speed=speed)
+    engines = []
+    def engine_factory():
+        engine = NullSpeechEngine(words_per_minute=tts_wpm, speed=speed); engines.append(engine); return engine
+    robot.set_device_adapters(microphone_factory=lambda: microphone, tts_engine_factory=engine_factory)
+    robot.set_speech_backend(FileBackend([text for text, _, _ in script]) if sr_backend == "file" else create_backend(sr_backend))
+    if stub_llm:
+        robot.TRANSFORMERS_AVAILABLE = True
+        robot.LOCAL_CHAT_MODEL = StubChatModel(); robot.CONVERSATION_STATE = _StubConversation()
+    robot.TTS_WORKER.start(); robot.AUDIO_CAPTURE.start()
+
+    turns = []; started = time.monotonic()
+    for text, expected_intent, pcm in script:
+        turn_start = time.monotonic()
+        spoken_before = len(engines[0].spoken) if engines else 0
+        microphone.cue(pcm)
+        error = None
+        try: robot.assistant_main_cycle()
+        except Exception as e: error = repr(e)
+        deadline = time.monotonic() + TURN_TIMEOUT_SEC # Let background tasks and speech finish
+        while robot.TASK_RUNNER.in_flight() and time.monotonic() < deadline: time.sleep(0.01)
+        robot.TTS_WORKER.wait_until_idle(timeout=max(0.0, deadline - time.monotonic()))
+        gui.drain() # One GUI "frame" per turn
+
+        phrase = robot.AUDIO_CAPTURE.last_phrase or {}
+        utterance = robot.VOICE_ACTIVITY.utterances[-1] if robot.VOICE_ACTIVITY.utterances else {}
+        speech_end = phrase.get("ended_at", turn_start) - utterance.get("endpoint_latency_ms", 0) / 1000.0
+        replies = engines[0].spoken[spoken_before:] if engines else []
+        match = robot.INTENT_ROUTER.route(text) if text else None
+        turns.append({
+            "transcript": text, "expected_intent": expected_intent,
+            "intent": match.intent.name if match else None,
+            "intent_ok": expected_intent is None or (match is not None and match.intent.name == expected_intent),
+            "response_latency_ms": round((replies[0][0] - speech_end) * 1000.0, 1) if replies else None,
+            "turn_ms": round((time.monotonic() - turn_start) * 1000.0, 1), "error": error,
+        })
+    elapsed = time.monotonic() - started
+
+    robot.TASK_RUNNER.shutdown(timeout=2.0); robot.TTS_WORKER.stop(); robot.AUDIO_CAPTURE.stop(); robot.PROFILE_STORE.close()
+    robot.TRACER.close()
+    return {
+        "turns": len(turns), "errors": sum(1 for t in turns if t["error"]),
+        "intent_accuracy": round(sum(1 for t in turns if t["intent_ok"]) / len(turns), 3) if turns else None,
+        "throughput_turns_per_min": round(len(turns) / elapsed * 60.0, 1) if elapsed else None,
+        "audio_speed": speed, "recognizer": robot.SR_BACKEND.name,
+        "response_latency": _percentiles(t["response_latency_ms"] for t in turns),
+        "stages": robot.TRACER.summary(), "vad": robot.VOICE_ACTIVITY.report(), "gui_channel": gui.report(),
+        "per_turn": turns,
+    }
+
+def run_face_benchmark(video_path: str, faces_dir: str, workers: int) -> dict:
+    try:
+        import cv2
+        import face_pipeline, face_tracker, face_matcher, face_cache
+        import face_recognition
+    except ImportError as e:
+        return {"skipped": f"face stack not installed ({e})"}
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened(): return {"skipped": f"could not open video '{video_path}'"}
+    matcher = face_matcher.FaceMatcher(tolerance=0.55)
+    if faces_dir:
+        def encode(path):
+            encodings = face_recognition.face_encodings(face_recognition.load_image_file(path))
+            return encodings[0] if encodings else None
+        encodings, names = face_cache.FaceEncodingCache(faces_dir).sync(encode)
+        matcher.set_gallery(encodings, names)
+    tracker = face_tracker.FaceTracker()
+    pipeline = face_pipeline.FaceCapturePipeline(capture, workers=workers, tracker=tracker)
+    latencies = []; matches = {}; results = 0; started = time.monotonic()
+    pipeline.start()
+    try:
+        idle_since = None
+        while True:
+            result = pipeline.results(timeout=0.1)
+            if result is None:
+                if pipeline.capture_failed: # End of the clip: wait briefly for the last detections
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since > 2.0: break
+                continue
+            idle_since = None; results += 1
+            latencies.append((time.monotonic() - result["captured_at"]) * 1000.0)
+            if result["encodings"] and len(matcher):
+                for name, _ in matcher.match_batch(result["encodings"]):
+                    if name: matches[name] = matches.get(name, 0) + 1
+        report = pipeline.report()
+    finally:
+        pipeline.stop(); capture.release(); face_pipeline.shutdown_detect_executor()
+    elapsed = time.monotonic() - started
+    return {"frames_out": results, "frames_per_sec": round(results / elapsed, 1) if elapsed else None,
+            "frame_latency": _percentiles(latencies), "matches": matches, "pipeline": report}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay audio/video fixtures through Loki and report latency per stage.")
+    parser.add_argument("--fixtures", help="Directory with manifest.json and WAV files (default: synthetic speech)")
+    parser.add_argument("--speed", type=float, default=4.0, help="Audio replay speed (x real time)")
+    parser.add_argument("--sr", default="file", help="Recognizer: file (manifest transcripts), vosk, google, auto")
+    parser.add_argument("--tts-wpm", type=float, default=180.0, help="Null TTS speaking rate; 0 = instant")
+    parser.add_argument("--real-llm", action="store_true", help="Load the configured local model instead of the stub")
+    parser.add_argument("--video", help="Video file to run the face pipeline over")
+    parser.add_argument("--faces", help="known_faces directory for matching in the video benchmark")
+    parser.add_argument("--face-workers", type=int, default=2)
+    parser.add_argument("--json", help="Also write the full results here")
+    args = parser.parse_args()
+
+    import robot_dialogGPT as robot
+    if args.real_llm: robot.initialize_local_ai_model()
+    results = {"voice": run_voice_benchmark(robot, load_script(args.fixtures), args.speed, args.sr,
+                                            args.tts_wpm or None, stub_llm=not args.real_llm)}
+    results["faces"] = run_face_benchmark(args.video, args.faces, args.face_workers) if args.video else {"skipped": "no --video"}
+
+    voice = results["voice"]
+    print(f"\nVoice: {voice['turns']} turns, {voice['errors']} errors, intent accuracy {voice['intent_accuracy']}, "
+          f"{voice['throughput_turns_per_min']} turns/min at {voice['audio_speed']}x audio ({voice['recognizer']})")
+    print(f"Response latency (end of speech -> first reply audio): {voice['response_latency']}")
+    for stage, s in voice["stages"].items(): print(f"  {stage:<12} {s}")
+    print(f"Faces: {results['faces']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+    return 1 if voice["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+
+# bench_intents.py (Timing for the voice command router)
+#
+# Usage: python bench_intents.py [--iterations 2000]
+# Times robot_dialogGPT.INTENT_ROUTER against the old elif chain over the command table in
+# tests/test_intent_router.py (which is where routing correctness is checked: pytest tests).
+
+import sys
+import time
+import argparse
+
+import robot_dialogGPT as robot
+from tests.test_intent_router import INTENT_CASES
+
+def legacy_route(command: str):
+    """The pre-router elif chain's branch selection, kept here only as a timing baseline."""
+    if command == "what is your name": return "bot_name"
+    elif "my name is" in command: return "set_user_name"
+    elif "what is my name" in command or "who am i" in command: return "user_name"
+    elif "open youtube" in command: return "open_youtube"
+    elif "search google for" in command: return "search_google"
+    elif "play song" in command or ("play" in command and "on youtube" in command): return "play_song"
+    elif "time" in command: return "time"
+    elif "date" in command: return "date"
+    elif "who is" in command or "what is" in command or "tell me about" in command: return "wikipedia"
+    elif "send whatsapp message" in command: return "whatsapp"
+    elif "ask for a kiss" in command or "give me a kiss" in command: return "kiss"
+    elif "how are you" in command: return "how_are_you"
+    elif "tell me a joke" in command or "joke" in command: return "joke"
+    elif "i am sad" in command or "i feel sad" in command: return "feel_sad"
+    elif "i am happy" in command or "i feel happy" in command: return "feel_happy"
+    elif "i am angry" in command: return "feel_angry"
+    elif "what is your favorite color" in command or "what's your favorite color" in command: return "favorite_color"
+    elif "what can you do" in command or "help" == command.strip(): return "help"
+    elif "shutdown system" in command: return "shutdown"
+    elif "restart system" in command: return "restart"
+    elif "exit" in command or "stop" in command or "goodbye" in command: return "exit"
+    return None
+
+def time_router(route, iterations: int) -> float:
+    """Microseconds per command over the whole case table."""
+    commands = [case[0] for case in INTENT_CASES]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for command in commands: route(command)
+    return (time.perf_counter() - start) / (iterations * len(commands)) * 1e6
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time the voice command intent router.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    changed = sum(1 for command, expected, _ in INTENT_CASES if legacy_route(command) != expected
+                  and not (expected == "help_exact" and legacy_route(command) == "help"))
+    print(f"{len(INTENT_CASES)} commands, {changed} routed differently by the old elif chain.")
+
+    compiled_us = time_router(robot.INTENT_ROUTER.route, args.iterations)
+    legacy_us = time_router(legacy_route, args.iterations)
+    print(f"Routing cost per command: compiled router {compiled_us:.1f} us, old elif chain {legacy_us:.1f} us "
+          f"({len(robot.INTENT_ROUTER.intents)} intents).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
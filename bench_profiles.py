@@ -0,0 +1,81 @@
+
+# bench_profiles.py (Profile store lookup, sighting and flush costs with thousands of enrolled users)
+#
+# Usage: python bench_profiles.py [--users 5000] [--lookups 2000] [--max-lookup-ms 1.0]
+#
+# Enrolls synthetic users with face references in a temporary database, then measures what the
+# face loop pays: recognized face -> profile (cold: indexed SELECT, warm: cache), touch() per
+# sighting, and the batched write-behind flush. The old memory.txt read is timed for reference.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from profile_store import ProfileStore
+
+def _percentiles(samples_ms) -> dict:
+    values = sorted(samples_ms)
+    return {"p50_ms": round(statistics.median(values), 4), "p95_ms": round(values[int(0.95 * (len(values) - 1))], 4),
+            "max_ms": round(values[-1], 4)}
+
+def _time_each(func, args) -> dict:
+    samples = []
+    for a in args:
+        started = time.perf_counter(); func(a); samples.append((time.perf_counter() - started) * 1000.0)
+    return _percentiles(samples)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure profile store lookups with many enrolled users.")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--max-lookup-ms", type=float, help="Fail if the cold face -> profile p95 is slower")
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="loki_profiles_")
+    path = os.path.join(workdir, "profiles.db")
+    rng = random.Random(7)
+    faces = [(f"user_{i:06d}.jpg", f"User {i:06d}", f"{rng.getrandbits(160):040x}") for i in range(args.users)]
+    results = {"users": args.users}
+
+    store = ProfileStore(path, write_behind_sec=60.0) # Flushed explicitly below
+    started = time.perf_counter(); store.sync_faces(faces); results["enroll_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    started = time.perf_counter(); store.flush(); results["enroll_flush_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    store.close()
+
+    store = ProfileStore(path, cache_size=args.lookups) # Fresh process view: nothing cached yet
+    picks = [rng.choice(faces)[0] for _ in range(args.lookups)]
+    unique = list(dict.fromkeys(picks))
+    results["cold_face_lookup"] = _time_each(store.for_face, unique)
+    results["warm_face_lookup"] = _time_each(store.for_face, picks)
+    results["touch"] = _time_each(lambda face: store.touch(store.for_face(face)["name"]), picks)
+    started = time.perf_counter(); store.flush(); results["touch_flush_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    results["touch_rows_per_flush"] = len(unique)
+    results["user_count"] = store.user_count()
+    store.close()
+
+    memory_file = os.path.join(workdir, "memory.txt")
+    with open(memory_file, "w") as f: f.write("Ada")
+    def legacy_load(_):
+        with open(memory_file) as f: return f.read().strip()
+    results["legacy_memory_txt_read"] = _time_each(legacy_load, range(args.lookups))
+
+    print(f"Enrolled {args.users} users with face references: {results['enroll_ms']} ms in memory, "
+          f"{results['enroll_flush_ms']} ms to write.")
+    for key in ("cold_face_lookup", "warm_face_lookup", "touch", "legacy_memory_txt_read"):
+        print(f"  {key}: {results[key]}")
+    print(f"  {results['touch_rows_per_flush']} touched profiles written in one flush: {results['touch_flush_ms']} ms.")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+    failed = results["user_count"] != args.users or \
+             (args.max_lookup_ms is not None and results["cold_face_lookup"]["p95_ms"] > args.max_lookup_ms)
+    print("FAIL" if failed else "OK")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+
+# bench_startup.py (Cold-start regression benchmark for robot_dialogGPT.py)
+#
+# Usage: python bench_startup.py [--runs 5] [--budget 1.0]
+# Exits with status 1 if the median cold import of robot_dialogGPT exceeds the budget,
+# so it can gate CI. Also prints the slowest modules from `-X importtime`, per subsystem.
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+DEFAULT_BUDGET_SEC = float(os.environ.get("LOKI_STARTUP_BUDGET", "1.0"))
+SUBSYSTEM_PREFIXES = { # Top-level package -> subsystem, for grouping -X importtime output
+    "speech_recognition": "speech", "pyaudio": "speech", "vosk": "speech", "pyttsx3": "tts",
+    "cv2": "faces", "face_recognition": "faces", "dlib": "faces", "numpy": "faces",
+    "transformers": "local_ai", "torch": "local_ai", "tokenizers": "local_ai",
+    "pywhatkit": "web", "wikipedia": "web", "requests": "web", "bs4": "web", "pyjokes": "fun",
+}
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\S.*)$")
+
+def cold_import_once() -> tuple:
+    """Imports robot_dialogGPT in a fresh interpreter; returns (wall seconds, importtime stderr)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import robot_dialogGPT"],
+                          cwd=here, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import robot_dialogGPT failed:\n{proc.stderr[-2000:]}")
+    return elapsed, proc.stderr
+
+def subsystem_totals(importtime_output: str) -> dict:
+    """Self time (ms) per subsystem from -X importtime output; unknown packages go to 'other'."""
+    totals = {}
+    for line in importtime_output.splitlines():
+        m = IMPORTTIME_RE.search(line)
+        if not m: continue
+        self_us, module = int(m.group(1)), m.group(3).strip()
+        subsystem = SUBSYSTEM_PREFIXES.get(module.split(".")[0], "other")
+        totals[subsystem] = totals.get(subsystem, 0.0) + self_us / 1000.0
+    return {k: round(v, 1) for k, v in sorted(totals.items(), key=lambda kv: -kv[1])}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fail if robot_dialogGPT cold start exceeds a time budget.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SEC, help="Max median seconds")
+    args = parser.parse_args()
+
+    timings = []; last_output = ""
+    for _ in range(args.runs):
+        elapsed, last_output = cold_import_once()
+        timings.append(elapsed)
+    median = statistics.median(timings)
+    print(f"Cold import of robot_dialogGPT: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s "
+          f"over {args.runs} runs (budget {args.budget:.3f}s)")
+    print(f"Import self-time by subsystem (ms): {subsystem_totals(last_output)}")
+    if median > args.budget:
+        print("FAIL: cold start is over budget."); return 1
+    print("OK"); return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+
+# bench_wake_word.py (False-accept / false-reject rates and idle CPU of the wake word gate)
+#
+# Usage: python bench_wake_word.py [--fixtures DIR] [--spotter template|vosk] [--sensitivities 0.2,0.35,0.5,0.65,0.8]
+#                                  [--idle-sec 5] [--max-frr 0.2] [--max-fa-per-hour 2]
+#
+# A fixtures DIR holds manifest.json, [{"wav": "clip.wav", "wake": true}, ...], and a templates/
+# folder of wake word recordings for the template spotter. Without fixtures, clips are made by a
+# small formant synthesizer: "loki" from several synthetic speakers, plus near misses
+# ("lucky", "low key", "local"...), other commands and noise. Each clip is streamed chunk by
+# chunk through the VAD and the spotter, exactly as AudioCaptureService.wait_for_wake_word does.
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+import wake_word
+from vad import VoiceActivityDetector
+from audio_capture import chunk_rms
+
+# --- Configuration Constants ---
+SAMPLE_RATE = 16000
+CHUNK = 1024
+ENERGY_THRESHOLD = 400 # Stands in for the capture service's calibrated threshold
+TRAILING_SILENCE_SEC = 0.8 # Appended to each clip so the spotter sees the segment end
+# Synthetic speakers: (pitch factor, tempo factor, noise level); enrollment and test speakers differ
+ENROLL_SPEAKERS = [(1.0, 1.0, 20), (0.85, 1.1, 20), (1.2, 0.9, 20)]
+TEST_SPEAKERS = [(0.95, 1.05, 40), (1.1, 0.95, 60), (0.8, 1.15, 40), (1.3, 0.85, 80), (1.05, 1.2, 120), (0.9, 0.8, 60)]
+POSITIVE_PHRASES = ["loki", "hey loki", "loki what time is it", "loki tell me a joke"]
+NEGATIVE_PHRASES = ["lucky", "low key", "local", "look", "okay", "hello", "what time is it", "tell me a joke",
+                    "open youtube", "i am happy", "lock it", "cookie", "loading", "rocky", "good morning",
+                    "play some music", "what is the date today", "see you later", "coffee", "lucky day"]
+
+# --- Formant synthesizer ---
+VOWEL_FORMANTS = {"a": (730, 1090), "e": (530, 1840), "i": (270, 2290), "o": (570, 840), "u": (300, 870), "y": (270, 2290)}
+VOICED_CONSONANTS = {"l": (360, 1300), "m": (280, 1000), "n": (280, 1600), "r": (420, 1300), "w": (300, 700), "v": (300, 1400),
+                     "b": (300, 900), "d": (300, 1700), "g": (300, 1900), "j": (280, 2100), "z": (300, 1600)}
+NOISE_CONSONANTS = {"s": 5500, "f": 4500, "h": 1500, "c": 3000, "k": 2500, "t": 4000, "p": 1200, "q": 2500, "x": 4000}
+
+def synthesize_phrase(text: str, speaker, rng, sample_rate: int = SAMPLE_RATE):
+    """Crude formant speech: vowels and voiced consonants as harmonic spectra, others as noise bursts."""
+    pitch, tempo, noise = speaker
+    f0 = 130.0 * pitch
+    pieces = [rng.normal(0, noise, int(0.3 * sample_rate))]
+    for word in text.split():
+        for letter in word:
+            if letter in VOWEL_FORMANTS or letter in VOICED_CONSONANTS:
+                duration = (0.14 if letter in VOWEL_FORMANTS else 0.07) * tempo
+                f1, f2 = VOWEL_FORMANTS.get(letter) or VOICED_CONSONANTS[letter]
+                f1, f2 = f1 * (0.9 + 0.1 * pitch), f2 * (0.9 + 0.1 * pitch)
+                t = np.arange(int(duration * sample_rate)) / sample_rate
+                vibrato = f0 * (1 + 0.02 * np.sin(2 * np.pi * 5 * t))
+                phase = 2 * np.pi * np.cumsum(vibrato) / sample_rate
+                signal = np.zeros_like(t)
+                for k in range(1, int(4000 / f0)):
+                    gain = sum(1.0 / (1.0 + ((k * f0 - f) / 90.0) ** 2) for f in (f1, f2)) + 0.02
+                    signal += gain * np.sin(k * phase)
+                level = 7000 if letter in VOWEL_FORMANTS else 3500
+                pieces.append(signal / max(1e-9, np.abs(signal).max()) * level * np.hanning(len(t)) ** 0.3)
+            elif letter in NOISE_CONSONANTS:
+                n = int(0.06 * tempo * sample_rate)
+                burst = rng.normal(0, 1, n)
+                spectrum = np.fft.rfft(burst); freqs = np.fft.rfftfreq(n, 1 / sample_rate)
+                spectrum *= np.exp(-((freqs - NOISE_CONSONANTS[letter]) / 800.0) ** 2)
+                burst = np.fft.irfft(spectrum, n)
+                pieces.append(burst / max(1e-9, np.abs(burst).max()) * 2500 * np.hanning(n))
+        pieces.append(np.zeros(int(0.09 * tempo * sample_rate)))
+    audio = np.concatenate(pieces)
+    return audio + rng.normal(0, noise, len(audio))
+
+def synthetic_fixtures(seed: int = 7):
+    """(templates, [(name, samples, is_wake)]) at SAMPLE_RATE."""
+    rng = np.random.default_rng(seed)
+    templates = [(synthesize_phrase("loki", speaker, rng), SAMPLE_RATE) for speaker in ENROLL_SPEAKERS]
+    clips = [(f"{phrase} #{i}", synthesize_phrase(phrase, speaker, rng), True)
+             for phrase in POSITIVE_PHRASES for i, speaker in enumerate(TEST_SPEAKERS)]
+    clips += [(f"{phrase} #{i}", synthesize_phrase(phrase, speaker, rng), False)
+              for phrase in NEGATIVE_PHRASES for i, speaker in enumerate(TEST_SPEAKERS)]
+    clips += [(f"noise #{i}", rng.normal(0, 300 * (i + 1), SAMPLE_RATE * 2), False) for i in range(3)]
+    return templates, clips
+
+def load_fixtures(fixtures_dir: str):
+    with open(os.path.join(fixtures_dir, "manifest.json"), encoding="utf-8") as f: manifest = json.load(f)
+    clips = []
+    for item in manifest:
+        samples, rate = wake_word.load_wav_samples(os.path.join(fixtures_dir, item["wav"]))
+        clips.append((item["wav"], wake_word._resample(samples, rate, SAMPLE_RATE), bool(item["wake"])))
+    return wake_word.load_templates(os.path.join(fixtures_dir, "templates")), clips
+
+# --- Streaming evaluation ---
+def _chunks(samples):
+    pcm = np.clip(np.concatenate([samples, np.zeros(int(TRAILING_SILENCE_SEC * SAMPLE_RATE))]), -32768, 32767).astype(np.int16)
+    for i in range(0, len(pcm) - CHUNK + 1, CHUNK): yield pcm[i:i + CHUNK].tobytes()
+
+def run_clip(spotter, vad, samples) -> bool:
+    spotter.reset(); fired = False
+    for chunk in _chunks(samples):
+        fired = spotter.feed(chunk, vad.is_speech(chunk, chunk_rms(chunk, 2))) or fired
+    return fired
+
+def evaluate(spotter, vad, clips) -> dict:
+    positives = [c for c in clips if c[2]]; negatives = [c for c in clips if not c[2]]
+    started = time.thread_time()
+    misses = [name for name, samples, _ in positives if not run_clip(spotter, vad, samples)]
+    false_accepts = [name for name, samples, _ in negatives if run_clip(spotter, vad, samples)]
+    cpu = time.thread_time() - started
+    audio_sec = sum(len(samples) / SAMPLE_RATE + TRAILING_SILENCE_SEC for _, samples, _ in clips)
+    negative_hours = sum(len(samples) / SAMPLE_RATE + TRAILING_SILENCE_SEC for _, samples, _ in negatives) / 3600.0
+    return {"sensitivity": spotter.sensitivity, "frr": round(len(misses) / len(positives), 3) if positives else None,
+            "false_accepts": len(false_accepts), "fa_per_hour": round(len(false_accepts) / negative_hours, 1) if negative_hours else None,
+            "cpu_per_audio_sec_ms": round(1000.0 * cpu / audio_sec, 2), "misses": misses, "false_accept_clips": false_accepts}
+
+def measure_idle(spotter, seconds: float) -> dict:
+    """Live idle cost: the real capture service waiting for the wake word on room noise (fixture microphone)."""
+    from audio_capture import AudioCaptureService
+    from bench_e2e import FixtureMicrophone
+    capture = AudioCaptureService(lambda: FixtureMicrophone(speed=1.0)).start()
+    try:
+        vad = VoiceActivityDetector()
+        spotter.stats.update(idle_wall_sec=0.0, idle_process_cpu_sec=0.0)
+        fired = capture.wait_for_wake_word(spotter, timeout=seconds, vad=vad)
+    finally: capture.stop()
+    report = spotter.report()
+    return {"seconds": seconds, "triggered": fired, "idle_process_cpu_percent": report["idle_process_cpu_percent"],
+            "note": "whole process (capture thread, VAD, spotter) while waiting on room noise"}
+
+def make_spotter(kind: str, templates, sensitivity: float):
+    if kind == "vosk": return wake_word.VoskWakeWord(sensitivity=sensitivity)
+    return wake_word.TemplateWakeWord(templates, sensitivity=sensitivity)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure wake word false accepts, false rejects and idle CPU.")
+    parser.add_argument("--fixtures", help="Directory with manifest.json, WAV clips and templates/ (default: synthetic)")
+    parser.add_argument("--spotter", default="template", choices=("template", "vosk"))
+    parser.add_argument("--sensitivities", default="0.2,0.35,0.5,0.65,0.8")
+    parser.add_argument("--idle-sec", type=float, default=5.0, help="Seconds of live idle measurement (0 to skip)")
+    parser.add_argument("--max-frr", type=float, help="Fail if the default sensitivity misses more than this share")
+    parser.add_argument("--max-fa-per-hour", type=float, help="Fail if the default sensitivity false-accepts more often")
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    templates, clips = load_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures()
+    print(f"Clips: {sum(1 for c in clips if c[2])} wake, {sum(1 for c in clips if not c[2])} other "
+          f"({'fixtures' if args.fixtures else 'synthetic'}); {len(templates)} templates; spotter {args.spotter}.")
+    vad = VoiceActivityDetector(); vad.configure(SAMPLE_RATE, 2, lambda: ENERGY_THRESHOLD)
+    rows = []
+    for sensitivity in [float(s) for s in args.sensitivities.split(",")]:
+        spotter = make_spotter(args.spotter, templates, sensitivity); spotter.configure(SAMPLE_RATE, 2)
+        row = evaluate(spotter, vad, clips); rows.append(row)
+        print(f"  sensitivity {sensitivity:.2f}: FRR {row['frr']:.3f}, {row['false_accepts']} false accepts "
+              f"({row['fa_per_hour']}/h of other audio), detector CPU {row['cpu_per_audio_sec_ms']} ms per audio second")
+    idle = None
+    if args.idle_sec > 0:
+        idle = measure_idle(make_spotter(args.spotter, templates, wake_word.WAKE_SENSITIVITY), args.idle_sec)
+        print(f"Idle: {idle['idle_process_cpu_percent']}% process CPU over {args.idle_sec:.0f}s waiting on room noise.")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump({"rows": rows, "idle": idle}, f, indent=2)
+
+    default = min(rows, key=lambda r: abs(r["sensitivity"] - wake_word.WAKE_SENSITIVITY))
+    failed = (args.max_frr is not None and default["frr"] > args.max_frr) or \
+             (args.max_fa_per_hour is not None and default["fa_per_hour"] > args.max_fa_per_hour)
+    if default["misses"]: print(f"  Missed at {default['sensitivity']}: {', '.join(default['misses'][:8])}")
+    if default["false_accept_clips"]: print(f"  False accepts at {default['sensitivity']}: {', '.join(default['false_accept_clips'][:8])}")
+    print("FAIL" if failed else "OK")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
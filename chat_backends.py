@@ -0,0 +1,128 @@
+
+# chat_backends.py (Inference backends for the local chat model + a comparison benchmark)
+#
+# Usage: python chat_backends.py [--model microsoft/DialoGPT-medium] [--threads 4] [--backends pytorch-fp32,pytorch-int8,onnxruntime]
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# --- Backend names ---
+BACKEND_FP32 = "pytorch-fp32" # Full precision, what initialize_local_ai_model always loaded
+BACKEND_INT8 = "pytorch-int8" # Dynamic int8 quantization of the linear layers
+BACKEND_ONNX = "onnxruntime" # Exported ONNX graph run by ONNX Runtime (needs optimum[onnxruntime])
+CHAT_BACKENDS = (BACKEND_FP32, BACKEND_INT8, BACKEND_ONNX)
+
+DEFAULT_MODEL_NAME = "microsoft/DialoGPT-medium"
+BENCHMARK_PROMPTS = ["Hello, how are you today?", "What do you like to do for fun?",
+                     "Tell me something interesting.", "Do you like music?"]
+
+def _conv1d_to_linear(model):
+    """
+    GPT-2 family models use transformers' Conv1D for their projections, which quantize_dynamic
+    does not recognise. Swap each one for an equivalent nn.Linear (transposed weight) first.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+    for parent in list(model.modules()):
+        for child_name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, child_name, linear)
+    return model
+
+def load_chat_backend(backend: str = BACKEND_FP32, model_name: str = DEFAULT_MODEL_NAME, num_threads: int = None):
+    """Returns (model, tokenizer) for the chosen backend. Raises ImportError if its packages are missing."""
+    if backend not in CHAT_BACKENDS:
+        raise ValueError(f"Unknown chat backend '{backend}'. Choose one of: {', '.join(CHAT_BACKENDS)}")
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == BACKEND_ONNX:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForCausalLM
+        session_options = onnxruntime.SessionOptions()
+        if num_threads:
+            session_options.intra_op_num_threads = num_threads
+            session_options.inter_op_num_threads = 1
+        model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True,
+                                                    session_options=session_options, provider="CPUExecutionProvider")
+        return model, tokenizer
+
+    import torch
+    from transformers import AutoModelForCausalLM
+    if num_threads: torch.set_num_threads(num_threads)
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    model.eval()
+    if backend == BACKEND_INT8:
+        model = torch.quantization.quantize_dynamic(_conv1d_to_linear(model), {torch.nn.Linear}, dtype=torch.qint8)
+    return model, tokenizer
+
+# --- Benchmark ---
+def _peak_rss_mb():
+    try:
+        import resource # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError: # Windows
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except (ImportError, AttributeError): return None
+
+def benchmark_one_backend(backend: str, model_name: str = DEFAULT_MODEL_NAME, num_threads: int = None,
+                          prompts=BENCHMARK_PROMPTS, max_new_tokens: int = 40) -> dict:
+    """Load time, greedy tokens/second over a short conversation, and peak RSS of this process."""
+    from chat_engine import LocalChatModel, ConversationState
+    start = time.perf_counter()
+    model, tokenizer = load_chat_backend(backend, model_name, num_threads)
+    load_time = time.perf_counter() - start
+
+    chat = LocalChatModel(model, tokenizer, {"do_sample": False, "max_new_tokens": max_new_tokens,
+                                             "temperature": None, "top_p": None})
+    state = ConversationState(tokenizer)
+    chat.reply(state, "Hi!") # Warm-up turn, not timed
+    generated = 0; gen_time = 0.0
+    for prompt in prompts:
+        start = time.perf_counter()
+        chat.reply(state, prompt)
+        gen_time += time.perf_counter() - start
+        generated += len(state.turns[-1][1]) # Reply tokens of this turn
+    return {"backend": backend, "load_time_s": round(load_time, 2),
+            "tokens_per_s": round(generated / gen_time, 1) if gen_time else None,
+            "peak_rss_mb": _peak_rss_mb(), "threads": num_threads}
+
+def compare_backends(backends=CHAT_BACKENDS, model_name: str = DEFAULT_MODEL_NAME, num_threads: int = None):
+    """Runs each backend in a fresh interpreter so load time and peak RSS aren't polluted by the others."""
+    results = []
+    for backend in backends:
+        cmd = [sys.executable, os.path.abspath(__file__), "--single", backend, "--model", model_name]
+        if num_threads: cmd += ["--threads", str(num_threads)]
+        proc = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+        if proc.returncode == 0 and lines: results.append(json.loads(lines[-1]))
+        else: results.append({"backend": backend, "error": (proc.stderr.strip().splitlines() or ["failed"])[-1]})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare local chat model inference backends.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--backends", default=",".join(CHAT_BACKENDS))
+    parser.add_argument("--single", help=argparse.SUPPRESS) # Internal: run one backend and print JSON
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(benchmark_one_backend(args.single, args.model, args.threads)))
+        sys.exit(0)
+
+    print(f"{'backend':<14} {'load s':>8} {'tok/s':>8} {'peak MB':>9}")
+    for r in compare_backends(args.backends.split(","), args.model, args.threads):
+        if "error" in r: print(f"{r['backend']:<14} error: {r['error']}")
+        else: print(f"{r['backend']:<14} {r['load_time_s']:>8} {r['tokens_per_s']:>8} {r['peak_rss_mb']:>9}")
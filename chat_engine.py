@@ -0,0 +1,220 @@
+
+# chat_engine.py (Token-streaming replies from the local DialoGPT model)
+
+import re
+import threading
+import time
+
+# --- Configuration Constants ---
+GENERATION_KWARGS = {"max_new_tokens": 75, "no_repeat_ngram_size": 3, "temperature": 0.7,
+                     "top_p": 0.9, "do_sample": True} # Same settings ask_local_model always used
+PHRASE_END_RE = re.compile(r"[.!?;:,]$")
+MIN_PHRASE_WORDS = 3 # Don't hand TTS a single word unless the reply ends there
+MAX_PHRASE_WORDS = 12 # Flush long unpunctuated runs so speech keeps flowing
+HISTORY_TOKEN_BUDGET = 512 # DialoGPT's window is 1024; keep history well inside it with room to generate
+HISTORY_TRUNCATE_TO = 0.5 # Over budget, drop old turns down to this fraction of it so later turns reuse the cache
+
+class StreamMetrics:
+    """Timings for one streamed reply (monotonic seconds)."""
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.first_token_at = None
+        self.first_phrase_at = None
+        self.finished_at = None
+        self.pieces = 0 # Decoded text chunks from the streamer (roughly words)
+
+    def as_dict(self) -> dict:
+        def since_start(t): return round(t - self.started_at, 3) if t else None
+        return {"time_to_first_token": since_start(self.first_token_at),
+                "time_to_first_phrase": since_start(self.first_phrase_at),
+                "total_time": since_start(self.finished_at), "pieces": self.pieces}
+
+def group_phrases(pieces, metrics: StreamMetrics = None):
+    """Groups streamed text pieces into speakable phrases (punctuation or word-count boundaries)."""
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        words = buffer.split()
+        if (len(words) >= MIN_PHRASE_WORDS and PHRASE_END_RE.search(buffer.rstrip())) or len(words) >= MAX_PHRASE_WORDS:
+            if metrics and metrics.first_phrase_at is None: metrics.first_phrase_at = time.monotonic()
+            yield buffer.strip(); buffer = ""
+    if buffer.strip():
+        if metrics and metrics.first_phrase_at is None: metrics.first_phrase_at = time.monotonic()
+        yield buffer.strip()
+
+class ConversationState:
+    """
+    Tokenized DialoGPT history plus the model's key/value cache for it.
+    Turns are kept as token-id lists (each ending in EOS); once the history would exceed
+    token_budget the oldest exchanges are dropped, down to HISTORY_TRUNCATE_TO of the budget,
+    so per-turn cost stays flat. The KV cache is reused whenever the history it was built from
+    is still an exact prefix of the next input; dropping a big step at once means only one turn
+    in several pays for re-encoding the shifted window, not every turn at the budget.
+    """
+    def __init__(self, tokenizer, token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.tokenizer = tokenizer
+        self.token_budget = token_budget
+        self.turns = [] # [(role, [token ids])], role is "user" or "bot"
+        self.cache = None # past_key_values covering cached_ids
+        self.cached_ids = []
+        self.stats = {"turns": 0, "truncations": 0, "dropped_turns": 0, "cache_hits": 0, "cache_misses": 0,
+                      "prefill_tokens": 0} # prefill_tokens: input tokens encoded without the cache
+
+    def __len__(self):
+        return sum(len(ids) for _, ids in self.turns)
+
+    def reset(self):
+        self.turns = []; self.cache = None; self.cached_ids = []
+
+    def _encode_turn(self, text: str):
+        return self.tokenizer.encode(text + self.tokenizer.eos_token)
+
+    def _truncate(self):
+        if len(self) <= self.token_budget: return
+        target = int(self.token_budget * HISTORY_TRUNCATE_TO); self.stats["truncations"] += 1
+        while len(self) > target and len(self.turns) > 1:
+            self.turns.pop(0); self.stats["dropped_turns"] += 1 # Sliding window: oldest turn goes first
+            if self.turns and self.turns[0][0] == "bot": self.turns.pop(0); self.stats["dropped_turns"] += 1 # Always start on a user turn
+
+    def seed(self, exchanges):
+        """Starts the history from earlier (prompt, reply) pairs, e.g. a returning user's summary."""
+        self.reset()
+        for prompt, reply in exchanges:
+            self.turns += [("user", self._encode_turn(prompt)), ("bot", self._encode_turn(reply))]
+        self._truncate()
+
+    def prepare(self, prompt: str):
+        """Appends the user turn, enforces the budget and returns (input id list, reusable cache or None)."""
+        self.turns.append(("user", self._encode_turn(prompt)))
+        self._truncate()
+        input_ids = [t for _, ids in self.turns for t in ids]
+        n = len(self.cached_ids)
+        if self.cache is not None and 0 < n < len(input_ids) and input_ids[:n] == self.cached_ids:
+            self.stats["cache_hits"] += 1; self.stats["prefill_tokens"] += len(input_ids) - n
+            return input_ids, self.cache
+        if len(self.turns) > 1: self.stats["cache_misses"] += 1 # Window moved (or no cache): history re-encoded
+        self.stats["prefill_tokens"] += len(input_ids)
+        self.cache = None; self.cached_ids = []
+        return input_ids, None
+
+    def report(self) -> dict:
+        lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        return dict(self.stats, history_tokens=len(self),
+                    cache_hit_rate=round(self.stats["cache_hits"] / lookups, 3) if lookups else None)
+
+    def commit(self, input_ids, output_ids, past_key_values):
+        """Records the generated reply (ids after input_ids) and the cache that now covers it."""
+        reply_ids = list(output_ids[len(input_ids):])
+        eos = self.tokenizer.eos_token_id
+        if eos in reply_ids: reply_ids = reply_ids[:reply_ids.index(eos) + 1]
+        else: reply_ids.append(eos) # Hit max_new_tokens; history still needs the separator
+        self.turns.append(("bot", reply_ids))
+        self.stats["turns"] += 1
+        # Only Cache objects can be resumed from an arbitrary prefix; legacy tuples are dropped
+        self.cache = past_key_values if hasattr(past_key_values, "get_seq_length") else None
+        self.cached_ids = list(output_ids) if self.cache is not None else []
+        return self.tokenizer.decode(reply_ids, skip_special_tokens=True).strip()
+
+    def abandon_turn(self):
+        """Drops a user turn whose generation failed, and the (possibly half-updated) cache."""
+        if self.turns and self.turns[-1][0] == "user": self.turns.pop()
+        self.cache = None; self.cached_ids = []
+
+def _stop_on_event(stop_event):
+    """Stopping criteria that ends generate() early once stop_event is set (e.g. the user cancelled)."""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+    class StopOnEvent(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), stop_event.is_set(), dtype=torch.bool, device=input_ids.device)
+    return StoppingCriteriaList([StopOnEvent()])
+
+class LocalChatModel:
+    """
+    Generates DialoGPT replies against a ConversationState, either all at once (reply) or
+    streamed on a background thread through a TextIteratorStreamer (stream), so speech can
+    start before the reply is complete.
+    """
+    def __init__(self, model, tokenizer, generation_kwargs: dict = None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.generation_kwargs = dict(GENERATION_KWARGS, **(generation_kwargs or {}))
+        self.last_metrics = None
+        self.last_reply = ""
+
+    def _generate(self, state: ConversationState, prompt: str, streamer=None, stop_event=None):
+        import torch
+        input_list, cache = state.prepare(prompt)
+        input_ids = torch.tensor([input_list], dtype=torch.long)
+        extra = {"stopping_criteria": _stop_on_event(stop_event)} if stop_event is not None else {}
+        try:
+            with torch.no_grad():
+                output = self.model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+                                             past_key_values=cache, use_cache=True, return_dict_in_generate=True,
+                                             pad_token_id=self.tokenizer.eos_token_id, streamer=streamer,
+                                             **extra, **self.generation_kwargs)
+        except Exception:
+            state.abandon_turn(); raise
+        self.last_reply = state.commit(input_list, output.sequences[0].tolist(), getattr(output, "past_key_values", None))
+        return self.last_reply
+
+    def new_conversation(self, token_budget: int = HISTORY_TOKEN_BUDGET) -> ConversationState:
+        return ConversationState(self.tokenizer, token_budget=token_budget)
+
+    def reply_batch(self, states, prompts, stop_event=None) -> list:
+        """
+        Replies for several independent conversations in one generate() call (used by the
+        shared inference server). Inputs are left-padded to a common length; per-conversation
+        KV caches can't be merged into one batch, so they are rebuilt on the next single reply.
+        """
+        import torch
+        if len(states) == 1: return [self.reply(states[0], prompts[0], stop_event)]
+        metrics = self.last_metrics = StreamMetrics()
+        inputs = [state.prepare(prompt)[0] for state, prompt in zip(states, prompts)]
+        width = max(len(ids) for ids in inputs); pad = self.tokenizer.eos_token_id
+        input_ids = torch.tensor([[pad] * (width - len(ids)) + ids for ids in inputs], dtype=torch.long)
+        attention_mask = torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in inputs], dtype=torch.long)
+        extra = {"stopping_criteria": _stop_on_event(stop_event)} if stop_event is not None else {}
+        try:
+            with torch.no_grad():
+                output = self.model.generate(input_ids=input_ids, attention_mask=attention_mask, use_cache=True,
+                                             return_dict_in_generate=True, pad_token_id=pad, **extra, **self.generation_kwargs)
+        except Exception:
+            for state in states: state.abandon_turn()
+            raise
+        replies = [state.commit(ids, output.sequences[i, width - len(ids):].tolist(), None)
+                   for i, (state, ids) in enumerate(zip(states, inputs))]
+        metrics.finished_at = time.monotonic()
+        return replies
+
+    def reply(self, state: ConversationState, prompt: str, stop_event=None) -> str:
+        metrics = self.last_metrics = StreamMetrics()
+        text = self._generate(state, prompt, stop_event=stop_event)
+        metrics.finished_at = time.monotonic()
+        return text
+
+    def stream(self, state: ConversationState, prompt: str, stop_event=None, metrics: StreamMetrics = None):
+        """
+        Generator of reply text pieces. metrics (also self.last_metrics) is filled in as it runs;
+        pass one in to share it with group_phrases(), since a generator body only starts on the
+        first next(). Setting stop_event ends generation at the next token; the partial reply is
+        kept in the history.
+        """
+        from transformers import TextIteratorStreamer
+        metrics = self.last_metrics = metrics or StreamMetrics()
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=60.0)
+        errors = []
+        def run():
+            try: self._generate(state, prompt, streamer, stop_event)
+            except Exception as e:
+                errors.append(e); streamer.end() # Unblock the consumer
+        worker = threading.Thread(target=run, name="LocalAIGenerate", daemon=True)
+        worker.start()
+        for piece in streamer:
+            if not piece: continue
+            if metrics.first_token_at is None: metrics.first_token_at = time.monotonic()
+            metrics.pieces += 1
+            yield piece
+        worker.join()
+        metrics.finished_at = time.monotonic()
+        if errors: raise errors[0]
@@ -0,0 +1,120 @@
+
+# face_cache.py (On-disk face encoding store for known_faces/)
+
+import os
+import hashlib
+import numpy as np
+
+# --- Configuration Constants ---
+FACE_CACHE_FILE = "face_encodings_cache.npz"
+FACE_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+ENCODING_SIZE = 128 # face_recognition / dlib encodings are 128-d
+
+def file_content_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-1 of a file's bytes, read in chunks so large photos don't spike memory."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class FaceEncodingCache:
+    """
+    Keeps one encoding per image in known_faces/, stored in a single .npz next to it.
+    Entries are keyed by file name + content hash; (mtime, size) is a fast path so
+    unchanged files are never re-read. Images with no detectable face are remembered
+    too, so a bad photo doesn't cost a dlib pass on every start.
+    """
+    def __init__(self, faces_dir: str, cache_path: str = None):
+        self.faces_dir = faces_dir
+        self.cache_path = cache_path if cache_path else os.path.join(faces_dir, FACE_CACHE_FILE)
+        self.entries = {} # filename -> {"hash", "mtime", "size", "name", "encoding" (or None)}
+        self.stats = {"reused": 0, "encoded": 0, "evicted": 0, "failed": 0}
+
+    # --- Persistence ---
+    def _load(self):
+        self.entries = {}
+        if not os.path.exists(self.cache_path): return
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                encodings = data["encodings"]
+                for i, filename in enumerate(data["files"].tolist()):
+                    has_face = bool(data["has_face"][i])
+                    self.entries[filename] = {
+                        "hash": str(data["hashes"][i]), "mtime": float(data["mtimes"][i]),
+                        "size": int(data["sizes"][i]), "name": str(data["names"][i]),
+                        "encoding": encodings[i] if has_face else None,
+                    }
+        except Exception as e: # Corrupt or old-format cache: rebuild from scratch
+            print(f"Robot Warning: Face cache '{self.cache_path}' unreadable, rebuilding. ({e})")
+            self.entries = {}
+
+    def _save(self):
+        files = sorted(self.entries)
+        encodings = np.zeros((len(files), ENCODING_SIZE), dtype=np.float64)
+        has_face = np.zeros(len(files), dtype=bool)
+        for i, filename in enumerate(files):
+            if self.entries[filename]["encoding"] is not None:
+                encodings[i] = self.entries[filename]["encoding"]; has_face[i] = True
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f: # Write then rename so a crash never leaves a half-written cache
+                np.savez(f, files=np.array(files, dtype=str),
+                         names=np.array([self.entries[fn]["name"] for fn in files], dtype=str),
+                         hashes=np.array([self.entries[fn]["hash"] for fn in files], dtype=str),
+                         mtimes=np.array([self.entries[fn]["mtime"] for fn in files], dtype=np.float64),
+                         sizes=np.array([self.entries[fn]["size"] for fn in files], dtype=np.int64),
+                         has_face=has_face, encodings=encodings)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Robot Warning: Could not write face cache '{self.cache_path}': {e}")
+
+    # --- Sync with known_faces/ ---
+    def sync(self, encode_image_func):
+        """
+        Brings the cache in line with the directory and returns (encodings, names).
+        encode_image_func(path) must return a 128-d encoding or None if no face was found.
+        """
+        self._load()
+        self.stats = {"reused": 0, "encoded": 0, "evicted": 0, "failed": 0}
+        by_hash = {e["hash"]: e for e in self.entries.values()} # Lets renamed/copied files reuse work
+        fresh = {}; changed = False
+
+        for filename in sorted(os.listdir(self.faces_dir)):
+            if not filename.lower().endswith(FACE_IMAGE_EXTENSIONS): continue
+            image_path = os.path.join(self.faces_dir, filename)
+            try: st = os.stat(image_path)
+            except OSError: continue
+            name = os.path.splitext(filename)[0].title()
+
+            cached = self.entries.get(filename)
+            if cached and cached["mtime"] == st.st_mtime and cached["size"] == st.st_size:
+                fresh[filename] = dict(cached, name=name); self.stats["reused"] += 1; continue
+
+            try: content_hash = file_content_hash(image_path)
+            except OSError as e: print(f"Robot Error reading face {image_path}: {e}"); continue
+            changed = True
+            same = by_hash.get(content_hash)
+            if same is not None: # Touched or renamed, content unchanged
+                fresh[filename] = dict(same, name=name, mtime=st.st_mtime, size=st.st_size)
+                self.stats["reused"] += 1; continue
+
+            try: encoding = encode_image_func(image_path)
+            except Exception as e:
+                print(f"Robot Error loading face {image_path}: {e}"); self.stats["failed"] += 1; continue
+            if encoding is None:
+                print(f"Robot Warning: No face found in {image_path} for {name}.")
+                self.stats["failed"] += 1
+            else:
+                encoding = np.asarray(encoding, dtype=np.float64); self.stats["encoded"] += 1
+            fresh[filename] = {"hash": content_hash, "mtime": st.st_mtime, "size": st.st_size,
+                               "name": name, "encoding": encoding}
+
+        self.stats["evicted"] = len(set(self.entries) - set(fresh))
+        if self.stats["evicted"]: changed = True
+        self.entries = fresh
+        if changed or not os.path.exists(self.cache_path): self._save()
+
+        names = [e["name"] for e in self.entries.values() if e["encoding"] is not None]
+        encodings = [e["encoding"] for e in self.entries.values() if e["encoding"] is not None]
+        return encodings, names
@@ -0,0 +1,133 @@
+
+# face_matcher.py (Shared nearest-identity matcher for robot_dialogGPT.py and FaceRecognitionSystem)
+
+import threading
+import numpy as np
+
+# --- Optional ANN backend ---
+try:
+    from sklearn.neighbors import BallTree
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+# --- Configuration Constants ---
+DEFAULT_TOLERANCE = 0.55 # Same threshold the camera loop used with compare_faces
+ANN_MIN_GALLERY_SIZE = 2000 # Below this an exact matrix scan is already sub-millisecond
+IVF_PROBES = 4 # Buckets searched per query when falling back to IVF
+
+class _IVFIndex:
+    """Tiny IVF index: k-means buckets over the gallery, search the nearest few buckets exactly."""
+    def __init__(self, gallery: np.ndarray, n_probes: int = IVF_PROBES, iterations: int = 8):
+        n = len(gallery)
+        n_lists = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        self.centroids = gallery[rng.choice(n, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmin(_pairwise_sq_dist(gallery, self.centroids), axis=1)
+            for c in range(n_lists):
+                members = gallery[assign == c]
+                if len(members): self.centroids[c] = members.mean(axis=0)
+        assign = np.argmin(_pairwise_sq_dist(gallery, self.centroids), axis=1)
+        self.lists = [np.flatnonzero(assign == c) for c in range(n_lists)]
+        self.gallery = gallery
+        self.n_probes = min(n_probes, n_lists)
+
+    def query(self, queries: np.ndarray):
+        probe = np.argsort(_pairwise_sq_dist(queries, self.centroids), axis=1)[:, :self.n_probes]
+        best_idx = np.full(len(queries), -1, dtype=np.int64)
+        best_dist = np.full(len(queries), np.inf, dtype=np.float32)
+        for q in range(len(queries)):
+            candidates = np.concatenate([self.lists[c] for c in probe[q]])
+            if not len(candidates): continue
+            d = _pairwise_sq_dist(queries[q:q + 1], self.gallery[candidates])[0]
+            j = int(np.argmin(d))
+            best_idx[q] = candidates[j]; best_dist[q] = np.sqrt(d[j])
+        return best_dist, best_idx
+
+def _pairwise_sq_dist(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Squared Euclidean distances between rows of a (M,D) and b (N,D) in one matrix product."""
+    d = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(d, 0.0, out=d)
+
+class FaceMatcher:
+    """
+    Holds the known-face gallery as a contiguous float32 (N,128) matrix and returns the
+    nearest identity (not the first one under tolerance) for every face in a frame at once.
+    Large galleries can use an approximate index: a BallTree if scikit-learn is installed,
+    otherwise built-in IVF buckets.
+    """
+    def __init__(self, encodings=None, names=None, tolerance: float = DEFAULT_TOLERANCE, use_ann: bool = None):
+        self.tolerance = tolerance
+        self.use_ann = use_ann # None = decide by gallery size
+        self._lock = threading.Lock() # Guards swapping the gallery while another thread matches
+        self._gallery = np.zeros((0, 128), dtype=np.float32)
+        self._gallery_sq = np.zeros(0, dtype=np.float32)
+        self._names = []
+        self._index = None
+        self.set_gallery(encodings if encodings is not None else [], names if names is not None else [])
+
+    def __len__(self):
+        return len(self._names)
+
+    def set_gallery(self, encodings, names):
+        """Replaces the whole gallery (e.g. after load_known_faces)."""
+        if len(encodings) != len(names):
+            raise ValueError(f"FaceMatcher: {len(encodings)} encodings but {len(names)} names.")
+        gallery = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, 128))
+        index = None
+        use_ann = self.use_ann if self.use_ann is not None else len(gallery) >= ANN_MIN_GALLERY_SIZE
+        if use_ann and len(gallery):
+            index = BallTree(gallery) if SKLEARN_AVAILABLE else _IVFIndex(gallery)
+        with self._lock:
+            self._gallery = gallery
+            self._gallery_sq = (gallery * gallery).sum(axis=1)
+            self._names = list(names)
+            self._index = index
+
+    def distances(self, face_encodings) -> np.ndarray:
+        """Exact (M,N) distance matrix between the given faces and the whole gallery."""
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, 128)
+        with self._lock: gallery, gallery_sq = self._gallery, self._gallery_sq
+        return self._exact_distances(queries, gallery, gallery_sq)
+
+    @staticmethod
+    def _exact_distances(queries, gallery, gallery_sq):
+        d = (queries * queries).sum(axis=1)[:, None] + gallery_sq[None, :] - 2.0 * (queries @ gallery.T)
+        return np.sqrt(np.maximum(d, 0.0, out=d))
+
+    def match_batch(self, face_encodings):
+        """
+        Returns [(name or None, distance), ...], one per input face.
+        name is None when the nearest gallery face is farther than tolerance.
+        """
+        if face_encodings is None or len(face_encodings) == 0: return []
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, 128)
+        with self._lock: gallery, gallery_sq, names, index = self._gallery, self._gallery_sq, self._names, self._index
+        if not len(gallery): return [(None, float("inf"))] * len(queries)
+
+        if index is None:
+            dist = self._exact_distances(queries, gallery, gallery_sq)
+            best_idx = np.argmin(dist, axis=1)
+            best_dist = dist[np.arange(len(queries)), best_idx]
+        elif SKLEARN_AVAILABLE and isinstance(index, BallTree):
+            best_dist, best_idx = index.query(queries, k=1)
+            best_dist, best_idx = best_dist[:, 0], best_idx[:, 0]
+        else:
+            best_dist, best_idx = index.query(queries)
+
+        results = []
+        for d, i in zip(best_dist, best_idx):
+            d = float(d)
+            results.append((names[int(i)] if i >= 0 and d <= self.tolerance else None, d))
+        return results
+
+    def best_match(self, face_encodings):
+        """Closest known (name, distance) across all faces in a frame, or (None, inf)."""
+        return self.closest(self.match_batch(face_encodings))
+
+    @staticmethod
+    def closest(matches):
+        """best_match over match_batch results already in hand (e.g. when each face is also tracked)."""
+        known = [m for m in matches if m[0] is not None]
+        return min(known, key=lambda m: m[1]) if known else (None, float("inf"))
@@ -0,0 +1,224 @@
+
+# face_pipeline.py (Staged camera capture -> detect/encode -> match pipeline)
+
+import threading
+import queue
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+from face_tracker import box_iou, IOU_MATCH_THRESHOLD
+
+# --- Configuration Constants ---
+FRAME_RING_SIZE = 2 # Only the freshest frames matter; older ones are dropped
+DETECT_SCALE = 0.25 # Detection runs on a quarter-size frame, boxes are scaled back up
+DETECT_WORKERS = 2
+FPS_WINDOW_SEC = 2.0
+
+def detect_and_encode(rgb_small_frame, model: str = "hog", skip_boxes=None):
+    """
+    Worker-side HOG detection + 128-d encoding. Lives at module level so a process pool
+    can pickle it; face_recognition is imported inside so each worker loads dlib once.
+    Faces overlapping skip_boxes (already identified tracks) are located but not encoded;
+    their slot in the returned encodings list is None.
+    """
+    import face_recognition
+    locations = face_recognition.face_locations(rgb_small_frame, model=model)
+    skip_boxes = skip_boxes or []
+    to_encode = [loc for loc in locations if not any(box_iou(loc, b) >= IOU_MATCH_THRESHOLD for b in skip_boxes)]
+    encoded = face_recognition.face_encodings(rgb_small_frame, to_encode, num_jitters=1) if to_encode else []
+    by_location = {loc: e.tolist() for loc, e in zip(to_encode, encoded)}
+    return locations, [by_location.get(loc) for loc in locations]
+
+# --- Shared detection pool (spawning dlib workers is slow, so reuse them across camera sessions) ---
+_DETECT_EXECUTOR = None
+_DETECT_EXECUTOR_LOCK = threading.Lock()
+
+def get_detect_executor(workers: int = DETECT_WORKERS, use_processes: bool = True):
+    global _DETECT_EXECUTOR
+    with _DETECT_EXECUTOR_LOCK:
+        if _DETECT_EXECUTOR is None:
+            try: _DETECT_EXECUTOR = (ProcessPoolExecutor if use_processes else ThreadPoolExecutor)(max_workers=workers)
+            except Exception as e: # e.g. no multiprocessing support on this platform
+                print(f"Robot Warning: Process pool unavailable ({e}), using threads for face detection.")
+                _DETECT_EXECUTOR = ThreadPoolExecutor(max_workers=workers)
+        return _DETECT_EXECUTOR
+
+def use_detect_executor(executor):
+    """Replaces the shared pool with any executor-like object (e.g. inference_server.RemoteDetectExecutor)."""
+    global _DETECT_EXECUTOR
+    with _DETECT_EXECUTOR_LOCK: _DETECT_EXECUTOR = executor
+
+def shutdown_detect_executor():
+    global _DETECT_EXECUTOR
+    with _DETECT_EXECUTOR_LOCK:
+        if _DETECT_EXECUTOR: _DETECT_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _DETECT_EXECUTOR = None
+
+class FrameRing:
+    """Bounded frame buffer that drops the oldest frame instead of blocking the camera."""
+    def __init__(self, maxlen: int = FRAME_RING_SIZE):
+        self._frames = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen: self.dropped += 1
+            self._frames.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: float = None):
+        with self._cond:
+            if not self._frames and not self._cond.wait_for(lambda: self._frames, timeout): return None
+            return self._frames.popleft()
+
+    def __len__(self):
+        return len(self._frames)
+
+class StageStats:
+    """Rolling frames-per-second counter for one pipeline stage."""
+    def __init__(self, window_sec: float = FPS_WINDOW_SEC):
+        self.window_sec = window_sec
+        self.total = 0
+        self._stamps = deque()
+        self._lock = threading.Lock()
+
+    def tick(self):
+        now = time.monotonic()
+        with self._lock:
+            self.total += 1; self._stamps.append(now)
+            while self._stamps and now - self._stamps[0] > self.window_sec: self._stamps.popleft()
+
+    def fps(self) -> float:
+        with self._lock:
+            if len(self._stamps) < 2: return 0.0
+            span = self._stamps[-1] - self._stamps[0]
+            return (len(self._stamps) - 1) / span if span > 0 else 0.0
+
+class FaceCapturePipeline:
+    """
+    Overlaps camera latency with dlib compute:
+      capture thread  -> FrameRing (drop-oldest)
+      dispatch thread -> detection worker pool (processes by default, dlib holds the GIL)
+      caller          -> results() for matching and rendering on its own thread
+    With a FaceTracker, frames are only sent to dlib when the tracker asks for a detection
+    (up to `workers` in flight, so bursts of motion use the whole pool); the frames in between
+    are followed with the OpenCV tracker, and a detection finishing after a newer one is dropped.
+    """
+    def __init__(self, video_capture, workers: int = DETECT_WORKERS, use_processes: bool = True,
+                 scale: float = DETECT_SCALE, tracker=None):
+        self.video_capture = video_capture
+        self.workers = workers
+        self.use_processes = use_processes
+        self.scale = scale
+        self.tracker = tracker
+        self.ring = FrameRing()
+        self.results_queue = queue.Queue(maxsize=workers * 2)
+        self.stats = {"capture": StageStats(), "detect": StageStats(), "consume": StageStats()}
+        self.capture_failed = False
+        self.stale_detections = 0 # Tracking mode: detections dropped because a newer frame's landed first
+        self._stop_event = threading.Event()
+        self._executor = None
+        self._threads = []
+
+    # --- Lifecycle ---
+    def start(self):
+        self._executor = get_detect_executor(self.workers, self.use_processes)
+        self._threads = [threading.Thread(target=self._capture_loop, name="FaceCapture", daemon=True),
+                         threading.Thread(target=self._dispatch_loop, name="FaceDispatch", daemon=True)]
+        for t in self._threads: t.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        for t in self._threads: t.join(timeout=2.0)
+
+    def __enter__(self): return self.start()
+    def __exit__(self, *exc): self.stop()
+
+    # --- Stages ---
+    def _capture_loop(self):
+        seq = 0
+        while not self._stop_event.is_set():
+            ret, frame = self.video_capture.read()
+            if not ret:
+                print("Robot Warning: Cam frame grab failed."); self.capture_failed = True; break
+            small_frame = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale)
+            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            self.ring.put((seq, time.monotonic(), frame, rgb_small_frame))
+            self.stats["capture"].tick(); seq += 1
+
+    def _dispatch_loop(self):
+        if self.tracker is not None: return self._tracking_dispatch_loop()
+        in_flight = deque() # (future, seq, ts, frame), kept in submit order
+        while not self._stop_event.is_set():
+            if len(in_flight) < self.workers:
+                item = self.ring.get(timeout=0.05)
+                if item is not None:
+                    seq, ts, frame, rgb_small_frame = item
+                    in_flight.append((self._executor.submit(detect_and_encode, rgb_small_frame), seq, ts, frame))
+            elif not in_flight[0][0].done():
+                time.sleep(0.002)
+            while in_flight and in_flight[0][0].done():
+                future, seq, ts, frame = in_flight.popleft()
+                try: locations, encodings = future.result()
+                except Exception as e:
+                    print(f"Robot Error CV2 face detect: {e}"); continue
+                self.stats["detect"].tick()
+                self._emit(seq, ts, frame, locations, [e for e in encodings if e is not None])
+
+    def _tracking_dispatch_loop(self):
+        in_flight = [] # (future, seq, ts, frame, rgb_small_frame), in submit order
+        applied_seq = -1 # Newest frame whose detections the tracker has
+        while not self._stop_event.is_set():
+            done = [p for p in in_flight if p[0].done()]
+            for pending in done: # Oldest first; one that finished after a newer frame's is stale
+                in_flight.remove(pending)
+                future, seq, ts, frame, rgb_small_frame = pending
+                if seq < applied_seq: self.stale_detections += 1; continue
+                try:
+                    locations, encodings = future.result()
+                    to_identify = self.tracker.apply_detections(rgb_small_frame, locations, encodings)
+                    applied_seq = seq; self.stats["detect"].tick()
+                    self._emit(seq, ts, frame, [box for _, box, _ in self.tracker.snapshot()],
+                               [e for _, e in to_identify], [tid for tid, _ in to_identify])
+                except Exception as e: print(f"Robot Error CV2 face detect: {e}")
+            item = self.ring.get(timeout=0.02)
+            if item is None: continue
+            seq, ts, frame, rgb_small_frame = item
+            if len(in_flight) < self.workers and self.tracker.needs_detection(rgb_small_frame):
+                future = self._executor.submit(detect_and_encode, rgb_small_frame, "hog", self.tracker.identified_boxes())
+                in_flight.append((future, seq, ts, frame, rgb_small_frame))
+            else:
+                tracks = self.tracker.follow(rgb_small_frame)
+                self._emit(seq, ts, frame, [box for _, box, _ in tracks], [])
+
+    def _emit(self, seq, ts, frame, small_boxes, encodings, track_ids=None):
+        scale_back = int(round(1 / self.scale))
+        boxes = [(t * scale_back, r * scale_back, b * scale_back, l * scale_back) for (t, r, b, l) in small_boxes]
+        result = {"seq": seq, "captured_at": ts, "frame": frame, "boxes": boxes, "encodings": encodings,
+                  "track_ids": track_ids or []}
+        try: self.results_queue.put_nowait(result)
+        except queue.Full: # Consumer is behind: replace the oldest result with this one
+            try: self.results_queue.get_nowait()
+            except queue.Empty: pass
+            self.results_queue.put_nowait(result)
+
+    def results(self, timeout: float = 0.1):
+        """Next detection result dict, or None if nothing arrived within timeout."""
+        try: result = self.results_queue.get(timeout=timeout)
+        except queue.Empty: return None
+        self.stats["consume"].tick()
+        return result
+
+    def report(self) -> dict:
+        """Per-stage FPS and queue depths, for logging."""
+        return {"capture_fps": round(self.stats["capture"].fps(), 1),
+                "detect_fps": round(self.stats["detect"].fps(), 1),
+                "consume_fps": round(self.stats["consume"].fps(), 1),
+                "frame_ring_depth": len(self.ring), "frames_dropped": self.ring.dropped,
+                "stale_detections": self.stale_detections,
+                "results_depth": self.results_queue.qsize(),
+                "encodes_per_frame": round(self.tracker.encode_ratio(), 3) if self.tracker else 1.0}
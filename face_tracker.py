@@ -0,0 +1,136 @@
+
+# face_tracker.py (Cheap box tracking between full HOG detection passes)
+
+import itertools
+import threading
+
+import cv2
+import numpy as np
+
+# --- Configuration Constants ---
+DETECT_EVERY_N_FRAMES = 10 # Full HOG pass at least this often
+MOTION_THRESHOLD = 6.0 # Mean abs grey-level change (0-255) that counts as motion
+MOTION_SAMPLE_SIZE = (64, 48) # Frames are shrunk to this before differencing
+IOU_MATCH_THRESHOLD = 0.3 # Detection <-> track association
+
+def box_iou(a, b) -> float:
+    """IoU of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3]); area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+def _create_cv2_tracker():
+    """Fastest OpenCV tracker this build provides, or None (boxes then hold until the next detection)."""
+    for factory in ("legacy.TrackerMOSSE_create", "TrackerMOSSE_create", "TrackerKCF_create", "legacy.TrackerKCF_create"):
+        owner = cv2
+        try:
+            for part in factory.split("."): owner = getattr(owner, part)
+            return owner()
+        except AttributeError: continue
+    return None
+
+class FaceTrack:
+    """One face followed across frames. name stays None until the caller identifies it."""
+    _ids = itertools.count(1)
+
+    def __init__(self, box):
+        self.track_id = next(FaceTrack._ids)
+        self.box = box # (top, right, bottom, left) in detection-frame coordinates
+        self.name = None
+        self.distance = None
+        self.lost = False
+        self.cv_tracker = None
+
+    def start_cv_tracker(self, frame):
+        self.cv_tracker = _create_cv2_tracker()
+        if self.cv_tracker is None: return
+        top, right, bottom, left = self.box
+        try: self.cv_tracker.init(frame, (int(left), int(top), int(right - left), int(bottom - top)))
+        except Exception: self.cv_tracker = None
+
+    def follow(self, frame):
+        if self.cv_tracker is None: return
+        ok, (x, y, w, h) = self.cv_tracker.update(frame)
+        if ok: self.box = (int(y), int(x + w), int(y + h), int(x))
+        else: self.lost = True
+
+class FaceTracker:
+    """
+    Decides when a full detection pass is needed (every N frames, on motion, or when a
+    track is lost) and follows known boxes with an OpenCV tracker in between.
+    Only faces that are new, lost, or still unidentified get re-encoded.
+    """
+    def __init__(self, detect_every: int = DETECT_EVERY_N_FRAMES, motion_threshold: float = MOTION_THRESHOLD):
+        self.detect_every = detect_every
+        self.motion_threshold = motion_threshold
+        self.tracks = []
+        self.frames_since_detection = detect_every # Force a detection on the first frame
+        self.stats = {"frames": 0, "detections": 0, "encodings": 0}
+        self._prev_sample = None
+        self._lock = threading.RLock() # Tracks are updated by the capture side and named by the consumer
+
+    def _motion(self, frame) -> bool:
+        sample = cv2.cvtColor(cv2.resize(frame, MOTION_SAMPLE_SIZE), cv2.COLOR_RGB2GRAY).astype(np.int16)
+        moved = self._prev_sample is not None and float(np.abs(sample - self._prev_sample).mean()) > self.motion_threshold
+        self._prev_sample = sample
+        return moved
+
+    def needs_detection(self, frame) -> bool:
+        self.frames_since_detection += 1
+        moved = self._motion(frame)
+        with self._lock: any_lost = any(t.lost for t in self.tracks)
+        detect = moved or any_lost or self.frames_since_detection >= self.detect_every
+        if detect: self.stats["frames"] += 1 # Frames that skip detection are counted in follow()
+        return detect
+
+    def identified_boxes(self):
+        """Boxes whose identity is settled; detection can skip re-encoding faces found there."""
+        with self._lock: return [t.box for t in self.tracks if t.name and not t.lost]
+
+    def follow(self, frame):
+        """Moves every track with its OpenCV tracker; call on frames without a detection pass."""
+        self.stats["frames"] += 1
+        with self._lock:
+            for t in self.tracks: t.follow(frame)
+            return self.snapshot()
+
+    def apply_detections(self, frame, locations, encodings):
+        """
+        Re-associates detections to tracks by IoU. encodings is aligned with locations, with None
+        where detection skipped encoding. Returns [(track_id, encoding), ...] for faces that need matching.
+        """
+        self.frames_since_detection = 0
+        self.stats["detections"] += 1
+        to_identify = []
+        with self._lock:
+            remaining = [t for t in self.tracks if not t.lost]
+            updated = []
+            for box, encoding in zip(locations, encodings):
+                best = max(remaining, key=lambda t: box_iou(t.box, box), default=None)
+                if best is not None and box_iou(best.box, box) >= IOU_MATCH_THRESHOLD:
+                    remaining.remove(best); track = best
+                else:
+                    track = FaceTrack(box)
+                track.box = box; track.lost = False
+                track.start_cv_tracker(frame)
+                updated.append(track)
+                if encoding is not None:
+                    to_identify.append((track.track_id, encoding)); self.stats["encodings"] += 1
+            self.tracks = updated # Tracks with no detection this pass are dropped
+        return to_identify
+
+    def set_identity(self, track_id: int, name: str, distance: float = None):
+        with self._lock:
+            for t in self.tracks:
+                if t.track_id == track_id: t.name = name; t.distance = distance
+
+    def snapshot(self):
+        """[(track_id, box, name), ...] for rendering."""
+        with self._lock: return [(t.track_id, t.box, t.name) for t in self.tracks if not t.lost]
+
+    def encode_ratio(self) -> float:
+        """Encodings per processed frame; 1.0 would be the old encode-every-frame behaviour."""
+        return self.stats["encodings"] / self.stats["frames"] if self.stats["frames"] else 0.0
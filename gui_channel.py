@@ -0,0 +1,106 @@
+
+# gui_channel.py (Coalescing robot -> GUI command channel with backpressure and delivery latency stats)
+
+import collections
+import itertools
+import queue
+import statistics
+import threading
+import time
+
+# --- Configuration Constants ---
+GUI_CHANNEL_MAX_PENDING = 50 # Distinct pending keys; system actions are exempt
+NEVER_DROP_TYPES = ("system",) # e.g. {"type": "system", "action": "quit"}
+LATENCY_SAMPLES = 500
+STATE_KEY = "state" # The face's expression + message line; coalesced, never evicted
+
+def coalesce_key(payload: dict):
+    """
+    Updates with the same key replace each other: the face shows one expression and one
+    message line, so only the latest matters. System actions get a unique key (None) so
+    every one of them is delivered, in order.
+    """
+    kind = payload.get("type", "expression")
+    if kind in NEVER_DROP_TYPES: return None
+    if kind == "expression": return STATE_KEY
+    return (kind, payload.get("action"))
+
+class GuiCommandChannel:
+    """
+    Drop-in for the queue.Queue the GUI reads (put_nowait / get_nowait / get / empty / qsize),
+    but pending updates are coalesced by key instead of piling up: a burst of expression
+    changes becomes one render of the final state. The GUI can take a whole frame's worth
+    at once with drain(). Nothing is ever dropped for system actions; if too many distinct
+    keys are pending, the oldest ordinary update makes room (never the current face state).
+    """
+    def __init__(self, max_pending: int = GUI_CHANNEL_MAX_PENDING):
+        self.max_pending = max_pending
+        self.pending = collections.OrderedDict() # key -> payload, oldest first
+        self.stats = {"enqueued": 0, "coalesced": 0, "dropped": 0, "delivered": 0, "batches": 0}
+        self.delivery_latency_ms = collections.deque(maxlen=LATENCY_SAMPLES) # send -> picked up by the GUI
+        self._unique = itertools.count()
+        self._cond = threading.Condition()
+
+    # --- Producer side (robot logic, TTS and task threads) ---
+    def put_nowait(self, payload: dict):
+        payload = dict(payload, sent_at=time.monotonic())
+        key = coalesce_key(payload)
+        if key is None: key = ("unique", next(self._unique))
+        with self._cond:
+            self.stats["enqueued"] += 1
+            if key in self.pending:
+                del self.pending[key]; self.stats["coalesced"] += 1 # Re-queued at the end with the new value
+            elif len(self.pending) >= self.max_pending: # Evict the oldest droppable update; if none, grow
+                victim = next((k for k in self.pending if k != STATE_KEY and not (isinstance(k, tuple) and k[0] == "unique")), None)
+                if victim is not None: del self.pending[victim]; self.stats["dropped"] += 1
+            self.pending[key] = payload
+            self._cond.notify()
+
+    def put(self, payload: dict, block: bool = True, timeout: float = None):
+        self.put_nowait(payload) # Never blocks the producer
+
+    # --- Consumer side (GUI main thread) ---
+    def _pop(self) -> dict:
+        _, payload = self.pending.popitem(last=False)
+        self.stats["delivered"] += 1
+        self.delivery_latency_ms.append((time.monotonic() - payload["sent_at"]) * 1000.0)
+        return payload
+
+    def get_nowait(self) -> dict:
+        with self._cond:
+            if not self.pending: raise queue.Empty
+            return self._pop()
+
+    def get(self, block: bool = True, timeout: float = None) -> dict:
+        with self._cond:
+            if block and not self._cond.wait_for(lambda: self.pending, timeout): raise queue.Empty
+            if not self.pending: raise queue.Empty
+            return self._pop()
+
+    def drain(self) -> list:
+        """Everything pending, oldest first, in one call: one batch per GUI frame."""
+        with self._cond:
+            batch = [self._pop() for _ in range(len(self.pending))]
+            if batch: self.stats["batches"] += 1
+            return batch
+
+    def empty(self) -> bool:
+        return not self.pending
+
+    def qsize(self) -> int:
+        return len(self.pending)
+
+    def full(self) -> bool:
+        return False # Producers never block; see max_pending
+
+    # --- Reporting ---
+    @staticmethod
+    def _percentiles(samples) -> dict:
+        values = sorted(samples)
+        if not values: return {}
+        return {"p50_ms": round(statistics.median(values), 2),
+                "p95_ms": round(values[min(len(values) - 1, int(0.95 * len(values)))], 2)}
+
+    def report(self) -> dict:
+        return dict(self.stats, pending=len(self.pending),
+                    delivery_latency=self._percentiles(self.delivery_latency_ms))
@@ -0,0 +1,510 @@
+
+# inference_server.py (Shared local inference daemon: one chat model + face encoder for many robots)
+#
+# Usage: python inference_server.py [--address 127.0.0.1:8765 | --address unix:/tmp/loki_inference.sock]
+#                                   [--backend pytorch-fp32] [--threads 4] [--max-batch 8] [--window-ms 15] [--no-faces]
+#        python inference_server.py --bench 1,2,4,8 [--synthetic] [--requests 10]
+#
+# Robots opt in with LOKI_INFERENCE_SERVER=<address>; robot_dialogGPT then sends ask_local_model
+# and face detect/encode work here instead of loading DialoGPT and dlib in every process.
+# Concurrent requests are batched dynamically (whatever arrives within --window-ms, up to
+# --max-batch, runs as one generate() / one pass over the detection pool). Each client keeps
+# its own conversation history on the server. --bench adds clients step by step and reports
+# throughput, queue wait and batch sizes.
+
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import argparse
+import statistics
+import threading
+import collections
+import http.client
+import http.server
+import socketserver
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- Configuration Constants ---
+DEFAULT_ADDRESS = "127.0.0.1:8765" # "host:port", or "unix:/path/to.sock" where Unix sockets exist
+MAX_BATCH = 8
+BATCH_WINDOW_SEC = 0.015 # How long the first request of a batch waits for company
+CLIENT_IDLE_SEC = 30 * 60 # Conversations of clients silent this long are dropped
+ACTIVE_CLIENT_SEC = 60.0 # Clients seen this recently count as connected in stats
+REQUEST_TIMEOUT_SEC = 120.0
+STAT_SAMPLES = 1000
+FACE_DETECT_WORKERS = 2
+
+class InferenceServerError(Exception):
+    """The server could not be reached or returned an error."""
+
+def parse_address(address: str):
+    """("unix", path) or ("tcp", (host, port))."""
+    if address.startswith("unix:"): return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+def encode_array(array) -> dict:
+    import numpy as np
+    array = np.ascontiguousarray(array)
+    return {"shape": list(array.shape), "dtype": str(array.dtype), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def decode_array(payload: dict):
+    import numpy as np
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=payload["dtype"]).reshape(payload["shape"])
+
+def _percentiles(samples) -> dict:
+    values = sorted(samples)
+    if not values: return {}
+    return {"p50_ms": round(statistics.median(values), 1), "p95_ms": round(values[min(len(values) - 1, int(0.95 * len(values)))], 1)}
+
+# --- Dynamic batching ---
+class DynamicBatcher:
+    """
+    Collects requests from many handler threads and runs them through run_batch(items) ->
+    [result, ...] on one worker thread. A batch closes when it is full or window_sec after its
+    first request arrived, so a lone client pays at most the window and a busy server fills batches.
+    """
+    def __init__(self, name: str, run_batch, max_batch: int = MAX_BATCH, window_sec: float = BATCH_WINDOW_SEC):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.window_sec = window_sec
+        self.stats = {"requests": 0, "batches": 0, "errors": 0, "max_batch_seen": 0}
+        self.queue_wait_ms = collections.deque(maxlen=STAT_SAMPLES)
+        self.service_ms = collections.deque(maxlen=STAT_SAMPLES)
+        self.batch_sizes = collections.deque(maxlen=STAT_SAMPLES)
+        self.completed_at = collections.deque(maxlen=STAT_SAMPLES)
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name=f"Batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item, timeout: float = REQUEST_TIMEOUT_SEC):
+        """Blocks until the item's batch has run; returns (result, {"queue_wait_ms", "batch_size"})."""
+        future = Future()
+        with self._cond:
+            if self._stopped: raise InferenceServerError(f"{self.name} batcher is stopped")
+            self._queue.append((time.monotonic(), item, future)); self._cond.notify()
+        return future.result(timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._stopped)
+            if self._stopped: return []
+            deadline = self._queue[0][0] + self.window_sec
+            while len(self._queue) < self.max_batch and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if not batch: return
+            started = time.monotonic()
+            waits = [(started - queued_at) * 1000.0 for queued_at, _, _ in batch]
+            try:
+                results = self.run_batch([item for _, item, _ in batch])
+                for (_, _, future), wait, result in zip(batch, waits, results):
+                    future.set_result((result, {"queue_wait_ms": round(wait, 1), "batch_size": len(batch)}))
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Robot Error: Inference batch '{self.name}' failed: {e}")
+                for _, _, future in batch: future.set_exception(e)
+            finished = time.monotonic()
+            self.stats["requests"] += len(batch); self.stats["batches"] += 1
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            self.queue_wait_ms.extend(waits); self.batch_sizes.append(len(batch))
+            self.service_ms.append((finished - started) * 1000.0)
+            self.completed_at.extend([finished] * len(batch))
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True; pending = list(self._queue); self._queue.clear(); self._cond.notify_all()
+        for _, _, future in pending: future.set_exception(InferenceServerError(f"{self.name} batcher stopped"))
+        self._thread.join(timeout=2.0)
+
+    def report(self) -> dict:
+        done = list(self.completed_at)
+        recent = [t for t in done if t >= time.monotonic() - 30.0]
+        throughput = (len(recent) - 1) / (recent[-1] - recent[0]) if len(recent) > 1 and recent[-1] > recent[0] else 0.0
+        sizes = list(self.batch_sizes)
+        return dict(self.stats, queued=len(self._queue), throughput_per_sec=round(throughput, 2),
+                    mean_batch=round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+                    queue_wait=_percentiles(self.queue_wait_ms), batch_time=_percentiles(self.service_ms))
+
+# --- Server side ---
+class InferenceService:
+    """
+    The models plus per-client state. chat_model is a chat_engine.LocalChatModel (or anything
+    with new_conversation/reply[/reply_batch]); face detection runs face_pipeline.detect_and_encode
+    on the shared detection pool. A client has at most one chat request in flight, so its
+    conversation is never in two batches at once.
+    """
+    def __init__(self, chat_model=None, faces: bool = True, max_batch: int = MAX_BATCH, window_sec: float = BATCH_WINDOW_SEC,
+                 history_tokens: int = None, face_workers: int = FACE_DETECT_WORKERS):
+        self.chat_model = chat_model
+        self.faces = faces
+        self.history_tokens = history_tokens
+        self.face_workers = face_workers
+        self.started_at = time.monotonic()
+        self.conversations = {} # client id -> conversation state
+        self.last_seen = {} # client id -> monotonic time
+        self._client_locks = {}
+        self._lock = threading.Lock()
+        self.chat_batcher = DynamicBatcher("chat", self._chat_batch, max_batch, window_sec) if chat_model else None
+        self.detect_batcher = DynamicBatcher("detect", self._detect_batch, max_batch, window_sec) if faces else None
+
+    def _touch(self, client: str):
+        now = time.monotonic()
+        with self._lock:
+            self.last_seen[client] = now
+            for stale in [c for c, seen in self.last_seen.items() if now - seen > CLIENT_IDLE_SEC]:
+                self.last_seen.pop(stale, None); self.conversations.pop(stale, None); self._client_locks.pop(stale, None)
+
+    def _client_lock(self, client: str):
+        with self._lock: return self._client_locks.setdefault(client, threading.Lock())
+
+    def _conversation(self, client: str):
+        with self._lock:
+            if client not in self.conversations:
+                self.conversations[client] = (self.chat_model.new_conversation(self.history_tokens) if self.history_tokens
+                                              else self.chat_model.new_conversation())
+            return self.conversations[client]
+
+    # --- Batch runners (batcher threads) ---
+    def _chat_batch(self, items):
+        states = [self._conversation(client) for client, _ in items]
+        prompts = [prompt for _, prompt in items]
+        if len(items) > 1 and hasattr(self.chat_model, "reply_batch"): return self.chat_model.reply_batch(states, prompts)
+        return [self.chat_model.reply(state, prompt) for state, prompt in zip(states, prompts)]
+
+    def _detect_batch(self, items):
+        import face_pipeline
+        executor = face_pipeline.get_detect_executor(self.face_workers)
+        futures = [executor.submit(face_pipeline.detect_and_encode, image, model, skip_boxes) for image, model, skip_boxes in items]
+        return [future.result() for future in futures]
+
+    # --- Requests (HTTP handler threads) ---
+    def chat(self, body: dict) -> dict:
+        if not self.chat_batcher: raise InferenceServerError("chat model not loaded on this server")
+        client = body["client"]; self._touch(client)
+        with self._client_lock(client):
+            reply, info = self.chat_batcher.submit((client, body.get("prompt", "")))
+            state = self._conversation(client)
+            return dict(info, reply=reply, history_tokens=len(state), conversation=dict(state.stats))
+
+    def reset(self, body: dict) -> dict:
+        client = body["client"]; self._touch(client)
+        with self._client_lock(client), self._lock: self.conversations.pop(client, None)
+        return {"ok": True}
+
+    def detect(self, body: dict) -> dict:
+        if not self.detect_batcher: raise InferenceServerError("face detection disabled on this server")
+        self._touch(body["client"])
+        if "image_file" in body: # Known-face photo: decode it here so the client needs no dlib
+            import io
+            import face_recognition
+            image = face_recognition.load_image_file(io.BytesIO(base64.b64decode(body["image_file"])))
+        else: image = decode_array(body["image"])
+        skip_boxes = [tuple(box) for box in body.get("skip_boxes") or []]
+        (locations, encodings), info = self.detect_batcher.submit((image, body.get("model", "hog"), skip_boxes))
+        return dict(info, locations=[list(loc) for loc in locations], encodings=encodings)
+
+    def report(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            active = sum(1 for seen in self.last_seen.values() if now - seen <= ACTIVE_CLIENT_SEC)
+            conversations = len(self.conversations)
+        return {"uptime_sec": round(now - self.started_at, 1), "active_clients": active, "conversations": conversations,
+                "chat": self.chat_batcher.report() if self.chat_batcher else None,
+                "detect": self.detect_batcher.report() if self.detect_batcher else None}
+
+    def stop(self):
+        for batcher in (self.chat_batcher, self.detect_batcher):
+            if batcher: batcher.stop()
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive: each robot thread reuses one connection
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def do_POST(self):
+        service = self.server.service
+        route = {"/chat": service.chat, "/reset": service.reset, "/detect": service.detect}.get(self.path)
+        if route is None: return self._send(404, {"error": f"unknown endpoint {self.path}"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self._send(200, route(body))
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        if self.path == "/stats": return self._send(200, self.server.service.report())
+        if self.path == "/health": return self._send(200, {"ok": True})
+        self._send(404, {"error": f"unknown endpoint {self.path}"})
+
+    def log_message(self, format, *args): pass # One line per request would drown the robot logs
+
+class _TCPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        def get_request(self):
+            request, _ = super().get_request()
+            return request, ("unix", 0) # BaseHTTPRequestHandler expects a (host, port) pair
+
+def serve(service: InferenceService, address: str = DEFAULT_ADDRESS):
+    """Starts the HTTP server on a daemon thread and returns it (server.address is the bound address)."""
+    kind, target = parse_address(address)
+    if kind == "unix":
+        if not hasattr(socket, "AF_UNIX"): raise InferenceServerError("Unix sockets are not available here; use host:port")
+        if os.path.exists(target): os.remove(target) # Stale socket from a previous run
+        server = _UnixServer(target, _RequestHandler); server.address = f"unix:{target}"
+    else:
+        server = _TCPServer(target, _RequestHandler); server.address = f"{target[0]}:{server.server_address[1]}"
+    server.service = service
+    threading.Thread(target=server.serve_forever, name="InferenceServer", daemon=True).start()
+    return server
+
+# --- Client side (used by robot_dialogGPT) ---
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout); self.sock.connect(self.unix_path)
+
+class InferenceClient:
+    """Thread-safe JSON client; each calling thread keeps its own keep-alive connection."""
+    def __init__(self, address: str = DEFAULT_ADDRESS, client_id: str = None, timeout: float = REQUEST_TIMEOUT_SEC):
+        self.address = address
+        self.client_id = client_id or os.environ.get("LOKI_ROBOT_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        self.timeout = timeout
+        self._kind, self._target = parse_address(address)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._kind == "unix": conn = _UnixHTTPConnection(self._target, self.timeout)
+            else: conn = http.client.HTTPConnection(*self._target, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        for attempt in (1, 2): # Retry once if the server closed an idle keep-alive connection
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse(); data = json.loads(response.read() or b"{}")
+                break
+            except (ConnectionError, http.client.HTTPException) as e:
+                conn.close(); self._local.conn = None
+                if attempt == 2: raise InferenceServerError(f"{self.address}: {e}") from e
+            except OSError as e: # Timeout, refused, missing socket file
+                conn.close(); self._local.conn = None
+                raise InferenceServerError(f"{self.address}: {e}") from e
+        if response.status != 200: raise InferenceServerError(data.get("error", f"HTTP {response.status}"))
+        return data
+
+    def health(self) -> bool:
+        return bool(self._request("GET", "/health").get("ok"))
+
+    def stats(self) -> dict:
+        return self._request("GET", "/stats")
+
+    def chat(self, prompt: str) -> dict:
+        return self._request("POST", "/chat", {"client": self.client_id, "prompt": prompt})
+
+    def reset(self):
+        self._request("POST", "/reset", {"client": self.client_id})
+
+    def detect(self, rgb_image, model: str = "hog", skip_boxes=None):
+        """Same contract as face_pipeline.detect_and_encode: (locations, encodings with None for skipped faces)."""
+        data = self._request("POST", "/detect", {"client": self.client_id, "image": encode_array(rgb_image), "model": model,
+                                                 "skip_boxes": [list(box) for box in skip_boxes or []]})
+        return [tuple(loc) for loc in data["locations"]], data["encodings"]
+
+    def encode_image_file(self, path: str):
+        """First face encoding in an image file (decoded on the server), or None."""
+        import numpy as np
+        with open(path, "rb") as f: data = base64.b64encode(f.read()).decode("ascii")
+        encodings = [e for e in self._request("POST", "/detect", {"client": self.client_id, "image_file": data})["encodings"] if e]
+        return np.asarray(encodings[0]) if encodings else None
+
+class RemoteConversation:
+    """Client-side handle on this robot's conversation, which lives on the server."""
+    def __init__(self, client: InferenceClient):
+        self.client = client
+        self.tokens = 0
+        self.stats = {}
+
+    def __len__(self):
+        return self.tokens
+
+    def reset(self):
+        self.client.reset(); self.tokens = 0
+
+class RemoteChatModel:
+    """LocalChatModel stand-in that forwards to the inference server (replies arrive whole, then stream as words)."""
+    def __init__(self, client: InferenceClient):
+        self.client = client
+        self.tokenizer = None
+        self.last_metrics = None
+        self.last_reply = ""
+        self.last_batch = {}
+
+    def new_conversation(self, token_budget: int = None) -> RemoteConversation:
+        conversation = RemoteConversation(self.client); conversation.reset() # A restarted robot starts fresh
+        return conversation
+
+    def reply(self, state: RemoteConversation, prompt: str, stop_event=None, metrics=None) -> str:
+        from chat_engine import StreamMetrics
+        metrics = self.last_metrics = metrics or StreamMetrics()
+        if stop_event is not None and stop_event.is_set(): metrics.finished_at = time.monotonic(); return ""
+        data = self.client.chat(prompt)
+        state.tokens, state.stats = data["history_tokens"], dict(data["conversation"], queue_wait_ms=data["queue_wait_ms"],
+                                                                batch_size=data["batch_size"])
+        self.last_batch = {"queue_wait_ms": data["queue_wait_ms"], "batch_size": data["batch_size"]}
+        metrics.finished_at = time.monotonic()
+        self.last_reply = data["reply"]
+        return self.last_reply
+
+    def stream(self, state: RemoteConversation, prompt: str, stop_event=None, metrics=None):
+        text = self.reply(state, prompt, stop_event, metrics)
+        metrics = self.last_metrics
+        for i, word in enumerate(text.split()):
+            if stop_event is not None and stop_event.is_set(): break
+            if metrics.first_token_at is None: metrics.first_token_at = time.monotonic()
+            metrics.pieces += 1
+            yield (" " if i else "") + word
+
+class RemoteDetectExecutor:
+    """
+    Executor for face_pipeline.use_detect_executor(): submit(detect_and_encode, frame, ...)
+    sends the frame to the server instead of a local dlib process.
+    """
+    def __init__(self, client: InferenceClient, workers: int = FACE_DETECT_WORKERS):
+        self.client = client
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="RemoteDetect")
+
+    def submit(self, fn, rgb_image, model: str = "hog", skip_boxes=None):
+        return self._pool.submit(self.client.detect, rgb_image, model, skip_boxes)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+# --- Synthetic model for --bench without transformers ---
+class _SyntheticConversation:
+    def __init__(self):
+        self.turns = 0; self.stats = {"turns": 0}
+    def __len__(self): return self.turns * 12
+
+class SyntheticChatModel:
+    """Costs base_sec per generate() call plus per_item_sec per conversation in it, like a CPU-bound batch."""
+    def __init__(self, base_sec: float = 0.4, per_item_sec: float = 0.05):
+        self.base_sec = base_sec
+        self.per_item_sec = per_item_sec
+
+    def new_conversation(self, token_budget: int = None): return _SyntheticConversation()
+
+    def reply_batch(self, states, prompts, stop_event=None) -> list:
+        time.sleep(self.base_sec + self.per_item_sec * len(states))
+        for state in states: state.turns += 1; state.stats["turns"] += 1
+        return [f"Reply {state.turns} to '{prompt}'." for state, prompt in zip(states, prompts)]
+
+    def reply(self, state, prompt: str, stop_event=None) -> str:
+        return self.reply_batch([state], [prompt])[0]
+
+# --- Benchmark ---
+def run_bench(chat_model, client_counts, requests_per_client: int, address: str, max_batch: int, window_sec: float) -> list:
+    """Adds clients step by step; each level gets a fresh service so its stats stand alone."""
+    rows = []
+    for clients in client_counts:
+        service = InferenceService(chat_model, faces=False, max_batch=max_batch, window_sec=window_sec)
+        server = serve(service, address)
+        latencies = []; errors = []; lock = threading.Lock()
+        def run_client(i):
+            client = InferenceClient(server.address, client_id=f"bench-{clients}-{i}")
+            for n in range(requests_per_client):
+                started = time.monotonic()
+                try: client.chat(f"Tell me something about topic {n}.")
+                except InferenceServerError as e:
+                    with lock: errors.append(str(e))
+                    continue
+                with lock: latencies.append((time.monotonic() - started) * 1000.0)
+        started = time.monotonic()
+        threads = [threading.Thread(target=run_client, args=(i,)) for i in range(clients)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        elapsed = time.monotonic() - started
+        chat = service.report()["chat"]
+        server.shutdown(); server.server_close(); service.stop()
+        rows.append({"clients": clients, "requests": len(latencies), "errors": len(errors),
+                     "throughput_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                     "latency": _percentiles(latencies), "queue_wait": chat["queue_wait"], "mean_batch": chat["mean_batch"]})
+        row = rows[-1]
+        print(f"{clients:>3} clients: {row['throughput_per_sec']:>6} req/s, latency {row['latency']}, "
+              f"queue wait {row['queue_wait']}, mean batch {row['mean_batch']}" + (f", {len(errors)} errors" if errors else ""))
+    return rows
+
+def _load_chat_model(backend: str, model_name: str, threads: int):
+    from chat_backends import load_chat_backend
+    from chat_engine import LocalChatModel
+    model, tokenizer = load_chat_backend(backend, model_name, threads)
+    return LocalChatModel(model, tokenizer)
+
+def main() -> int:
+    from chat_backends import BACKEND_FP32, DEFAULT_MODEL_NAME
+    parser = argparse.ArgumentParser(description="Shared local inference server for Loki robots.")
+    parser.add_argument("--address", default=os.environ.get("LOKI_INFERENCE_SERVER", DEFAULT_ADDRESS))
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backend", default=os.environ.get("LOKI_AI_BACKEND", BACKEND_FP32))
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_SEC * 1000.0)
+    parser.add_argument("--history-tokens", type=int, default=512)
+    parser.add_argument("--face-workers", type=int, default=FACE_DETECT_WORKERS)
+    parser.add_argument("--no-faces", action="store_true", help="Serve chat only")
+    parser.add_argument("--bench", help="Comma-separated client counts to benchmark, e.g. 1,2,4,8")
+    parser.add_argument("--requests", type=int, default=10, help="Chat requests per client in --bench")
+    parser.add_argument("--synthetic", action="store_true", help="Benchmark with a synthetic model (no transformers needed)")
+    args = parser.parse_args()
+    window_sec = args.window_ms / 1000.0
+
+    chat_model = SyntheticChatModel() if args.synthetic else _load_chat_model(args.backend, args.model, args.threads)
+    if args.bench:
+        address = args.address if args.address != DEFAULT_ADDRESS else "127.0.0.1:0"
+        run_bench(chat_model, [int(n) for n in args.bench.split(",")], args.requests, address, args.max_batch, window_sec)
+        return 0
+
+    service = InferenceService(chat_model, faces=not args.no_faces, max_batch=args.max_batch, window_sec=window_sec,
+                               history_tokens=args.history_tokens, face_workers=args.face_workers)
+    server = serve(service, args.address)
+    print(f"Robot Log: Inference server listening on {server.address} (chat {args.backend}, faces {'off' if args.no_faces else 'on'}).")
+    try:
+        while True:
+            time.sleep(60.0); print(f"Robot Log: Inference server stats: {service.report()}")
+    except KeyboardInterrupt: pass
+    finally:
+        server.shutdown(); server.server_close(); service.stop()
+        if not args.no_faces and "face_pipeline" in sys.modules: sys.modules["face_pipeline"].shutdown_detect_executor()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
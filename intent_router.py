@@ -0,0 +1,137 @@
+
+# intent_router.py (Declarative voice intents compiled into one word-level Aho-Corasick matcher)
+
+import re
+import collections
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+SLOT_RE = re.compile(r"\{(\w+)\}")
+
+IntentMatch = collections.namedtuple("IntentMatch", "intent template slots start end")
+
+class Intent:
+    """
+    A command Loki understands. Templates are word phrases with optional {slots}, e.g.
+    "play {term} on youtube"; they match on whole words only ("time" never fires inside
+    "sometimes"). When several intents match, the highest priority wins, then the longest
+    trigger, then the earliest one in the sentence. exact=True templates must be the whole command.
+    background=True marks slow handlers the caller should run off the listening thread, with
+    timeout seconds before they are cancelled.
+    """
+    def __init__(self, name: str, templates, handler=None, priority: int = 0, exact: bool = False,
+                 background: bool = False, timeout: float = None):
+        self.name = name
+        self.templates = [templates] if isinstance(templates, str) else list(templates)
+        self.handler = handler # handler(command, slots) -> result
+        self.priority = priority
+        self.exact = exact
+        self.background = background
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"Intent({self.name!r}, priority={self.priority})"
+
+class _Template:
+    def __init__(self, intent: Intent, text: str):
+        self.intent = intent
+        self.text = text
+        self.segments = [] # Alternating literal word tuples and slot names, starting with a literal
+        position = 0
+        for m in SLOT_RE.finditer(text):
+            words = tuple(TOKEN_RE.findall(text[position:m.start()].lower()))
+            if words: self.segments.append(words)
+            elif not self.segments or isinstance(self.segments[-1], str):
+                raise ValueError(f"Intent '{intent.name}': template '{text}' needs words before each slot")
+            self.segments.append(m.group(1)); position = m.end()
+        tail = tuple(TOKEN_RE.findall(text[position:].lower()))
+        if tail: self.segments.append(tail)
+        if not self.segments: raise ValueError(f"Intent '{intent.name}': empty template")
+        self.anchor = self.segments[0] # What the automaton looks for; the rest is checked on a hit
+        self.rank = (intent.priority, sum(len(s) for s in self.segments if not isinstance(s, str)))
+
+    def verify(self, tokens, spans, command: str, start: int):
+        """Matches the remaining segments after the anchor at token `start`; returns (slots, end) or None."""
+        i = start + len(self.anchor); slots = {}; rest = self.segments[1:]
+        for k, segment in enumerate(rest):
+            if not isinstance(segment, str): # Literal right after the previous literal
+                if tuple(tokens[i:i + len(segment)]) != segment: return None
+                i += len(segment); continue
+            following = rest[k + 1] if k + 1 < len(rest) else None
+            if following is None: # Trailing slot takes the rest of the command
+                end = len(tokens)
+            else: # Slot runs up to the next occurrence of the following literal
+                end = next((j for j in range(i, len(tokens) - len(following) + 1)
+                            if tuple(tokens[j:j + len(following)]) == following), None)
+                if end is None: return None
+            slots[segment] = command[spans[i][0]:spans[end - 1][1]].strip() if end > i else ""
+            i = end
+        if self.intent.exact and (start != 0 or i != len(tokens)): return None
+        return slots, i
+
+class IntentRouter:
+    """
+    Compiles every intent's trigger phrases into one Aho-Corasick automaton over words, so a
+    command is scanned once regardless of how many intents exist or in what order they were
+    registered. route() returns the winning IntentMatch, or None to fall back (local AI).
+    """
+    def __init__(self, intents=()):
+        self.intents = []
+        self._templates = []
+        self._ranks = {}
+        self._compiled = False
+        for intent in intents: self.add(intent)
+
+    def add(self, intent: Intent):
+        if any(existing.name == intent.name for existing in self.intents):
+            raise ValueError(f"Duplicate intent '{intent.name}'")
+        self.intents.append(intent)
+        for text in intent.templates:
+            template = _Template(intent, text)
+            self._templates.append(template); self._ranks[intent.name, text] = template.rank
+        self._compiled = False
+        return intent
+
+    def get(self, name: str) -> Intent:
+        return next(intent for intent in self.intents if intent.name == name)
+
+    def _compile(self):
+        goto = [{}]; outputs = [[]]
+        for template in self._templates: # Trie of anchors
+            node = 0
+            for word in template.anchor:
+                if word not in goto[node]:
+                    goto.append({}); outputs.append([]); goto[node][word] = len(goto) - 1
+                node = goto[node][word]
+            outputs[node].append(template)
+        fail = [0] * len(goto); pending = collections.deque(goto[0].values())
+        while pending: # Breadth-first failure links; outputs inherit from their fallback node
+            node = pending.popleft()
+            for word, child in goto[node].items():
+                pending.append(child)
+                f = fail[node]
+                while f and word not in goto[f]: f = fail[f]
+                fail[child] = goto[f][word] if word in goto[f] and goto[f][word] != child else 0
+                outputs[child] = outputs[child] + outputs[fail[child]]
+        self._goto, self._fail, self._outputs = goto, fail, outputs
+        self._compiled = True
+
+    def candidates(self, command: str):
+        """Every template whose full pattern matches, as IntentMatch tuples (unsorted)."""
+        if not self._compiled: self._compile()
+        spans = []; tokens = []
+        for m in TOKEN_RE.finditer(command.lower()): tokens.append(m.group()); spans.append(m.span())
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        node = 0; found = []
+        for position, word in enumerate(tokens):
+            while node and word not in goto[node]: node = fail[node]
+            node = goto[node].get(word, 0)
+            for template in outputs[node]:
+                start = position + 1 - len(template.anchor)
+                verified = template.verify(tokens, spans, command, start)
+                if verified: found.append(IntentMatch(template.intent, template.text, verified[0], start, verified[1]))
+        return found
+
+    def route(self, command: str):
+        found = self.candidates(command)
+        if not found: return None
+        return max(found, key=lambda m: (self._ranks[m.intent.name, m.template], -m.start))
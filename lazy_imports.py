@@ -0,0 +1,93 @@
+
+# lazy_imports.py (Deferred heavy imports with a per-subsystem import-time report)
+
+import importlib
+import json
+import sys
+import threading
+import time
+
+IMPORT_REPORT_FILE = "import_times.json"
+
+_IMPORT_RECORDS = [] # [{"module", "subsystem", "seconds", "phase"}]
+_RECORDS_LOCK = threading.Lock()
+_PROCESS_START = time.perf_counter()
+_report_path = None # Set by write_import_report(); later lazy loads keep the file up to date
+
+def _record(module_name: str, subsystem: str, seconds: float, phase: str):
+    with _RECORDS_LOCK:
+        _IMPORT_RECORDS.append({"module": module_name, "subsystem": subsystem,
+                                "seconds": round(seconds, 4), "phase": phase,
+                                "at_s": round(time.perf_counter() - _PROCESS_START, 3)})
+    if _report_path: write_import_report(_report_path)
+
+class LazyModule:
+    """
+    Stands in for a module until an attribute is first used, then imports it (timed) and
+    forwards everything to the real module. Works for `mod.func()` and `except mod.Error:`.
+    """
+    def __init__(self, module_name: str, subsystem: str):
+        object.__setattr__(self, "_lazy_name", module_name)
+        object.__setattr__(self, "_lazy_subsystem", subsystem)
+        object.__setattr__(self, "_lazy_module", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_load(self):
+        module = object.__getattribute__(self, "_lazy_module")
+        if module is not None: return module
+        with object.__getattribute__(self, "_lazy_lock"):
+            module = object.__getattribute__(self, "_lazy_module")
+            if module is None:
+                name = object.__getattribute__(self, "_lazy_name")
+                already_loaded = name in sys.modules
+                start = time.perf_counter()
+                module = importlib.import_module(name)
+                if not already_loaded:
+                    _record(name, object.__getattribute__(self, "_lazy_subsystem"), time.perf_counter() - start, "first use")
+                object.__setattr__(self, "_lazy_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._lazy_load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if object.__getattribute__(self, "_lazy_module") is not None else "not loaded"
+        return f"<lazy module '{object.__getattribute__(self, '_lazy_name')}' ({state})>"
+
+def lazy_import(module_name: str, subsystem: str) -> LazyModule:
+    return LazyModule(module_name, subsystem)
+
+def timed_import(module_name: str, subsystem: str):
+    """Eager import that still shows up in the report (phase 'startup')."""
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _record(module_name, subsystem, time.perf_counter() - start, "startup")
+    return module
+
+def is_loaded(module) -> bool:
+    """False for a LazyModule nobody has touched yet; True for real modules."""
+    if isinstance(module, LazyModule): return object.__getattribute__(module, "_lazy_module") is not None
+    return True
+
+def import_report() -> dict:
+    """Seconds per subsystem, split into startup and first-use imports, plus the raw records."""
+    with _RECORDS_LOCK: records = list(_IMPORT_RECORDS)
+    subsystems = {}
+    for r in records:
+        entry = subsystems.setdefault(r["subsystem"], {"startup_s": 0.0, "first_use_s": 0.0, "modules": []})
+        entry["startup_s" if r["phase"] == "startup" else "first_use_s"] += r["seconds"]
+        entry["modules"].append(r["module"])
+    for entry in subsystems.values():
+        entry["startup_s"] = round(entry["startup_s"], 4); entry["first_use_s"] = round(entry["first_use_s"], 4)
+    return {"subsystems": subsystems, "records": records}
+
+def write_import_report(path: str = IMPORT_REPORT_FILE):
+    global _report_path
+    _report_path = path
+    try:
+        with open(path, "w") as f: json.dump(import_report(), f, indent=2)
+    except OSError as e:
+        print(f"Robot Warning: Could not write import report '{path}': {e}")
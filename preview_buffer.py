@@ -0,0 +1,88 @@
+
+# preview_buffer.py (Preallocated webcam preview shared between a camera loop and the GUI)
+
+import threading
+
+import numpy as np
+import cv2
+from face_pipeline import StageStats
+
+# --- Configuration Constants ---
+PREVIEW_SIZE = (320, 240) # (width, height) the GUI shows; overlays are drawn at this size
+BOX_COLOR = (0, 180, 50) # BGR green, as in the old CV2 window
+BOX_THICKNESS = 1
+
+class PreviewBuffer:
+    """
+    Three preallocated preview-size slots and a frame sequence number (triple buffering).
+    The camera thread resizes each frame straight into its back slot, draws the face boxes
+    there and swaps it in as the latest; the GUI calls latest() at its own refresh rate and
+    gets the newest slot, which the camera won't touch until the GUI's next call. Nothing is
+    allocated or copied per frame on either side, and a slow GUI simply skips frames.
+    One camera thread publishes, one GUI thread reads.
+    """
+    def __init__(self, size=PREVIEW_SIZE, rgb: bool = True):
+        self.width, self.height = size
+        self.rgb = rgb # Pygame wants RGB; False keeps OpenCV's BGR (for cv2.imshow)
+        self.slots = [np.zeros((self.height, self.width, 3), dtype=np.uint8) for _ in range(3)]
+        self.seq = 0 # Frames published so far
+        self.skipped = 0 # Published frames replaced before the GUI read them
+        self.stats = {"published": StageStats(), "displayed": StageStats()}
+        self._slot_seq = [0, 0, 0]
+        self._back, self._ready, self._front = 0, 1, 2
+        self._fresh = False
+        self._lock = threading.Lock()
+        self._box_color = BOX_COLOR[::-1] if rgb else BOX_COLOR
+        self._surfaces = None
+
+    # --- Camera side ---
+    def publish(self, frame, boxes=(), box_scale: float = 1.0) -> int:
+        """
+        Writes a BGR camera frame into the back slot and makes it the latest. boxes are
+        (top, right, bottom, left) on an image box_scale times the frame's size (e.g. boxes
+        from the quarter-size detection frame with box_scale=0.25). Returns the new seq.
+        """
+        slot = self.slots[self._back]
+        cv2.resize(frame, (self.width, self.height), dst=slot)
+        if self.rgb: cv2.cvtColor(slot, cv2.COLOR_BGR2RGB, dst=slot)
+        sx = self.width / (frame.shape[1] * box_scale); sy = self.height / (frame.shape[0] * box_scale)
+        for (top, right, bottom, left) in boxes:
+            cv2.rectangle(slot, (int(left * sx), int(top * sy)), (int(right * sx), int(bottom * sy)),
+                          self._box_color, BOX_THICKNESS)
+        with self._lock:
+            self.seq += 1; self._slot_seq[self._back] = self.seq
+            if self._fresh: self.skipped += 1
+            self._back, self._ready = self._ready, self._back
+            self._fresh = True
+        self.stats["published"].tick()
+        return self.seq
+
+    # --- GUI side ---
+    def _acquire(self) -> int:
+        with self._lock:
+            fresh = self._fresh
+            if fresh: self._front, self._ready = self._ready, self._front; self._fresh = False
+            front = self._front
+        if fresh: self.stats["displayed"].tick()
+        return front
+
+    def latest(self):
+        """(seq, frame) of the newest preview; compare seq with the last one drawn to skip redraws (0 = nothing yet)."""
+        front = self._acquire()
+        return self._slot_seq[front], self.slots[front]
+
+    def surface(self):
+        """(seq, pygame.Surface) sharing the newest slot's memory; the three Surfaces are made once."""
+        import pygame
+        if self._surfaces is None:
+            self._surfaces = [pygame.image.frombuffer(slot, (self.width, self.height), "RGB" if self.rgb else "BGR")
+                              for slot in self.slots]
+        front = self._acquire()
+        return self._slot_seq[front], self._surfaces[front]
+
+    def report(self) -> dict:
+        """Preview rates, separate from the recognition rate the camera loop reports."""
+        return {"preview_size": f"{self.width}x{self.height}", "published": self.seq,
+                "published_fps": round(self.stats["published"].fps(), 1),
+                "displayed": self.stats["displayed"].total,
+                "displayed_fps": round(self.stats["displayed"].fps(), 1), "skipped": self.skipped}
@@ -0,0 +1,274 @@
+
+# profile_store.py (SQLite user profiles: names, face references, last seen, conversation summaries)
+
+import os
+import time
+import sqlite3
+import threading
+import itertools
+import collections
+
+# --- Configuration Constants ---
+PROFILE_DB_FILE = "loki_profiles.db"
+PROFILE_CACHE_SIZE = 1000 # Profiles kept in memory (LRU); profiles with unsaved changes are never evicted
+WRITE_BEHIND_SEC = 2.0 # Changes reach the database this long after the first unsaved one
+SUMMARY_TURNS = 6 # Exchanges kept in a user's rolling conversation summary
+SUMMARY_MAX_CHARS = 2000
+CURRENT_USER_KEY = "current_user" # settings row that replaces memory.txt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name_key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_seen REAL,
+    seen_count INTEGER NOT NULL DEFAULT 0,
+    summary TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS users_last_seen ON users (last_seen);
+CREATE TABLE IF NOT EXISTS face_refs (
+    face_key TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS face_refs_user ON face_refs (user_id);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+"""
+USER_COLUMNS = ("name", "created_at", "last_seen", "seen_count", "summary")
+UPSERT_USER = """
+INSERT INTO users (name_key, name, created_at, last_seen, seen_count, summary) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (name_key) DO UPDATE SET name = excluded.name, last_seen = excluded.last_seen,
+    seen_count = excluded.seen_count, summary = excluded.summary
+"""
+UPSERT_FACE_REF = """
+INSERT INTO face_refs (face_key, user_id, content_hash) VALUES (?, (SELECT id FROM users WHERE name_key = ?), ?)
+ON CONFLICT (face_key) DO UPDATE SET user_id = excluded.user_id, content_hash = excluded.content_hash
+"""
+
+def name_key(name: str) -> str:
+    """Lookup key for a name: "alice", "Alice " and "ALICE" are the same person."""
+    return " ".join((name or "").split()).lower()
+
+def summary_exchanges(summary: str) -> list:
+    """(prompt, reply) pairs back out of a rolling summary written by note_exchange()."""
+    exchanges = []
+    for turn in (summary or "").split("\n\n"):
+        prompt, sep, reply = turn.partition("\nLoki: ")
+        if sep and prompt.startswith("User: "): exchanges.append((prompt[len("User: "):], reply))
+    return exchanges
+
+class ProfileStore:
+    """
+    One row per user (keyed by name, as the face gallery and "my name is ..." both name people),
+    with their face image references, last-seen time, sighting count and a rolling summary of
+    recent exchanges. Reads go through an in-memory LRU, so recognizing a face and loading that
+    user's profile is a dict hit, or one indexed SELECT on a miss. Changes are applied to the
+    cache at once and written behind by a thread, batched into one WAL transaction per
+    WRITE_BEHIND_SEC, so calling touch() on every recognized frame costs no disk I/O.
+    """
+    def __init__(self, path: str = PROFILE_DB_FILE, legacy_memory_file: str = None,
+                 cache_size: int = PROFILE_CACHE_SIZE, write_behind_sec: float = WRITE_BEHIND_SEC):
+        self.path = path
+        self.cache_size = cache_size
+        self.write_behind_sec = write_behind_sec
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "flushes": 0, "write_errors": 0, "last_flush_ms": 0.0}
+        self._users = collections.OrderedDict() # name_key -> profile dict, least recently used first
+        self._dirty = set() # name_keys with unsaved changes
+        self._writing = {} # name_key -> profile snapshot being written right now
+        self._face_refs = {} # face_key -> name_key (all of them; small)
+        self._pending_faces = {} # face_key -> (name_key, content_hash), or None to delete
+        self._pending_settings = {}
+        self._settings = {}
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._io_lock = threading.Lock() # One flush at a time
+        self._stopped = False
+        self._db = self._connect() # Reads, on caller threads under _lock
+        with self._db: self._db.executescript(SCHEMA)
+        self._write_db = self._connect() # Flushes, under _io_lock; WAL lets reads carry on meanwhile
+        self._settings = dict(self._db.execute("SELECT key, value FROM settings"))
+        self._face_refs = dict(self._db.execute("SELECT f.face_key, u.name_key FROM face_refs f JOIN users u ON u.id = f.user_id"))
+        if legacy_memory_file: self._import_legacy(legacy_memory_file)
+        self._thread = threading.Thread(target=self._run, name="ProfileStoreWriter", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+
+    def _import_legacy(self, memory_file: str):
+        """One-time import of the single name memory.txt held (the file is left in place)."""
+        if CURRENT_USER_KEY in self._settings or not os.path.exists(memory_file): return
+        try:
+            with open(memory_file, encoding="utf-8") as f: name = f.read().strip()
+        except OSError as e: print(f"Robot Warning: Could not read '{memory_file}': {e}"); return
+        if name:
+            self.set_current(name); self.flush()
+            print(f"Robot Log: Imported '{name}' from {memory_file} into the profile store.")
+
+    # --- Reads ---
+    def get(self, name: str):
+        """A copy of the user's profile dict, or None if they have never been stored."""
+        with self._lock:
+            profile = self._lookup(name_key(name))
+            return dict(profile) if profile else None
+
+    def _lookup(self, key: str):
+        profile = self._users.get(key)
+        if profile is not None:
+            self._users.move_to_end(key); self.stats["hits"] += 1; return profile
+        self.stats["misses"] += 1
+        profile = self._writing.get(key)
+        if profile is None:
+            row = self._db.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE name_key = ?", (key,)).fetchone()
+            if row is None: return None
+            profile = dict(zip(USER_COLUMNS, row))
+        profile = dict(profile); self._cache(key, profile)
+        return profile
+
+    def _cache(self, key: str, profile: dict):
+        self._users[key] = profile; self._users.move_to_end(key)
+        self._trim(keep=key)
+
+    def _trim(self, keep: str = None):
+        """Evicts least recently used saved profiles down to cache_size (unsaved ones wait for the flush)."""
+        excess = len(self._users) - self.cache_size
+        if excess <= 0 or len(self._users) - len(self._dirty) <= 1: return
+        victims = list(itertools.islice((k for k in self._users if k not in self._dirty and k != keep), excess))
+        for victim in victims: del self._users[victim]
+
+    def for_face(self, face_key: str):
+        """Profile of whoever the face image face_key (a known_faces/ file name) belongs to."""
+        with self._lock:
+            key = self._face_refs.get(face_key)
+            return self.get(key) if key else None
+
+    def faces_of(self, name: str) -> list:
+        key = name_key(name)
+        with self._lock: return sorted(f for f, k in self._face_refs.items() if k == key)
+
+    def current_user(self):
+        """Name of the last active user (what memory.txt used to hold), or None."""
+        with self._lock: return self._settings.get(CURRENT_USER_KEY) or None
+
+    def user_count(self) -> int:
+        self.flush()
+        with self._lock: return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    # --- Writes (cache now, database on the next flush) ---
+    def _profile_for_update(self, name: str) -> dict:
+        key = name_key(name)
+        if not key: raise ValueError("A profile needs a name.")
+        profile = self._lookup(key)
+        if profile is None:
+            profile = {"name": " ".join(name.split()).title(), "created_at": time.time(), "last_seen": None,
+                       "seen_count": 0, "summary": ""}
+            self._cache(key, profile)
+        self._dirty.add(key); self._schedule()
+        return profile
+
+    def ensure_user(self, name: str) -> dict:
+        with self._lock: return dict(self._profile_for_update(name))
+
+    def touch(self, name: str, when: float = None) -> dict:
+        """Records a sighting (face or voice) and returns the updated profile."""
+        with self._lock:
+            profile = self._profile_for_update(name)
+            profile["last_seen"] = when if when is not None else time.time(); profile["seen_count"] += 1
+            return dict(profile)
+
+    def set_current(self, name: str) -> dict:
+        """Makes name the active user (created if new) and records the sighting."""
+        with self._lock:
+            profile = self.touch(name)
+            self._settings[CURRENT_USER_KEY] = profile["name"]
+            self._pending_settings[CURRENT_USER_KEY] = profile["name"]
+            return profile
+
+    def set_summary(self, name: str, summary: str):
+        with self._lock: self._profile_for_update(name)["summary"] = summary[-SUMMARY_MAX_CHARS:]
+
+    def note_exchange(self, name: str, prompt: str, reply: str):
+        """Appends one exchange to the user's rolling summary (the last SUMMARY_TURNS are kept)."""
+        with self._lock:
+            profile = self._profile_for_update(name)
+            turns = [t for t in profile["summary"].split("\n\n") if t] + [f"User: {prompt.strip()}\nLoki: {reply.strip()}"]
+            profile["summary"] = "\n\n".join(turns[-SUMMARY_TURNS:])[-SUMMARY_MAX_CHARS:]
+
+    def sync_faces(self, faces):
+        """
+        Brings the face references in line with the gallery: faces is [(face_key, name, content_hash)].
+        Users are created for new names; references to images no longer in the gallery are dropped.
+        """
+        with self._lock:
+            seen = set()
+            for face_key, name, content_hash in faces:
+                key = name_key(name); seen.add(face_key)
+                if self._face_refs.get(face_key) == key: continue
+                self._profile_for_update(name)
+                self._face_refs[face_key] = key; self._pending_faces[face_key] = (key, content_hash)
+            for face_key in set(self._face_refs) - seen:
+                del self._face_refs[face_key]; self._pending_faces[face_key] = None
+            if self._pending_faces: self._schedule()
+
+    # --- Write-behind ---
+    def _schedule(self): # Caller holds the lock
+        self._cond.notify()
+
+    def _has_pending(self) -> bool:
+        return bool(self._dirty or self._pending_faces or self._pending_settings)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or self._has_pending())
+                if not self._stopped: self._cond.wait_for(lambda: self._stopped, self.write_behind_sec) # Let changes batch up
+                stopped = self._stopped
+            self.flush()
+            if stopped: return
+
+    def flush(self):
+        """Writes every pending change in one transaction."""
+        with self._io_lock:
+            with self._lock:
+                if not self._has_pending(): return
+                self._writing = {key: dict(self._users[key]) for key in self._dirty if key in self._users}
+                faces, settings = self._pending_faces, self._pending_settings
+                self._dirty = set(); self._pending_faces = {}; self._pending_settings = {}
+            started = time.perf_counter()
+            users = [(key,) + tuple(p[c] for c in USER_COLUMNS) for key, p in self._writing.items()]
+            try:
+                with self._write_db as db: # One transaction
+                    db.executemany(UPSERT_USER, users)
+                    db.executemany(UPSERT_FACE_REF, [(f, ref[0], ref[1]) for f, ref in faces.items() if ref])
+                    db.executemany("DELETE FROM face_refs WHERE face_key = ?", [(f,) for f, ref in faces.items() if not ref])
+                    db.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", settings.items())
+                self.stats["writes"] += len(users) + len(faces) + len(settings)
+            except sqlite3.Error as e:
+                self.stats["write_errors"] += 1
+                print(f"Robot Warning: Could not write profile store '{self.path}': {e}")
+                with self._lock: # Put everything back for the next flush
+                    for key, profile in self._writing.items(): self._cache(key, self._users.get(key, profile))
+                    self._dirty |= set(self._writing)
+                    self._pending_faces = dict(faces, **self._pending_faces)
+                    self._pending_settings = dict(settings, **self._pending_settings)
+            with self._lock: self._writing = {}; self._trim()
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+
+    # --- Lifecycle ---
+    def close(self, timeout: float = 5.0):
+        with self._cond: self._stopped = True; self._cond.notify()
+        self._thread.join(timeout)
+        with self._io_lock: self._write_db.close()
+        with self._lock: self._db.close()
+
+    def report(self) -> dict:
+        with self._lock:
+            return dict(self.stats, cached=len(self._users), unsaved=len(self._dirty), face_refs=len(self._face_refs),
+                        path=self.path)
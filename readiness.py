@@ -0,0 +1,107 @@
+
+# readiness.py (Background component loading with readiness tracking)
+
+import threading
+import time
+import traceback
+
+STATUS_PENDING = "pending"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+class Component:
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader # Returns True when the component is usable
+        self.status = STATUS_PENDING
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.ready_event = threading.Event() # Set when loading finished, ready or failed
+        self.waiting_callbacks = [] # Run on the loader thread once ready
+
+    def duration(self):
+        if self.started_at is None: return None
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+class ComponentRegistry:
+    """
+    Starts slow components (local AI model, face gallery, ...) on their own threads so the
+    assistant can take fast-path commands right away, and lets callers wait on a component
+    or queue work to run once it is up.
+    """
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self.components = {}
+        self._lock = threading.Lock()
+
+    def start(self, name: str, loader):
+        component = Component(name, loader)
+        with self._lock: self.components[name] = component
+        threading.Thread(target=self._load, args=(component,), name=f"Load-{name}", daemon=True).start()
+        return component
+
+    def _load(self, component: Component):
+        component.status = STATUS_LOADING
+        component.started_at = time.monotonic()
+        print(f"Robot Log: Loading component '{component.name}' in background...")
+        try:
+            ok = bool(component.loader())
+        except Exception as e:
+            print(f"Robot Error: Component '{component.name}' failed to load: {e}")
+            traceback.print_exc()
+            component.error = e; ok = False
+        component.finished_at = time.monotonic()
+        with self._lock:
+            component.status = STATUS_READY if ok else STATUS_FAILED
+            callbacks, component.waiting_callbacks = component.waiting_callbacks, []
+        component.ready_event.set()
+        print(f"Robot Log: Component '{component.name}' {component.status} in {component.duration():.2f}s.")
+        if ok:
+            for callback in callbacks:
+                try: callback()
+                except Exception as e: print(f"Robot Error: Deferred '{component.name}' task failed: {e}"); traceback.print_exc()
+        elif callbacks:
+            print(f"Robot Log: Dropped {len(callbacks)} task(s) waiting on failed component '{component.name}'.")
+
+    # --- Queries ---
+    def status(self, name: str) -> str:
+        component = self.components.get(name)
+        return component.status if component else STATUS_PENDING
+
+    def is_ready(self, name: str) -> bool:
+        return self.status(name) == STATUS_READY
+
+    def is_loading(self, name: str):
+        """True while loading, False once ready or failed, None if no component by that name was started."""
+        component = self.components.get(name)
+        if component is None: return None
+        return component.status in (STATUS_PENDING, STATUS_LOADING)
+
+    def wait(self, name: str, timeout: float = None) -> bool:
+        component = self.components.get(name)
+        return bool(component and component.ready_event.wait(timeout) and component.status == STATUS_READY)
+
+    def when_ready(self, name: str, callback) -> bool:
+        """
+        Runs callback once the component is ready (right away, on this thread, if it already is).
+        Returns False if it failed or was never started. The status is read and the callback
+        queued in one critical section, the same one _load() uses to publish the final status
+        and take the queue, so a callback is never queued after the loader has taken it.
+        """
+        with self._lock:
+            component = self.components.get(name)
+            if component is None: return False
+            status = component.status
+            if status in (STATUS_PENDING, STATUS_LOADING):
+                component.waiting_callbacks.append(callback); return True
+        if status != STATUS_READY: return False
+        callback(); return True
+
+    def report(self) -> dict:
+        """{name: {"status", "seconds"}} plus time since the registry was created."""
+        out = {name: {"status": c.status, "seconds": round(c.duration(), 2) if c.duration() is not None else None}
+               for name, c in self.components.items()}
+        out["_since_start_s"] = round(time.monotonic() - self.created_at, 2)
+        return out
@@ -0,0 +1,218 @@
+
+# recognition_log.py (Buffered, rotating face recognition event log written off the camera thread)
+#
+# Usage: python recognition_log.py src/face_recognition_log.csv [--name Alice] [--since 2026-10-01] [--until 2026-10-31]
+# Summarises sightings per person across the log and its rotated files (CSV or compact .rlog).
+
+import os
+import sys
+import csv
+import json
+import glob
+import time
+import struct
+import argparse
+import threading
+import collections
+from datetime import date, datetime
+
+# --- Configuration Constants ---
+LOG_FORMATS = ("csv", "compact") # compact = columnar binary blocks, one per flush (fast filtering with numpy)
+CSV_HEADER = ["timestamp", "name", "distance", "event", "repeats"]
+EVENTS = ("seen", "greeted") # "greeted" = first sighting of the day, "seen" = later sightings (deduplicated)
+FLUSH_INTERVAL_SEC = 2.0
+FLUSH_BATCH = 200 # Flush early once this many entries are waiting
+MAX_PENDING = 2000 # Entries held in memory if the disk stalls; the oldest are dropped beyond this
+MAX_BYTES = 5 * 1024 * 1024 # Rotate once the current file reaches this size
+BACKUPS = 14 # Rotated files kept
+BLOCK_MAGIC = b"LKR1"
+BLOCK_HEADER = struct.Struct("<4sII") # magic, entry count, length of the JSON name table
+
+class RecognitionLogWriter:
+    """
+    log() only appends to an in-memory batch (no I/O on the caller's thread); a writer thread
+    flushes every FLUSH_INTERVAL_SEC or FLUSH_BATCH entries, and rotates the file when the day
+    changes or it grows past max_bytes. Rotated files are named <log>.<date>[.<n>]<ext>.
+    """
+    def __init__(self, path: str, log_format: str = "csv", flush_interval_sec: float = FLUSH_INTERVAL_SEC,
+                 max_bytes: int = MAX_BYTES, rotate_daily: bool = True, backups: int = BACKUPS):
+        if log_format not in LOG_FORMATS: raise ValueError(f"Unknown log format '{log_format}'. Choose csv or compact.")
+        self.path = path
+        self.log_format = log_format
+        self.flush_interval_sec = flush_interval_sec
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backups = backups
+        self.stats = {"logged": 0, "written": 0, "dropped": 0, "flushes": 0, "rotations": 0, "write_errors": 0,
+                      "last_flush_ms": 0.0}
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock() # One flush at a time (writer thread or an explicit flush())
+        self._file_date = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="RecognitionLogWriter", daemon=True)
+        self._thread.start()
+
+    # --- Producer side (camera loop) ---
+    def log(self, name: str, distance: float, event: str = "seen", repeats: int = 0, timestamp: float = None):
+        entry = (timestamp if timestamp is not None else time.time(), name, float(distance), event, int(repeats))
+        with self._cond:
+            if len(self._pending) >= MAX_PENDING:
+                self._pending.popleft(); self.stats["dropped"] += 1
+            self._pending.append(entry); self.stats["logged"] += 1
+            if len(self._pending) >= FLUSH_BATCH: self._cond.notify()
+
+    # --- Writer side ---
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or len(self._pending) >= FLUSH_BATCH, self.flush_interval_sec)
+                stopped = self._stopped
+            self.flush()
+            if stopped: return
+
+    def flush(self):
+        """Writes everything pending now (also called on close())."""
+        with self._io_lock:
+            with self._cond: batch = list(self._pending); self._pending.clear()
+            if not batch: return
+            started = time.perf_counter()
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if self._file_date is None: self._prepare_current_file()
+                start = 0
+                for i, entry in enumerate(batch): # Entries from a new day go to a new file
+                    entry_date = date.fromtimestamp(entry[0])
+                    if self.rotate_daily and entry_date > self._file_date:
+                        self._write(batch[start:i]); start = i
+                        self._rotate(); self._file_date = entry_date
+                self._write(batch[start:])
+                if os.path.getsize(self.path) >= self.max_bytes: self._rotate(); self._file_date = date.today()
+                self.stats["written"] += len(batch)
+            except OSError as e:
+                self.stats["write_errors"] += 1
+                print(f"FaceRecognitionSystem Warning: Could not write recognition log '{self.path}': {e}")
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+
+    def _prepare_current_file(self):
+        """Dates the existing file by its mtime; a CSV with an older header is rotated out first."""
+        if not os.path.exists(self.path): self._file_date = date.today(); return
+        self._file_date = date.fromtimestamp(os.path.getmtime(self.path))
+        if self.log_format == "csv":
+            with open(self.path, newline="", encoding="utf-8") as f: header = next(csv.reader(f), None)
+            if header != CSV_HEADER: self._rotate(); self._file_date = date.today()
+
+    def _write(self, entries):
+        if not entries: return
+        if self.log_format == "compact":
+            with open(self.path, "ab") as f: f.write(encode_block(entries))
+            return
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if is_new: writer.writerow(CSV_HEADER)
+            writer.writerows([datetime.fromtimestamp(ts).isoformat(timespec="seconds"), name, f"{distance:.3f}", event, repeats]
+                             for ts, name, distance, event, repeats in entries)
+
+    def _rotate(self):
+        if not os.path.exists(self.path): return
+        root, ext = os.path.splitext(self.path)
+        target = f"{root}.{self._file_date.isoformat()}{ext}"; n = 1
+        while os.path.exists(target): target = f"{root}.{self._file_date.isoformat()}.{n}{ext}"; n += 1
+        os.replace(self.path, target)
+        self.stats["rotations"] += 1
+        rotated = rotated_files(self.path)
+        for old in rotated[:max(0, len(rotated) - self.backups)]:
+            try: os.remove(old)
+            except OSError: pass
+
+    # --- Lifecycle ---
+    def close(self, timeout: float = 5.0):
+        with self._cond: self._stopped = True; self._cond.notify()
+        self._thread.join(timeout)
+
+    def report(self) -> dict:
+        return dict(self.stats, pending=len(self._pending), path=self.path, format=self.log_format)
+
+# --- Compact format ---
+def encode_block(entries) -> bytes:
+    """One columnar block: header, JSON name table, then timestamp/distance/name/event/repeats columns."""
+    import numpy as np
+    names = sorted({name for _, name, _, _, _ in entries}); ids = {name: i for i, name in enumerate(names)}
+    table = json.dumps(names).encode("utf-8")
+    columns = [np.array([e[0] for e in entries], dtype="<f8"), np.array([e[2] for e in entries], dtype="<f4"),
+               np.array([ids[e[1]] for e in entries], dtype="<u2"), np.array([EVENTS.index(e[3]) for e in entries], dtype="u1"),
+               np.array([e[4] for e in entries], dtype="<u4")]
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, len(entries), len(table)) + table + b"".join(c.tobytes() for c in columns)
+
+def _read_compact(path: str, name: str = None, since: float = None, until: float = None):
+    import numpy as np
+    with open(path, "rb") as f: data = f.read()
+    offset = 0; rows = []
+    while offset + BLOCK_HEADER.size <= len(data):
+        magic, count, table_len = BLOCK_HEADER.unpack_from(data, offset)
+        if magic != BLOCK_MAGIC: break # Truncated or foreign data: stop at the last good block
+        offset += BLOCK_HEADER.size
+        names = json.loads(data[offset:offset + table_len]); offset += table_len
+        columns = []
+        for dtype in ("<f8", "<f4", "<u2", "u1", "<u4"):
+            size = np.dtype(dtype).itemsize * count
+            columns.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset)); offset += size
+        timestamps, distances, name_ids, events, repeats = columns
+        keep = np.ones(count, dtype=bool)
+        if name is not None: keep &= name_ids == (names.index(name) if name in names else -1)
+        if since is not None: keep &= timestamps >= since
+        if until is not None: keep &= timestamps < until
+        rows += [{"timestamp": datetime.fromtimestamp(float(timestamps[i])), "name": names[name_ids[i]],
+                  "distance": float(distances[i]), "event": EVENTS[events[i]], "repeats": int(repeats[i])}
+                 for i in np.nonzero(keep)[0]]
+    return rows
+
+def _read_csv(path: str, name: str = None, since: float = None, until: float = None):
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            if name is not None and record.get("name") != name: continue
+            ts = datetime.fromisoformat(record["timestamp"])
+            if (since is not None and ts.timestamp() < since) or (until is not None and ts.timestamp() >= until): continue
+            rows.append({"timestamp": ts, "name": record["name"], "distance": float(record["distance"]),
+                         "event": record.get("event") or "seen", "repeats": int(record.get("repeats") or 0)})
+    return rows
+
+# --- Queries ---
+def rotated_files(path: str):
+    """Rotated copies of a log, oldest first."""
+    root, ext = os.path.splitext(path)
+    return sorted((p for p in glob.glob(f"{glob.escape(root)}.*{ext}") if p != path), key=os.path.getmtime)
+
+def read_log(path: str, name: str = None, since: float = None, until: float = None, include_rotated: bool = True):
+    """Rows (dicts) from the log and its rotated files, filtered by name and [since, until) epoch seconds."""
+    reader = _read_compact if path.endswith(".rlog") else _read_csv
+    paths = (rotated_files(path) if include_rotated else []) + ([path] if os.path.exists(path) else [])
+    return [row for p in paths for row in reader(p, name, since, until)]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Summarise the face recognition log.")
+    parser.add_argument("path")
+    parser.add_argument("--name")
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD (exclusive)")
+    args = parser.parse_args()
+    def epoch(day): return datetime.fromisoformat(day).timestamp() if day else None
+    started = time.perf_counter()
+    rows = read_log(args.path, args.name, epoch(args.since), epoch(args.until))
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    summary = collections.OrderedDict()
+    for row in rows:
+        s = summary.setdefault(row["name"], {"records": 0, "sightings": 0, "days": set(), "first": row["timestamp"], "last": row["timestamp"]})
+        s["records"] += 1; s["sightings"] += 1 + row["repeats"]; s["days"].add(row["timestamp"].date())
+        s["first"] = min(s["first"], row["timestamp"]); s["last"] = max(s["last"], row["timestamp"])
+    for name, s in summary.items():
+        print(f"{name}: {s['sightings']} sightings ({s['records']} records) on {len(s['days'])} days, "
+              f"first {s['first']:%Y-%m-%d %H:%M}, last {s['last']:%Y-%m-%d %H:%M}")
+    print(f"{len(rows)} records read in {elapsed_ms:.1f} ms.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+
+# response_cache.py (Persistent LRU + TTL cache for Wikipedia summaries and local AI replies)
+
+import os
+import re
+import json
+import time
+import threading
+import collections
+
+# --- Configuration Constants ---
+RESPONSE_CACHE_FILE = "response_cache.json"
+RESPONSE_CACHE_MAX_ENTRIES = 500
+FLUSH_DELAY_SEC = 5.0 # New answers are written to disk this long after the first unsaved one
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s']")
+_SPACE_RE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Cache key text: lowercase, punctuation dropped, whitespace collapsed."""
+    return _SPACE_RE.sub(" ", _PUNCTUATION_RE.sub(" ", (text or "").lower())).strip()
+
+class ResponseCache:
+    """
+    Bounded LRU of answers keyed by (namespace, normalized query), each with its own TTL.
+    Expired answers are not served normally but are kept until evicted, so get(allow_stale=True)
+    can still answer when the live source is unreachable. Saved to a JSON file in the
+    background after changes and on flush().
+    """
+    def __init__(self, path: str = RESPONSE_CACHE_FILE, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict() # "namespace\tquery" -> {"value", "stored_at", "ttl"}
+        self.stats = {"hits": 0, "misses": 0, "stale_hits": 0, "expired": 0, "evicted": 0, "stores": 0}
+        self._lock = threading.Lock()
+        self._flush_timer = None
+        self._load()
+
+    @staticmethod
+    def _key(namespace: str, query: str) -> str:
+        return f"{namespace}\t{normalize_query(query)}"
+
+    # --- Persistence ---
+    def _load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, encoding="utf-8") as f: saved = json.load(f)
+            for key, entry in saved.get("entries", []): # Stored oldest-first, preserving LRU order
+                self.entries[key] = entry
+            while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+            print(f"Robot Log: Response cache loaded {len(self.entries)} answers from '{self.path}'.")
+        except (OSError, ValueError) as e:
+            print(f"Robot Warning: Response cache '{self.path}' unreadable, starting empty. ({e})")
+            self.entries.clear()
+
+    def flush(self):
+        with self._lock:
+            if self._flush_timer: self._flush_timer.cancel(); self._flush_timer = None
+            snapshot = {"entries": list(self.entries.items())}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f: json.dump(snapshot, f) # Write then rename
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Robot Warning: Could not write response cache '{self.path}': {e}")
+
+    def _schedule_flush(self): # Caller holds the lock
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(FLUSH_DELAY_SEC, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    # --- Lookups ---
+    def get(self, namespace: str, query: str, allow_stale: bool = False):
+        """Cached answer or None. allow_stale=True also returns expired answers (offline fallback)."""
+        key = self._key(namespace, query)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                if not allow_stale: self.stats["misses"] += 1
+                return None
+            fresh = time.time() - entry["stored_at"] < entry["ttl"]
+            if not fresh and not allow_stale:
+                self.stats["expired"] += 1; self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits" if fresh else "stale_hits"] += 1
+            return entry["value"]
+
+    def put(self, namespace: str, query: str, value, ttl: float):
+        if value is None: return
+        key = self._key(namespace, query)
+        with self._lock:
+            self.entries[key] = {"value": value, "stored_at": time.time(), "ttl": ttl}
+            self.entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False); self.stats["evicted"] += 1
+            self._schedule_flush()
+
+    def __contains__(self, namespace_query) -> bool:
+        namespace, query = namespace_query
+        entry = self.entries.get(self._key(namespace, query))
+        return bool(entry and time.time() - entry["stored_at"] < entry["ttl"])
+
+    def report(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(self.stats, entries=len(self.entries),
+                    hit_rate=round(self.stats["hits"] / lookups, 3) if lookups else None)
@@ -1,44 +1,57 @@
 
 # robot.py (Final Version based on discussions)
 
-import speech_recognition as sr
-import pyttsx3
-# import openai # No longer primary for AI if using local model
-import webbrowser
-import pywhatkit
 import datetime
-import wikipedia
-import pyjokes
 import os
-import cv2
-import face_recognition # Depends on dlib
-import numpy as np
+import importlib.util
+from lazy_imports import lazy_import, timed_import, is_loaded, write_import_report
+
+# --- Heavy dependencies are imported on first use (see import_times.json for the cost of each) ---
+# import openai # No longer primary for AI if using local model
+webbrowser = lazy_import("webbrowser", "web")
+pywhatkit = lazy_import("pywhatkit", "web") # Checks internet connectivity on import
+wikipedia = lazy_import("wikipedia", "web")
+pyjokes = lazy_import("pyjokes", "fun")
+cv2 = lazy_import("cv2", "faces")
+face_recognition = lazy_import("face_recognition", "faces") # Depends on dlib
+face_cache = lazy_import("face_cache", "faces") # numpy
+face_matcher = lazy_import("face_matcher", "faces")
+face_pipeline = lazy_import("face_pipeline", "faces") # cv2
+face_tracker = lazy_import("face_tracker", "faces") # cv2
+preview_buffer = lazy_import("preview_buffer", "faces") # cv2
+
+# --- Lightweight local modules (they defer their own heavy imports) ---
+timed_import("chat_engine", "local_ai")
+timed_import("chat_backends", "local_ai")
+from chat_engine import LocalChatModel, StreamMetrics, group_phrases
+from chat_backends import load_chat_backend, BACKEND_FP32
+from readiness import ComponentRegistry
+from audio_capture import AudioCaptureService
+from vad import VoiceActivityDetector, VAD_AGGRESSIVENESS
+from wake_word import create_wake_word, strip_wake_word, WAKE_WORD, WAKE_SENSITIVITY
+from speech_backends import create_backend as create_speech_backend, SpeechNotUnderstood, SpeechServiceError
+from intent_router import Intent, IntentRouter
+from response_cache import ResponseCache, RESPONSE_CACHE_FILE, normalize_query
+from profile_store import ProfileStore, PROFILE_DB_FILE, summary_exchanges
+from gui_channel import GuiCommandChannel
+from tracing import Tracer, TRACE_FILE
+from task_runner import TaskRunner, current_task, cancel_requested, check_cancelled
+from inference_server import InferenceClient, RemoteChatModel, RemoteDetectExecutor, InferenceServerError
+from tts_engine import TTSWorker, PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_LOW
 
 # --- New Imports for GUI Integration & Local LLM ---
 import threading
-import queue
 import time
 import traceback # For printing full tracebacks in threads
 
-# --- Import your GUI class ---
-try:
-    from gui import RobotFaceGUI # From your new gui.py file
-except ImportError as e:
-    print(f"CRITICAL ERROR: Could not import RobotFaceGUI from gui.py: {e}")
-    print("Please ensure gui.py exists in the same directory and has no errors.")
-    exit() # Cannot proceed without the GUI component
-
-# --- Import for Hugging Face Local LLM ---
-try:
-    from transformers import pipeline, Conversation
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
+# --- Check for Hugging Face Local LLM (imported only when the model loads) ---
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec("transformers") is not None
+if not TRANSFORMERS_AVAILABLE:
     print("="*50)
     print("WARNING: `transformers` library not found. Local AI model will not be available.")
     print("Please install it: pip install transformers torch")
     print(" (For GPU, install PyTorch with CUDA: e.g., pip install torch torchvision torchaudio --index-url https://download.pytorch.org/whl/cu118 )")
     print("="*50)
-    TRANSFORMERS_AVAILABLE = False
 
 
 # --- Expression Constants (ensure these match gui.py) ---
@@ -49,13 +62,34 @@ EXPR_SHYING = "shying"; EXPR_PROCESSING = "processing"; EXPR_CONCERNED = "concer
 EXPR_SMILING = "smiling"; EXPR_SLEEPY = "sleepy"
 
 
+def _env_number(name: str, default, cast=float, lo=None, hi=None):
+    """Number from the environment, clamped to [lo, hi]; default if unset or invalid (with a warning)."""
+    value = os.environ.get(name, "").strip()
+    if not value: return default
+    try: number = cast(value)
+    except ValueError:
+        print(f"Robot Warning: Ignoring {name}={value!r}; expected a number. Using {default}.")
+        return default
+    clamped = min(hi, number) if hi is not None else number
+    clamped = max(lo, clamped) if lo is not None else clamped
+    if clamped != number: print(f"Robot Warning: {name}={value!r} is out of range; using {clamped}.")
+    return clamped
+
 # --- Configuration Constants ---
-MEMORY_FILE = "memory.txt"
+MEMORY_FILE = "memory.txt" # Old single-name memory; imported once into the profile store
 FACES_DIR = "known_faces/" # Ensure this directory exists with images
+FACE_DETECT_WORKERS = 2 # Processes running HOG detection + encoding in parallel
+FACE_TRACKING_MODE = True # Track boxes between HOG passes instead of detecting every frame
+FACE_DETECT_EVERY_N_FRAMES = 10 # With tracking: full detection this often (or on motion / lost track)
+FACE_CHECK_PREVIEW = os.environ.get("LOKI_HEADLESS", "0") != "1" # Show the CV2 window during the startup face check
+FACE_PREVIEW_TARGET = os.environ.get("LOKI_FACE_PREVIEW", "window") # "window" = CV2 window, "gui" = the Pygame GUI reads CAMERA_PREVIEW
+FACE_PREVIEW_WINDOW_FPS = 30 # The CV2 window redraws from CAMERA_PREVIEW at most this often
+CAMERA_PREVIEW = None # preview_buffer.PreviewBuffer shared with the GUI, created on the first face check
+CAMERA_FACTORY = None # Returns a cv2.VideoCapture-like object; None = default webcam (see set_device_adapters)
 
 # --- Global GUI Command Queue ---
-GUI_COMMAND_QUEUE = None # Will be initialized in main
-def set_global_gui_queue(q: queue.Queue):
+GUI_COMMAND_QUEUE = None # Will be initialized in main (a GuiCommandChannel; a plain queue.Queue also works)
+def set_global_gui_queue(q):
     global GUI_COMMAND_QUEUE
     GUI_COMMAND_QUEUE = q
 
@@ -66,109 +100,260 @@ def send_gui_command(expression: str, message: str = "", type: str = "expression
             payload = {"type": type, "expression": expression, "message": message}
             if action: payload["action"] = action
             if data: payload["data"] = data
-            GUI_COMMAND_QUEUE.put_nowait(payload)
-        except queue.Full:
-            print("Robot Log: GUI command queue is full. Update skipped.")
+            GUI_COMMAND_QUEUE.put_nowait(payload) # Coalesced with any pending update of the same kind; never blocks or fills
         except Exception as e:
             print(f"Robot Log: Error sending command to GUI: {e}")
 
+# --- Per-turn latency tracing (capture, recognition, intent, handler, generation, tts) ---
+TRACER = Tracer(os.environ.get("LOKI_TRACE_FILE", TRACE_FILE), enabled=os.environ.get("LOKI_TRACE", "1") != "0")
+
 # --- Global variables for Face Recognition ---
 KNOWN_FACE_ENCODINGS = []
 KNOWN_FACE_NAMES = []
+KNOWN_FACE_MATCHER = None # face_matcher.FaceMatcher, built by load_known_faces
 
-# --- Initialize TTS engine ---
-engine = pyttsx3.init()
-try:
-    engine.setProperty("rate", 180) # Slightly faster
-    voices = engine.getProperty('voices')
-    if voices and len(voices) > 1:
-        engine.setProperty('voice', voices[1].id) # Typically female voice
-    elif voices:
-        print("Robot Warning: Only one TTS voice found. Using default.")
-    else:
-        print("Robot CRITICAL Warning: No TTS voices found. Speech output will not work.")
-except Exception as e:
-    print(f"Robot Warning: Error setting up TTS engine properties: {e}")
-
+# --- TTS worker (owns the pyttsx3 engine on its own thread) ---
+TTS_WORKER = TTSWorker() # Started by robot_logic_thread_function
+TTS_BARGE_IN = True # Speech heard while Loki is talking cuts the rest of the reply
 
 # --- Modified Speak function ---
-def speak(text_to_speak: str, expression_during_speech: str = EXPR_TALKING, msg_for_gui: str = None):
+def speak(text_to_speak: str, expression_during_speech: str = EXPR_TALKING, msg_for_gui: str = None,
+          priority: int = PRIORITY_NORMAL, wait: bool = False):
+    """Queues text on the TTS worker. Pass wait=True when the next step listens for an answer."""
     if not text_to_speak: # Don't try to speak empty strings
         print("Robot Log: Speak function called with empty text.")
-        return
+        return None
 
     if msg_for_gui is None:
         msg_for_gui = text_to_speak[:50] + "..." if len(text_to_speak) > 50 else text_to_speak
-    
-    send_gui_command(expression_during_speech, f"Loki: {msg_for_gui}")
+
+    if cancel_requested(): # A cancelled background task must not keep talking
+        print(f"Robot Log: Dropped speech from cancelled task: '{text_to_speak[:40]}'")
+        return None
+
     print("🤖 Bot:", text_to_speak)
-    try:
-        if engine._inLoop: # If stuck from a previous call
-            engine.endLoop()
-        engine.say(text_to_speak)
-        engine.runAndWait()
-    except Exception as e:
-        print(f"Robot TTS Error: {e}")
-        # Fallback if TTS fails, at least print it
-        print(f"Robot TTS Fallback (Error was {e}): {text_to_speak}")
+    turn = TRACER.current()
+    def on_done(completed: bool):
+        if not TTS_WORKER.is_speaking(): send_gui_command(EXPR_NEUTRAL, f"Loki: {msg_for_gui}")
+        wait_ms = round((utterance.first_audio_at - utterance.queued_at) * 1000.0, 1) if utterance.first_audio_at else None
+        turn.add_span("tts", utterance.queued_at, time.monotonic(), "ok" if completed else "interrupted",
+                      chars=len(text_to_speak), queue_wait_ms=wait_ms)
+    # GUI shows the talking expression when audio actually starts, and relaxes when it ends
+    utterance = TTS_WORKER.say(text_to_speak, priority,
+                               on_start=lambda: send_gui_command(expression_during_speech, f"Loki: {msg_for_gui}"),
+                               on_done=on_done)
+    if wait: utterance.wait()
+    return utterance
+
+def send_gui_command_after_speech(expression: str, message: str = ""):
+    """GUI update that should land once everything already queued has been spoken."""
+    TTS_WORKER.after_speech(lambda: send_gui_command(expression, message))
+
+# --- Cached answers for the slow paths (Wikipedia, local AI small talk); survives restarts ---
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_FILE)
+WIKIPEDIA_CACHE_TTL_SEC = 7 * 24 * 3600
+LOCAL_AI_CACHE_TTL_SEC = 24 * 3600
+LOCAL_AI_CACHE_MAX_WORDS = 6 # Only short small-talk prompts; longer ones depend on the conversation
+DISAMBIGUATION_PREFETCH = 3 # Options fetched in the background when a Wikipedia query is ambiguous
+
+# --- Persistent microphone stream (opened once, calibrated in the background) ---
+AUDIO_CAPTURE = AudioCaptureService(pause_threshold=0.8) # Used only when VAD_ENABLED is False
+VAD_ENABLED = True # Gate and endpoint phrases with voice activity detection instead of a fixed pause
+VOICE_ACTIVITY = VoiceActivityDetector(aggressiveness=_env_number("LOKI_VAD_AGGRESSIVENESS", VAD_AGGRESSIVENESS, int, 0, 3))
+
+# --- Speech recognition backend: "auto" (offline Vosk if a model is installed, else Google), "google", "vosk", "google+vosk" ---
+SR_BACKEND_NAME = os.environ.get("LOKI_SR_BACKEND", "auto")
+SR_BACKEND = None # speech_backends.RecognizerBackend, created on first listen()
+PARTIAL_TRANSCRIPT_HOOKS = [] # Called with each partial transcript while the user is still speaking
+
+# --- Wake word gate: only speech after "Loki" reaches recognition ("off", "auto", "template", "vosk") ---
+WAKE_WORD_MODE = os.environ.get("LOKI_WAKE_WORD", "off")
+WAKE_WORD_SENSITIVITY = _env_number("LOKI_WAKE_SENSITIVITY", WAKE_SENSITIVITY, float, 0.0, 1.0)
+WAKE_WORD_FOLLOWUP_SEC = 8.0 # After a command or a reply, the next one needs no wake word for this long
+WAKE_WORD_WAIT_SLICE_SEC = 1.0 # listen() returns this often while asleep so the stop event is still checked
+WAKE_WORD_SPOTTER = None # wake_word.WakeWordSpotter, created on first listen()
+AWAKE_UNTIL = 0.0 # monotonic; until then listen() skips the wake word
+WAKE_WORD_ASLEEP = False # GUI already shows the sleeping prompt
+
+def set_device_adapters(microphone_factory=None, camera_factory=None, tts_engine_factory=None):
+    """
+    Swaps the devices Loki binds to (e.g. WAV/video fixtures and a null TTS sink for
+    benchmarks). Call before robot_logic_thread_function / the first listen().
+    """
+    global AUDIO_CAPTURE, CAMERA_FACTORY, TTS_WORKER
+    if microphone_factory:
+        AUDIO_CAPTURE.stop(); AUDIO_CAPTURE = AudioCaptureService(microphone_factory, pause_threshold=AUDIO_CAPTURE.pause_threshold)
+    if camera_factory: CAMERA_FACTORY = camera_factory
+    if tts_engine_factory:
+        TTS_WORKER.stop(); TTS_WORKER = TTSWorker(tts_engine_factory)
+
+def _load_speech_backend():
+    """Builds the configured recognizer; one that can't load falls back to "auto" with a single warning."""
+    try: return create_speech_backend(SR_BACKEND_NAME)
+    except (SpeechServiceError, ValueError) as e:
+        if SR_BACKEND_NAME == "auto": raise
+        print(f"Robot Warning: Speech backend '{SR_BACKEND_NAME}' unavailable ({e}); falling back to automatic selection.")
+        return create_speech_backend("auto")
+
+def set_speech_backend(backend):
+    """Swaps the recognizer (e.g. FileBackend in tests and benchmarks)."""
+    global SR_BACKEND
+    SR_BACKEND = backend
+
+def _on_partial_transcript(text: str):
+    send_gui_command(EXPR_LISTENING, f"You: {text[:40]}...")
+    for hook in PARTIAL_TRANSCRIPT_HOOKS: hook(text)
+
+def _wait_for_wake_word() -> bool:
+    """True once "Loki" is heard (or while awake / with the gate off); False after a quiet slice."""
+    global WAKE_WORD_MODE, WAKE_WORD_SPOTTER, AWAKE_UNTIL, WAKE_WORD_ASLEEP
+    if WAKE_WORD_MODE == "off": return True
+    if TTS_WORKER.is_speaking(): AWAKE_UNTIL = max(AWAKE_UNTIL, time.monotonic() + WAKE_WORD_FOLLOWUP_SEC)
+    if time.monotonic() < AWAKE_UNTIL: return True
+    if WAKE_WORD_SPOTTER is None:
+        WAKE_WORD_SPOTTER = create_wake_word(WAKE_WORD_MODE, WAKE_WORD, WAKE_WORD_SENSITIVITY)
+        if WAKE_WORD_SPOTTER is None:
+            print("Robot Warning: Wake word gate disabled, every phrase will be recognized."); WAKE_WORD_MODE = "off"; return True
+        print(f"Robot Log: Wake word gate on ({WAKE_WORD_SPOTTER.name}, sensitivity {WAKE_WORD_SPOTTER.sensitivity}).")
+    if not WAKE_WORD_ASLEEP:
+        send_gui_command(EXPR_SLEEPY, f"Say '{WAKE_WORD.capitalize()}' to wake me."); WAKE_WORD_ASLEEP = True
+    if not AUDIO_CAPTURE.wait_for_wake_word(WAKE_WORD_SPOTTER, WAKE_WORD_WAIT_SLICE_SEC, VOICE_ACTIVITY if VAD_ENABLED else None):
+        return False
+    if TTS_WORKER.is_echo(WAKE_WORD): # Loki said its own name
+        print("Robot Log: Ignoring wake word from own speech."); return False
+    print("Robot Log: Wake word heard.")
+    AWAKE_UNTIL = time.monotonic() + WAKE_WORD_FOLLOWUP_SEC; WAKE_WORD_ASLEEP = False
+    return True
 
 # --- Modified Listen function ---
 def listen():
-    send_gui_command(EXPR_LISTENING, "Listening...")
-    r = sr.Recognizer()
+    global SR_BACKEND, AWAKE_UNTIL
     query = ""
     try:
-        with sr.Microphone() as source:
-            print("🎤 Listening...")
-            r.pause_threshold = 0.8 # Adjust if it cuts off too soon/late
-            r.energy_threshold = 400 # Default is 300, raise if too sensitive
-            r.dynamic_energy_threshold = True # Adapts to noise
-            r.adjust_for_ambient_noise(source, duration=1)
-            try:
-                audio = r.listen(source, timeout=7, phrase_time_limit=10) # Shorter phrase limit
-                print("Robot Log: Audio captured, recognizing...")
-                query = r.recognize_google(audio)
-                print("🧑 You:", query)
-                send_gui_command(EXPR_THINKING, f"You: {query[:40]}...")
-                query = query.lower()
-            except sr.WaitTimeoutError:
-                print("Robot Log: No speech detected (timeout).")
-                send_gui_command(EXPR_NEUTRAL, "Didn't hear anything that time.")
-            except sr.UnknownValueError:
-                print("Robot Log: Google SR could not understand audio.")
-                send_gui_command(EXPR_NEUTRAL, "Sorry, I couldn't quite understand.")
-            except sr.RequestError as e:
-                print(f"Robot SR Error: {e}")
-                speak("My apologies, the speech service seems to have an issue.", EXPR_SAD)
-                send_gui_command(EXPR_NEUTRAL, "Speech service error.")
+        if not _wait_for_wake_word(): return query
+        send_gui_command(EXPR_LISTENING, "Listening...")
+        if SR_BACKEND is None:
+            try: SR_BACKEND = _load_speech_backend()
+            except SpeechServiceError as e: # No recognizer at all; not a microphone problem
+                print(f"Robot SR Error: No speech recognizer available: {e}")
+                speak("My apologies, the speech service seems to have an issue.", EXPR_SAD, priority=PRIORITY_URGENT)
+                send_gui_command(EXPR_NEUTRAL, "Speech service error."); return query
+        if not AUDIO_CAPTURE.is_running(): AUDIO_CAPTURE.start() # First call only: open + calibrate
+        print("🎤 Listening...")
+        try:
+            session = SR_BACKEND.start_utterance(AUDIO_CAPTURE.sample_rate, AUDIO_CAPTURE.sample_width, _on_partial_transcript)
+            raw_audio, _, _ = AUDIO_CAPTURE.listen_phrase(timeout=7, phrase_time_limit=10, on_chunk=session.feed, # Shorter phrase limit
+                                                          vad=VOICE_ACTIVITY if VAD_ENABLED else None)
+            turn = TRACER.current(); capture_attrs = {}
+            if VAD_ENABLED and VOICE_ACTIVITY.utterances:
+                u = VOICE_ACTIVITY.utterances[-1]; capture_attrs = {"endpoint_latency_ms": u["endpoint_latency_ms"], "speech_sec": u["speech_sec"]}
+                print(f"Robot Log: Endpointed after {u['endpoint_latency_ms']:.0f} ms ({u['speech_sec']:.1f}s speech, {u['trimmed_sec']:.1f}s silence trimmed).")
+            turn.add_span("capture", AUDIO_CAPTURE.last_phrase["speech_started_at"], AUDIO_CAPTURE.last_phrase["ended_at"], **capture_attrs)
+            print(f"Robot Log: Audio captured, recognizing ({SR_BACKEND.name})...")
+            with turn.span("recognition", backend=SR_BACKEND.name): query = session.finish(raw_audio)
+            if TTS_WORKER.is_echo(query): # Mic picked up Loki's own voice
+                print(f"Robot Log: Ignoring echo of own speech: '{query}'"); return ""
+            if TTS_BARGE_IN and TTS_WORKER.interrupt(): print("Robot Log: Barge-in, speech interrupted.")
+            print("🧑 You:", query)
+            send_gui_command(EXPR_THINKING, f"You: {query[:40]}...")
+            query = query.lower()
+            if WAKE_WORD_MODE != "off":
+                query = strip_wake_word(query); AWAKE_UNTIL = time.monotonic() + WAKE_WORD_FOLLOWUP_SEC
+        except TimeoutError:
+            print("Robot Log: No speech detected (timeout).")
+            send_gui_command(EXPR_NEUTRAL, "Didn't hear anything that time.")
+        except SpeechNotUnderstood as e:
+            print(f"Robot Log: {e}.")
+            send_gui_command(EXPR_NEUTRAL, "Sorry, I couldn't quite understand.")
+        except SpeechServiceError as e:
+            print(f"Robot SR Error: {e}")
+            speak("My apologies, the speech service seems to have an issue.", EXPR_SAD, priority=PRIORITY_URGENT)
+            send_gui_command(EXPR_NEUTRAL, "Speech service error.")
     except Exception as e: # Catch broader errors like no microphone
         print(f"Robot Log: Critical listening error (e.g., no microphone?): {e}")
-        speak("I'm having trouble with my microphone input right now.", EXPR_SAD)
+        speak("I'm having trouble with my microphone input right now.", EXPR_SAD, priority=PRIORITY_URGENT)
         send_gui_command(EXPR_SAD, "Microphone input error.")
     return query
 
 # --- Hugging Face Local Model Integration ---
-LOCAL_AI_PIPELINE = None
-CURRENT_CONVERSATION = None # Stores transformers.Conversation object
+LOCAL_AI_MODEL_NAME = "microsoft/DialoGPT-medium"
+LOCAL_AI_BACKEND = os.environ.get("LOKI_AI_BACKEND", BACKEND_FP32) # pytorch-fp32, pytorch-int8 or onnxruntime
+def _env_threads(name: str):
+    """Positive thread count from the environment, or None (library default) if unset or invalid."""
+    value = os.environ.get(name, "").strip()
+    if not value: return None
+    try: threads = int(value)
+    except ValueError: threads = -1
+    if threads < 0: print(f"Robot Warning: Ignoring {name}={value!r}; expected a thread count. Using the library default.")
+    return threads if threads > 0 else None
+
+LOCAL_AI_THREADS = _env_threads("LOKI_AI_THREADS") # None = library default
+LOCAL_CHAT_MODEL = None # chat_engine.LocalChatModel for the loaded backend
+CONVERSATION_STATE = None # Tokenized, budgeted history + KV cache (chat_engine.ConversationState)
+CONVERSATION_USER = None # Whose history CONVERSATION_STATE holds; a different current user gets their own on the next question
+LOCAL_AI_HISTORY_TOKENS = 512 # Oldest exchanges are dropped beyond this (DialoGPT window is 1024)
+LOCAL_AI_STREAMING = True # Speak the reply phrase by phrase while it is generated
+LAST_STREAM_METRICS = None # Timings of the last streamed reply (time to first token / phrase / audio)
+INFERENCE_SERVER = os.environ.get("LOKI_INFERENCE_SERVER") # e.g. 127.0.0.1:8765; set = use the shared inference_server.py
+INFERENCE_CLIENT = None # inference_server.InferenceClient, created on first use
+REMOTE_DETECT_EXECUTOR = None # Stands in for face_pipeline's local detection pool when INFERENCE_SERVER is set
+LOCAL_AI_TROUBLE_REPLY = "I'm having a little trouble with my local thoughts right now. Let's try something else."
+LOCAL_AI_NO_REPLY = "I'm not sure how to respond to that."
+
+def _reset_conversation_state():
+    """Fresh history for the current user, seeded with their stored conversation summary (server-side histories start empty)."""
+    global CONVERSATION_STATE, CONVERSATION_USER
+    CONVERSATION_STATE = LOCAL_CHAT_MODEL.new_conversation(LOCAL_AI_HISTORY_TOKENS)
+    CONVERSATION_USER = current_user_state
+    profile = get_profile_store().get(current_user_state) if current_user_state else None
+    if profile and profile["summary"] and hasattr(CONVERSATION_STATE, "seed"):
+        CONVERSATION_STATE.seed(summary_exchanges(profile["summary"]))
+        print(f"Robot Log: Loaded {current_user_state}'s conversation summary ({len(CONVERSATION_STATE)} tokens).")
+
+def _inference_client():
+    global INFERENCE_CLIENT
+    if INFERENCE_CLIENT is None: INFERENCE_CLIENT = InferenceClient(INFERENCE_SERVER)
+    return INFERENCE_CLIENT
+
+def _connect_inference_server():
+    """Uses the shared server's model instead of loading one in this process."""
+    global LOCAL_CHAT_MODEL
+    try:
+        _inference_client().health()
+        LOCAL_CHAT_MODEL = RemoteChatModel(_inference_client())
+        _reset_conversation_state()
+        print(f"Robot Log: Using shared inference server at {INFERENCE_SERVER} as client '{INFERENCE_CLIENT.client_id}'.")
+        send_gui_command(EXPR_HAPPY, "Local AI Online!")
+    except InferenceServerError as e:
+        print(f"Robot CRITICAL Error: Inference server {INFERENCE_SERVER} unavailable: {e}")
+        speak("I couldn't reach my shared AI brain. General conversation will be limited.", EXPR_SAD)
+        send_gui_command(EXPR_SAD, "Inference server offline.")
+        LOCAL_CHAT_MODEL = None
 
 def initialize_local_ai_model():
-    global LOCAL_AI_PIPELINE, CURRENT_CONVERSATION
+    global LOCAL_CHAT_MODEL
+    if INFERENCE_SERVER:
+        if LOCAL_CHAT_MODEL is None: _connect_inference_server()
+        return
     if not TRANSFORMERS_AVAILABLE:
         msg = "Local AI (transformers library) is not installed. General conversation is disabled."
         print(f"Robot Warning: {msg}")
         send_gui_command(EXPR_SAD, "Local AI module disabled.")
         return
 
-    if LOCAL_AI_PIPELINE is None: # Load only once
+    if LOCAL_CHAT_MODEL is None: # Load only once
         send_gui_command(EXPR_PROCESSING, "Warming up local AI...")
         speak("Please wait a moment, I'm preparing my local AI brain. This can take a minute or two on the first run...", EXPR_PROCESSING)
         try:
-            model_name = "microsoft/DialoGPT-medium"
-            print(f"Robot Log: Attempting to load Hugging Face model: {model_name}")
-            # device=-1 for CPU. For GPU (if PyTorch with CUDA is installed): device=0
-            # For M1/M2 Macs with PyTorch nightly/metal support, you might use device="mps"
-            LOCAL_AI_PIPELINE = pipeline("conversational", model=model_name, device=-1)
-            CURRENT_CONVERSATION = Conversation() # Initialize an empty conversation
+            model_name = LOCAL_AI_MODEL_NAME
+            print(f"Robot Log: Attempting to load Hugging Face model: {model_name} (backend {LOCAL_AI_BACKEND})")
+            # Runs on CPU. Compare backends on this machine with: python chat_backends.py
+            try: model, tokenizer = load_chat_backend(LOCAL_AI_BACKEND, model_name, LOCAL_AI_THREADS)
+            except ImportError as e: # e.g. onnxruntime/optimum not installed
+                print(f"Robot Warning: Backend '{LOCAL_AI_BACKEND}' unavailable ({e}), falling back to {BACKEND_FP32}.")
+                model, tokenizer = load_chat_backend(BACKEND_FP32, model_name, LOCAL_AI_THREADS)
+            LOCAL_CHAT_MODEL = LocalChatModel(model, tokenizer)
+            _reset_conversation_state() # Initialize an empty conversation
             print(f"Robot Log: Local AI model ({model_name}) loaded successfully.")
             speak("My local AI brain is now ready for conversation!", EXPR_HAPPY)
             send_gui_command(EXPR_HAPPY, "Local AI Online!")
@@ -176,332 +361,558 @@ def initialize_local_ai_model():
              print(f"Robot CRITICAL Error (OSError): Failed to load local AI model '{model_name}'. Model files might be missing or corrupted. {e}")
              speak(f"I had a disk or file issue loading my local AI brain. Please check console. General conversation limited.", EXPR_SAD)
              send_gui_command(EXPR_SAD, "Local AI File Error.")
-             LOCAL_AI_PIPELINE = None
+             LOCAL_CHAT_MODEL = None
         except Exception as e: # Catch other errors during model loading
             print(f"Robot CRITICAL Error: Failed to load local AI model '{model_name}': {e}")
             traceback.print_exc()
             speak("I encountered an unexpected issue while trying to load my local AI brain. General conversation will be limited.", EXPR_SAD)
             send_gui_command(EXPR_SAD, "Local AI Load Failed.")
-            LOCAL_AI_PIPELINE = None
+            LOCAL_CHAT_MODEL = None
+
+def _task_stop_event():
+    """Cancel event of the background task we're running in, so cancelling it stops generation."""
+    task = current_task()
+    return task.cancel_event if task else None
 
 def ask_local_model(prompt: str):
-    global LOCAL_AI_PIPELINE, CURRENT_CONVERSATION
-    if not LOCAL_AI_PIPELINE:
+    global LOCAL_CHAT_MODEL, CONVERSATION_STATE
+    if not LOCAL_CHAT_MODEL:
         return "My local AI capabilities are currently offline due to an earlier issue."
     if not prompt:
         return "What would you like to discuss?"
 
     send_gui_command(EXPR_THINKING, "Local AI processing...")
     try:
-    
-        if CURRENT_CONVERSATION:
-            print(f"Robot Log: Current conversation history length before this turn: User inputs={len(CURRENT_CONVERSATION.past_user_inputs)}, Generated responses={len(CURRENT_CONVERSATION.generated_responses)}")
-        else:
-            print("Robot Log: CURRENT_CONVERSATION is None! Reinitializing.")
-            CURRENT_CONVERSATION = Conversation()
-    
+        if CONVERSATION_STATE is None or CONVERSATION_USER != current_user_state: # Missing, or someone else's
+            _reset_conversation_state()
+        print(f"Robot Log: Sending to Local AI (DialoGPT): '{prompt}' (history {len(CONVERSATION_STATE)} tokens)")
+        with TRACER.current().span("generation", backend=LOCAL_AI_BACKEND, streaming=False):
+            response_text = LOCAL_CHAT_MODEL.reply(CONVERSATION_STATE, prompt, stop_event=_task_stop_event())
+        print(f"Robot Log: Received from Local AI: '{response_text}' ({CONVERSATION_STATE.report()})")
 
-        print(f"Robot Log: Sending to Local AI (DialoGPT): '{prompt}'")
-        
-        
-        temp_conversation_this_turn = Conversation(text=prompt, past_user_inputs=list(CURRENT_CONVERSATION.past_user_inputs), generated_responses=list(CURRENT_CONVERSATION.generated_responses))
-
-        result_from_pipeline = LOCAL_AI_PIPELINE(temp_conversation_this_turn, # Pass the new temp object
-                                   pad_token_id=LOCAL_AI_PIPELINE.tokenizer.eos_token_id,
-                                   max_new_tokens=75,
-                                   no_repeat_ngram_size=3,
-                                   temperature=0.7,
-                                   top_p=0.9,
-                                   do_sample=True)
-
-        print(f"Robot Log: Raw result from pipeline: {type(result_from_pipeline)}") # See what type the pipeline returns
-
-        response_text = ""
-        if hasattr(result_from_pipeline, 'generated_responses') and result_from_pipeline.generated_responses:
-            response_text = result_from_pipeline.generated_responses[-1]
-            CURRENT_CONVERSATION = result_from_pipeline
-            print(f"Robot Log: Updated CURRENT_CONVERSATION. History length now: User={len(CURRENT_CONVERSATION.past_user_inputs)}, Bot={len(CURRENT_CONVERSATION.generated_responses)}")
-        else:
-            print(f"Robot Log: Pipeline did not return expected Conversation structure or no response generated. Result: {result_from_pipeline}")
-            if not hasattr(result_from_pipeline, 'past_user_inputs'): # If it's not a conversation object at all
-                print("Robot Log: Resetting conversation due to unexpected pipeline result type.")
-                CURRENT_CONVERSATION = Conversation()
-
-
-        print(f"Robot Log: Received from Local AI: '{response_text}'")
-        
         if response_text and prompt and response_text.lower().startswith(prompt.lower()): # Check if response_text and prompt are not None
             response_text = response_text[len(prompt):].lstrip(" .,:")
         if response_text and response_text.lower().startswith("bot:"): # Check if response_text is not None
             response_text = response_text[4:].lstrip()
 
-        return response_text if response_text else "I'm not sure how to respond to that."
-        
+        return response_text if response_text else LOCAL_AI_NO_REPLY
+
     except Exception as e:
         print(f"Robot Error: Error interacting with local AI model: {e}")
         traceback.print_exc()
-        if LOCAL_AI_PIPELINE: # Only reset if pipeline exists
-            CURRENT_CONVERSATION = Conversation()
+        if LOCAL_CHAT_MODEL: # Only reset if the model exists
+            _reset_conversation_state()
             print("Robot Log: Conversation history reset due to error.")
         else:
-            CURRENT_CONVERSATION = None 
-        return "I'm having a little trouble with my local thoughts right now. Let's try something else."
-# --- save_name, load_name ---
-def save_name(name):
+            CONVERSATION_STATE = None
+        return LOCAL_AI_TROUBLE_REPLY
+
+def ask_local_model_streaming(prompt: str):
+    """
+    Streams the reply phrase by phrase into speak() and the GUI message line while DialoGPT
+    is still generating. Returns (reply text already queued for speech, complete); complete is
+    False when generation failed or was cancelled partway, so the text is only what was spoken.
+    """
+    global LAST_STREAM_METRICS
+    if not LOCAL_CHAT_MODEL or not prompt:
+        reply = ask_local_model(prompt); speak(reply, EXPR_TALKING); return reply, not cancel_requested()
+    if CONVERSATION_STATE is None or CONVERSATION_USER != current_user_state: _reset_conversation_state()
+
+    send_gui_command(EXPR_THINKING, "Local AI processing...")
+    print(f"Robot Log: Streaming from Local AI (DialoGPT): '{prompt}' (history {len(CONVERSATION_STATE)} tokens)")
+    spoken = []; first_utterance = None; complete = True
+    metrics = StreamMetrics() # Shared by stream() and group_phrases(), so this turn's first phrase is timed
     try:
-        with open(MEMORY_FILE, "w") as f: f.write(name.strip().title())
-    except IOError as e: print(f"Error saving name: {e}")
+        for phrase in group_phrases(LOCAL_CHAT_MODEL.stream(CONVERSATION_STATE, prompt, _task_stop_event(), metrics), metrics):
+            if not spoken and phrase.lower().startswith("bot:"): phrase = phrase[4:].lstrip()
+            if not phrase: continue
+            spoken.append(phrase)
+            running_text = " ".join(spoken)
+            utterance = speak(phrase, EXPR_TALKING, msg_for_gui=running_text[-50:])
+            if first_utterance is None: first_utterance = utterance
+    except Exception as e:
+        print(f"Robot Error: Error streaming from local AI model: {e}")
+        traceback.print_exc()
+        complete = False
+        if not spoken:
+            reply = LOCAL_AI_TROUBLE_REPLY
+            speak(reply, EXPR_SAD); return reply, False
+    if cancel_requested(): complete = False # Stopped mid-reply: what was spoken is not the whole answer
+
+    reply = " ".join(spoken)
+    if not reply:
+        reply = LOCAL_AI_NO_REPLY; speak(reply, EXPR_TALKING); return reply, complete
+
+    TRACER.current().add_span("generation", metrics.started_at, metrics.finished_at or time.monotonic(), backend=LOCAL_AI_BACKEND,
+                              streaming=True, **metrics.as_dict())
+    def record_metrics(): # Runs on the TTS worker once the whole reply has been spoken
+        global LAST_STREAM_METRICS
+        LAST_STREAM_METRICS = metrics.as_dict()
+        if first_utterance is not None and first_utterance.first_audio_at:
+            LAST_STREAM_METRICS["time_to_first_audio"] = round(first_utterance.first_audio_at - metrics.started_at, 3)
+        print(f"Robot Log: Local AI streaming metrics: {LAST_STREAM_METRICS} (conversation {CONVERSATION_STATE.report()})")
+    TTS_WORKER.after_speech(record_metrics)
+    return reply, complete
+
+# --- save_name, load_name (users, face references, last seen and conversation summaries live in PROFILE_STORE) ---
+PROFILE_STORE = None # profile_store.ProfileStore, opened on first use (set it beforehand to use another database)
+PROFILE_STORE_LOCK = threading.Lock()
+
+def get_profile_store() -> ProfileStore:
+    """Opens the store on first use, so importing this module touches no files; memory.txt is imported once."""
+    global PROFILE_STORE
+    with PROFILE_STORE_LOCK:
+        if PROFILE_STORE is None: PROFILE_STORE = ProfileStore(PROFILE_DB_FILE, legacy_memory_file=MEMORY_FILE)
+        return PROFILE_STORE
+
+def save_name(name):
+    """
+    Makes name the active user (profile created on first use, written behind) and returns their
+    profile as it was before this sighting, or None if they are new. Their conversation summary
+    seeds the local AI history at the next question.
+    """
+    store = get_profile_store()
+    previous = store.get(name) # Cache hit, or one indexed lookup
+    store.set_current(name)
+    return previous
+
+def _last_seen_phrase(profile) -> str:
+    """' Last time I saw you was yesterday.' for a known profile, '' for someone new."""
+    if not profile or not profile.get("last_seen"): return ""
+    days = (datetime.date.today() - datetime.date.fromtimestamp(profile["last_seen"])).days
+    when = "earlier today" if days <= 0 else "yesterday" if days == 1 else f"{days} days ago"
+    return f" Last time I saw you was {when}."
 
 def load_name():
-    if os.path.exists(MEMORY_FILE):
-        try:
-            with open(MEMORY_FILE, "r") as f: return f.read().strip()
-        except IOError as e: print(f"Error loading name: {e}")
-    return None
+    return get_profile_store().current_user()
 
 # --- Face Recognition Functions ---
+def _encode_face_image(image_path: str):
+    """Returns the first face encoding found in an image file, or None."""
+    if INFERENCE_SERVER: return _inference_client().encode_image_file(image_path)
+    image = face_recognition.load_image_file(image_path)
+    encodings = face_recognition.face_encodings(image)
+    return encodings[0] if encodings else None
+
 def load_known_faces():
-    global KNOWN_FACE_ENCODINGS, KNOWN_FACE_NAMES
+    global KNOWN_FACE_ENCODINGS, KNOWN_FACE_NAMES, KNOWN_FACE_MATCHER
     if not os.path.exists(FACES_DIR):
         print(f"Robot Warning: Faces directory '{FACES_DIR}' not found."); return False
     print(f"Robot Log: Loading known faces from {FACES_DIR}...")
-    loaded_count = 0; KNOWN_FACE_ENCODINGS = []; KNOWN_FACE_NAMES = []
-    for filename in os.listdir(FACES_DIR):
-        if filename.lower().endswith((".jpg", ".jpeg", ".png")):
-            name = os.path.splitext(filename)[0].title()
-            image_path = os.path.join(FACES_DIR, filename)
-            try:
-                image = face_recognition.load_image_file(image_path)
-                encodings = face_recognition.face_encodings(image)
-                if encodings:
-                    KNOWN_FACE_ENCODINGS.append(encodings[0]); KNOWN_FACE_NAMES.append(name)
-                    print(f"Robot Log: Loaded face - {name}"); loaded_count+=1
-                else: print(f"Robot Warning: No face found in {image_path} for {name}.")
-            except Exception as e: print(f"Robot Error loading face {image_path}: {e}")
+    start_time = time.perf_counter()
+    # Only new or changed images are run through dlib; everything else comes from the cache
+    encoding_cache = face_cache.FaceEncodingCache(FACES_DIR)
+    KNOWN_FACE_ENCODINGS, KNOWN_FACE_NAMES = encoding_cache.sync(_encode_face_image)
+    get_profile_store().sync_faces((filename, entry["name"], entry["hash"]) for filename, entry in encoding_cache.entries.items()
+                             if entry["encoding"] is not None) # Every gallery face belongs to a user profile
+    if KNOWN_FACE_MATCHER is None: KNOWN_FACE_MATCHER = face_matcher.FaceMatcher(tolerance=0.55) # Stricter tolerance
+    KNOWN_FACE_MATCHER.set_gallery(KNOWN_FACE_ENCODINGS, KNOWN_FACE_NAMES)
+    loaded_count = len(KNOWN_FACE_NAMES)
+    print(f"Robot Log: Face cache - reused {encoding_cache.stats['reused']}, encoded {encoding_cache.stats['encoded']}, "
+          f"evicted {encoding_cache.stats['evicted']} ({(time.perf_counter() - start_time) * 1000:.0f} ms).")
     if loaded_count > 0: print(f"Robot Log: Loaded {loaded_count} known faces."); return True
     else: print("Robot Log: No known faces loaded."); return False
 
 def recognize_face_from_cam():
+    global REMOTE_DETECT_EXECUTOR, CAMERA_PREVIEW
     if not KNOWN_FACE_ENCODINGS: print("Robot Log: No known faces for recognition."); return None
     
     video_capture = None
     try:
-        video_capture = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        if not video_capture.isOpened():
+        video_capture = CAMERA_FACTORY() if CAMERA_FACTORY else cv2.VideoCapture(0, cv2.CAP_DSHOW)
+        if not video_capture.isOpened() and not CAMERA_FACTORY:
             print("Robot Warning: DSHOW backend failed, trying default camera...")
             video_capture = cv2.VideoCapture(0)
-            if not video_capture.isOpened():
-                speak("I couldn't access the camera for face check.", EXPR_SAD); return None
+        if not video_capture.isOpened():
+            speak("I couldn't access the camera for face check.", EXPR_SAD); return None
     except Exception as e:
         print(f"Robot Error opening camera: {e}")
         speak("Problem accessing the camera.", EXPR_SAD); return None
 
-    print("Robot Log: Face recognition cam... (CV2 window, 'q' to skip)")
+    show_window = FACE_CHECK_PREVIEW and FACE_PREVIEW_TARGET == "window"
+    print(f"Robot Log: Face recognition cam...{' (CV2 window, q to skip)' if show_window else ''}")
     send_gui_command(EXPR_THINKING, "Looking for familiar faces...")
     face_found_name = None; start_time = time.time(); timeout = 7
     window_name = "Face Recognition - Loki ('q' to skip)"
-
+    if FACE_CHECK_PREVIEW: # Boxes are drawn on a preallocated preview-size frame, never on the full frame
+        if CAMERA_PREVIEW is None: CAMERA_PREVIEW = preview_buffer.PreviewBuffer(rgb=not show_window)
+        if not show_window: send_gui_command(EXPR_THINKING, type="webcam", action="show", data={"preview": CAMERA_PREVIEW})
+
+    tracker = face_tracker.FaceTracker(detect_every=FACE_DETECT_EVERY_N_FRAMES) if FACE_TRACKING_MODE else None
+    if INFERENCE_SERVER and REMOTE_DETECT_EXECUTOR is None: # Frames go to the shared server's dlib workers
+        REMOTE_DETECT_EXECUTOR = RemoteDetectExecutor(_inference_client(), FACE_DETECT_WORKERS)
+        face_pipeline.use_detect_executor(REMOTE_DETECT_EXECUTOR)
+    pipeline = face_pipeline.FaceCapturePipeline(video_capture, workers=FACE_DETECT_WORKERS, tracker=tracker)
     try:
-        while (time.time() - start_time) < timeout:
-            ret, frame = video_capture.read()
-            if not ret: print("Robot Warning: Cam frame grab failed."); break
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            try:
-                locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-                encodings_in_frame = face_recognition.face_encodings(rgb_small_frame, locations, num_jitters=1)
-            except Exception as e: print(f"Robot Error CV2 face detect: {e}"); break 
-            for face_encoding in encodings_in_frame:
-                matches = face_recognition.compare_faces(KNOWN_FACE_ENCODINGS, face_encoding, 0.55) # Stricter tolerance
-                if True in matches:
-                    face_found_name = KNOWN_FACE_NAMES[matches.index(True)]; break
-            if face_found_name: break
-            
-            # Display frame with boxes (even if unknown)
-            for (top, right, bottom, left) in locations:
-                top *= 4; right *= 4; bottom *= 4; left *= 4
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 180, 50), 2) # Green box
-            cv2.imshow(window_name, frame)
+        pipeline.start()
+        shown_seq = 0; next_redraw = 0.0
+        while (time.time() - start_time) < timeout and not pipeline.capture_failed:
+            result = pipeline.results(timeout=0.05)
+            if result is not None:
+                # All newly encoded faces in the frame are matched in one batch; closest identity wins
+                matches = KNOWN_FACE_MATCHER.match_batch(result["encodings"])
+                for track_id, (name, distance) in zip(result["track_ids"], matches):
+                    if name and tracker: tracker.set_identity(track_id, name, distance)
+                face_found_name, match_distance = KNOWN_FACE_MATCHER.closest(matches)
+                if face_found_name:
+                    print(f"Robot Log: Matched {face_found_name} (distance {match_distance:.3f}) after {time.time() - start_time:.2f}s.")
+                    break
+                if FACE_CHECK_PREVIEW: CAMERA_PREVIEW.publish(result["frame"], result["boxes"]) # Boxes even if unknown
+
+            if not show_window or time.monotonic() < next_redraw: continue
+            next_redraw = time.monotonic() + 1.0 / FACE_PREVIEW_WINDOW_FPS # The window reads the preview at its own rate
+            seq, preview = CAMERA_PREVIEW.latest()
+            if seq != shown_seq: cv2.imshow(window_name, preview); shown_seq = seq
             if cv2.waitKey(1) & 0xFF == ord('q'): print("Robot Log: Face recog (CV2) skipped."); break
+        print(f"Robot Log: Face pipeline stats (recognition): {pipeline.report()}")
+        if FACE_CHECK_PREVIEW: print(f"Robot Log: Face preview stats: {CAMERA_PREVIEW.report()}")
     finally: # Ensure camera is released and windows closed
+        pipeline.stop()
         if video_capture: video_capture.release()
-        cv2.destroyAllWindows() # Close all OpenCV windows
+        if show_window: cv2.destroyAllWindows() # Close all OpenCV windows
+        elif FACE_CHECK_PREVIEW: send_gui_command(EXPR_THINKING, type="webcam", action="hide")
 
     if face_found_name: send_gui_command(EXPR_HAPPY, f"Recognized {face_found_name}!")
     else: send_gui_command(EXPR_NEUTRAL, "No familiar face by camera.")
     return face_found_name
 
-# --- Process Voice Commands ---
+# --- Staged startup (see assistant_setup) ---
+STARTUP_COMPONENTS = ComponentRegistry()
+COMPONENT_LOCAL_AI = "local_ai"
+COMPONENT_FACES = "faces"
+LOCAL_AI_LOCK = threading.Lock() # One generation at a time across the main loop and deferred answers
+
+# --- Voice command handlers: handler(command, slots); see COMMAND_INTENTS for their triggers ---
 current_user_state = None
-def process_command(command: str):
+EXIT_SIGNAL = "exit_signal"
+GUI_ALREADY_SET = "gui_already_set" # Handler queued its own final GUI state; skip the neutral reset
+
+def _intent_bot_name(command, slots):
+    speak("My name is Loki, your virtual assistant!", EXPR_SMILING)
+    send_gui_command_after_speech(EXPR_SMILING, "I'm Loki!")
+    return GUI_ALREADY_SET
+
+def _intent_set_user_name(command, slots):
     global current_user_state
-    if not command: send_gui_command(EXPR_NEUTRAL, ""); return current_user_state
+    if slots["name"]:
+        name = slots["name"].title(); previous = save_name(name)
+        if previous: speak(f"Welcome back, {name}!{_last_seen_phrase(previous)}", EXPR_HAPPY)
+        else: speak(f"Nice to meet you, {name}. I’ll remember that!", EXPR_HAPPY)
+        current_user_state = name; send_gui_command_after_speech(EXPR_HAPPY, f"Met {name}!")
+    else: speak("I didn't quite catch the name. Could you repeat?", EXPR_THINKING)
+    return GUI_ALREADY_SET
+
+def _intent_user_name(command, slots):
+    if current_user_state: speak(f"Your name is {current_user_state}.", EXPR_SMILING)
+    else: speak("I don't know your name yet. You can tell me!", EXPR_SHYING)
+
+# --- Web and Media ---
+def _intent_open_youtube(command, slots):
+    speak("Opening YouTube now.", EXPR_NEUTRAL); webbrowser.open("https://youtube.com")
+    send_gui_command_after_speech(EXPR_NEUTRAL, "Opened YouTube.")
+
+def _intent_search_google(command, slots):
+    query = slots["query"]
+    if query:
+        speak(f"Searching Google for {query}", EXPR_THINKING); webbrowser.open(f"https://google.com/search?q={query}")
+        send_gui_command_after_speech(EXPR_NEUTRAL, f"Searched: {query[:20]}...")
+    else: speak("What would you like me to search on Google?", EXPR_THINKING)
+
+def _intent_play_song(command, slots):
+    term = slots["term"]
+    if term:
+        speak(f"Playing {term} on YouTube.", EXPR_HAPPY);
+        check_cancelled() # "Cancel the song" before the browser opens: nothing to undo yet
+        try: pywhatkit.playonyt(term)
+        except Exception as e: print(f"pywhatkit error: {e}"); speak(f"Couldn't play {term} due to an error.", EXPR_SAD)
+        send_gui_command_after_speech(EXPR_HAPPY, f"Playing: {term[:20]}...")
+    else: speak("What song would you like me to play?", EXPR_THINKING)
+
+# --- Information ---
+def _intent_time(command, slots):
+    speak(f"The current time is {datetime.datetime.now().strftime('%I:%M %p')}", EXPR_NEUTRAL)
+
+def _intent_date(command, slots):
+    speak(f"Today is {datetime.datetime.now().strftime('%A, %B %d, %Y')}", EXPR_NEUTRAL)
+
+def _fetch_wikipedia_summary(query: str, auto_suggest: bool = True) -> str:
+    result = wikipedia.summary(query, sentences=2, auto_suggest=auto_suggest, redirect=True)
+    RESPONSE_CACHE.put("wikipedia", query, result, WIKIPEDIA_CACHE_TTL_SEC)
+    return result
+
+def _prefetch_wikipedia_options(options):
+    """Fetches the likely follow-up pages of an ambiguous query so the next question is instant."""
+    def prefetch():
+        for option in options:
+            if ("wikipedia", option) in RESPONSE_CACHE: continue
+            try: _fetch_wikipedia_summary(option, auto_suggest=False)
+            except Exception as e: print(f"Robot Log: Wikipedia prefetch of '{option}' skipped: {e}")
+    threading.Thread(target=prefetch, name="WikiPrefetch", daemon=True).start()
+
+def _intent_wikipedia(command, slots):
+    query = slots["query"]
+    if query:
+        cached = RESPONSE_CACHE.get("wikipedia", query)
+        if cached is not None: speak(cached, EXPR_TALKING, priority=PRIORITY_LOW); return
+        speak(f"Looking up {query} on Wikipedia...", EXPR_THINKING)
+        try: result = _fetch_wikipedia_summary(query)
+        except wikipedia.exceptions.PageError: speak(f"Sorry, no Wikipedia page for {query}.", EXPR_SAD)
+        except wikipedia.exceptions.DisambiguationError as e:
+            check_cancelled()
+            speak(f"'{query}' is ambiguous (e.g., {', '.join(e.options[:2])}). Be more specific?", EXPR_THINKING)
+            _prefetch_wikipedia_options(e.options[:DISAMBIGUATION_PREFETCH])
+        except Exception as e:
+            print(f"Wiki error: {e}")
+            stale = RESPONSE_CACHE.get("wikipedia", query, allow_stale=True) # Offline: an old answer beats none
+            if stale: speak(stale, EXPR_TALKING, priority=PRIORITY_LOW)
+            else: speak("Error searching Wikipedia.", EXPR_SAD)
+        else:
+            check_cancelled() # Cancelled or timed out during the lookup: the answer is cached, not read out
+            speak(result, EXPR_TALKING, priority=PRIORITY_LOW) # Long; later replies may go first
+    else: speak("Who or what are you asking about?", EXPR_THINKING)
 
-    # --- Specific command to identify bot ---
-    if command == "what is your name":
-        speak("My name is Loki, your virtual assistant!", EXPR_SMILING)
-        send_gui_command(EXPR_SMILING, "I'm Loki!")
-        return current_user_state
+# --- Communication ---
+def _send_whatsapp(phone: str, message: str):
+    try:
+        pywhatkit.sendwhatmsg_instantly(f"+91{phone}", message, wait_time=30, tab_close=False, close_time=5) # Increased wait, keep tab open
+        speak("Message has been scheduled on WhatsApp Web.", EXPR_HAPPY)
+    except Exception as e: print(f"WA error: {e}"); speak("Couldn't send WA msg. Is Web ready?", EXPR_SAD)
+
+def _intent_whatsapp(command, slots):
+    speak("To which 10 digit number?", EXPR_THINKING, wait=True); num_q = listen()
+    phone = "".join(filter(str.isdigit, num_q or ""));
+    if len(phone) == 10:
+        speak("And what message should I send?", EXPR_THINKING, wait=True); msg_c = listen()
+        if msg_c: # The send waits ~30s on WhatsApp Web, so it runs while Loki keeps listening
+            speak(f"Sending '{msg_c[:20]}...' to {phone}. Confirm in WhatsApp Web.", EXPR_PROCESSING)
+            run_in_background("whatsapp", f"whatsapp message to {phone}", _send_whatsapp, phone, msg_c, timeout=WHATSAPP_TASK_TIMEOUT_SEC)
+        else: speak("I didn't catch the message content.", EXPR_SAD)
+    else: speak("That doesn't seem like a valid 10-digit number.", EXPR_SAD)
+
+# --- Fun & Emotional ---
+def _intent_kiss(command, slots):
+    speak("Of course! Mwah!", EXPR_LOVELY)
+    send_gui_command_after_speech(expression=EXPR_KISSING_HEART, message="<3 Sending love! <3")
+
+def _intent_how_are_you(command, slots):
+    speak("I'm functioning optimally, thank you for asking! And you?", EXPR_HAPPY) # Engage back
+
+def _intent_joke(command, slots):
+    speak(pyjokes.get_joke(language='en', category='all'), EXPR_LAUGHING)
+
+def _intent_feel_sad(command, slots):
+    speak("I'm sorry to hear you're feeling down. Remember that feelings pass. I'm here if you need to vent.", EXPR_SAD)
+    send_gui_command_after_speech(EXPR_SAD, "Sending virtual comfort...")
+
+def _intent_feel_happy(command, slots):
+    speak("That's wonderful to hear! What's making you happy?", EXPR_HAPPY)
+
+def _intent_feel_angry(command, slots):
+    speak("Oh dear, I understand anger can be tough. Try taking a few deep breaths. Is there anything I can do?", EXPR_CONCERNED)
+
+def _intent_favorite_color(command, slots):
+    speak("I don't have eyes to see colors, but I think all colors are beautiful in their own way!", EXPR_SMILING)
+
+# --- Help command ---
+def _intent_help(command, slots):
+    cmds = ["ask about my name or your name", "open YouTube or Google", "play songs", "get time or date",
+            "search Wikipedia", "send WhatsApp messages", "tell jokes or give a kiss",
+            "react to 'I am sad/happy/angry'", "list or cancel what I'm doing in the background",
+            "shutdown or restart the system", "and say 'exit' to close me."]
+    speak("I can do several things! For example, you can:", EXPR_HAPPY)
+    print("🤖 Bot: Here are some things I can do:")
+    for c_example in cmds: print(f"  - {c_example}")
+    send_gui_command_after_speech(EXPR_HAPPY, "I can help with many tasks! Try asking.")
+
+# --- System Commands ---
+def _intent_shutdown(command, slots):
+    speak("Are you absolutely sure you want to shut down your computer? Say 'yes' to confirm.", EXPR_CONCERNED, wait=True); conf = listen()
+    if "yes" in (conf or ""): speak("Okay, shutting down your computer in 5 seconds. Goodbye!", EXPR_SLEEPY); os.system("shutdown /s /t 5")
+    else: speak("Shutdown cancelled. Phew!", EXPR_NEUTRAL)
+
+def _intent_restart(command, slots):
+    speak("Are you sure you want to restart your computer? Say 'yes'.", EXPR_CONCERNED, wait=True); conf = listen()
+    if "yes" in (conf or ""): speak("Okay, restarting your computer in 5 seconds.", EXPR_NEUTRAL); os.system("shutdown /r /t 5")
+    else: speak("Restart cancelled.", EXPR_NEUTRAL)
+
+# --- Background tasks ---
+def _intent_list_tasks(command, slots):
+    tasks = TASK_RUNNER.in_flight()
+    if not tasks: speak("I'm not working on anything in the background right now.", EXPR_NEUTRAL); return
+    names = ", ".join(f"{t.description} for {t.elapsed():.0f} seconds" for t in tasks)
+    speak(f"I'm busy with {len(tasks)} thing{'s' if len(tasks) > 1 else ''}: {names}.", EXPR_PROCESSING, priority=PRIORITY_URGENT)
+
+def _intent_cancel_task(command, slots):
+    cancelled = TASK_RUNNER.cancel(slots.get("target"))
+    if cancelled: speak(f"Okay, I stopped {', '.join(t.description for t in cancelled)}.", EXPR_NEUTRAL, priority=PRIORITY_URGENT)
+    else: speak("There's nothing like that running right now.", EXPR_NEUTRAL, priority=PRIORITY_URGENT)
+
+# --- Diagnostics ---
+def _intent_latency_report(command, slots):
+    summary = TRACER.summary()
+    print(f"Robot Log: Turn latency by stage (trace file '{TRACER.path}'): {summary}")
+    timed = [f"{stage} {s['p50_ms']:.0f}" for stage, s in summary.items() if "p50_ms" in s]
+    if timed: speak(f"Median milliseconds per stage: {', '.join(timed)}. Details are in the log.", EXPR_PROCESSING)
+    else: speak("I haven't timed any turns yet.", EXPR_NEUTRAL)
+
+# --- Exit ---
+def _intent_exit(command, slots):
+    if command.strip() == "stop" and TASK_RUNNER.in_flight(): # "stop" while busy means stop the work, not Loki
+        cancelled = TASK_RUNNER.cancel_all()
+        speak(f"Okay, I stopped {', '.join(t.description for t in cancelled)}.", EXPR_NEUTRAL, priority=PRIORITY_URGENT); return
+    speak("Goodbye! It was a pleasure assisting you. Have a wonderful day!", EXPR_SMILING, wait=True); time.sleep(0.5)
+    return EXIT_SIGNAL
+
+# Higher priority wins when several intents match one command (then the longest trigger).
+# Specific questions outrank the generic "what is {query}" Wikipedia lookup.
+COMMAND_INTENTS = [
+    Intent("bot_name", ["what is your name", "what's your name"], _intent_bot_name, priority=100),
+    Intent("set_user_name", "my name is {name}", _intent_set_user_name, priority=95),
+    Intent("user_name", ["what is my name", "who am i"], _intent_user_name, priority=90),
+    Intent("favorite_color", ["what is your favorite color", "what's your favorite color",
+                              "what is your favourite colour", "what's your favourite colour"], _intent_favorite_color, priority=90),
+    Intent("open_youtube", "open youtube", _intent_open_youtube, priority=85),
+    Intent("search_google", "search google for {query}", _intent_search_google, priority=80),
+    Intent("play_song", ["play song {term}", "play {term} on youtube"], _intent_play_song, priority=75,
+           background=True, timeout=30),
+    Intent("time", ["time", "what time is it"], _intent_time, priority=70),
+    Intent("date", ["date", "what's the date"], _intent_date, priority=65),
+    Intent("wikipedia", ["who is {query}", "what is {query}", "tell me about {query}"], _intent_wikipedia, priority=60,
+           background=True, timeout=20),
+    Intent("whatsapp", "send whatsapp message", _intent_whatsapp, priority=55),
+    Intent("kiss", ["ask for a kiss", "give me a kiss"], _intent_kiss, priority=50),
+    Intent("how_are_you", "how are you", _intent_how_are_you, priority=45),
+    Intent("joke", ["tell me a joke", "joke", "jokes"], _intent_joke, priority=40),
+    Intent("feel_sad", ["i am sad", "i feel sad"], _intent_feel_sad, priority=35),
+    Intent("feel_happy", ["i am happy", "i feel happy"], _intent_feel_happy, priority=35),
+    Intent("feel_angry", "i am angry", _intent_feel_angry, priority=35),
+    Intent("help", "what can you do", _intent_help, priority=30),
+    Intent("help_exact", "help", _intent_help, priority=30, exact=True),
+    Intent("shutdown", "shutdown system", _intent_shutdown, priority=25),
+    Intent("restart", "restart system", _intent_restart, priority=25),
+    Intent("list_tasks", ["what are you doing", "what are you working on", "list tasks", "background tasks"],
+           _intent_list_tasks, priority=20),
+    Intent("cancel_task", ["cancel {target}", "stop that", "never mind", "nevermind"], _intent_cancel_task, priority=20),
+    Intent("latency_report", ["latency report", "performance report", "how fast are you"], _intent_latency_report, priority=20),
+    Intent("exit", ["exit", "stop", "goodbye"], _intent_exit, priority=10),
+]
+INTENT_ROUTER = IntentRouter(COMMAND_INTENTS)
+
+# --- Background tasks: slow handlers run here while the logic thread goes back to listening ---
+TASK_RUNNER = TaskRunner()
+WHATSAPP_TASK_TIMEOUT_SEC = 90
+LOCAL_AI_TASK_TIMEOUT_SEC = 60
+
+def run_in_background(name: str, description: str, func, *args, timeout: float = None):
+    turn = TRACER.current() # The task's spans belong to the turn that started it
+    def traced(*task_args):
+        with TRACER.activate(turn), turn.span("handler", intent=name, background=True): return func(*task_args)
+    task = TASK_RUNNER.submit(name, traced, *args, description=description, timeout=timeout)
+    def on_cancel():
+        TTS_WORKER.interrupt() # Stop whatever it was saying
+        if task.status == "timed_out": speak(f"Sorry, {task.description} took too long, so I stopped.", EXPR_CONCERNED)
+    task.on_cancel.append(on_cancel)
+    return task
+
+def _run_command_task(handler, *args):
+    """Body of a background command: the handler, then the usual neutral GUI state afterwards."""
+    if handler(*args) != GUI_ALREADY_SET: send_gui_command_after_speech(EXPR_NEUTRAL, "")
 
-    # --- User identification ---
-    elif "my name is" in command:
-        name_part = command.split("my name is", 1)[1].strip()
-        if name_part:
-            name = name_part.title(); save_name(name)
-            speak(f"Nice to meet you, {name}. I’ll remember that!", EXPR_HAPPY)
-            current_user_state = name; send_gui_command(EXPR_HAPPY, f"Met {name}!")
-        else: speak("I didn't quite catch the name. Could you repeat?", EXPR_THINKING)
-        return current_user_state
+# --- Process Voice Commands ---
+def process_command(command: str):
+    if not command: send_gui_command(EXPR_NEUTRAL, ""); return current_user_state
 
-    elif "what is my name" in command or "who am i" in command:
-        if current_user_state: speak(f"Your name is {current_user_state}.", EXPR_SMILING)
-        else: speak("I don't know your name yet. You can tell me!", EXPR_SHYING)
-
-    # --- Web and Media ---
-    elif "open youtube" in command:
-        speak("Opening YouTube now.", EXPR_NEUTRAL); webbrowser.open("https://youtube.com")
-        send_gui_command(EXPR_NEUTRAL, "Opened YouTube.")
-    elif "search google for" in command:
-        query = command.replace("search google for", "").strip()
-        if query:
-            speak(f"Searching Google for {query}", EXPR_THINKING); webbrowser.open(f"https://google.com/search?q={query}")
-            send_gui_command(EXPR_NEUTRAL, f"Searched: {query[:20]}...")
-        else: speak("What would you like me to search on Google?", EXPR_THINKING)
-    elif "play song" in command or ("play" in command and "on youtube" in command):
-        term = command.lower().replace("play song", "").replace("play", "").replace("on youtube","").strip()
-        if term:
-            speak(f"Playing {term} on YouTube.", EXPR_HAPPY);
-            try: pywhatkit.playonyt(term)
-            except Exception as e: print(f"pywhatkit error: {e}"); speak(f"Couldn't play {term} due to an error.", EXPR_SAD)
-            send_gui_command(EXPR_HAPPY, f"Playing: {term[:20]}...")
-        else: speak("What song would you like me to play?", EXPR_THINKING)
-
-    # --- Information ---
-    elif "time" in command:
-        speak(f"The current time is {datetime.datetime.now().strftime('%I:%M %p')}", EXPR_NEUTRAL)
-    elif "date" in command:
-        speak(f"Today is {datetime.datetime.now().strftime('%A, %B %d, %Y')}", EXPR_NEUTRAL)
-    elif "who is" in command or "what is" in command or "tell me about" in command:
-        if "your name" in command and "what is" in command : speak("I am Loki!", EXPR_SMILING)
-        else:
-            query = command.lower().replace("who is", "").replace("what is", "").replace("tell me about", "").strip()
-            if query:
-                speak(f"Looking up {query} on Wikipedia...", EXPR_THINKING)
-                try:
-                    result = wikipedia.summary(query, sentences=2, auto_suggest=True, redirect=True)
-                    speak(result, EXPR_TALKING)
-                except wikipedia.exceptions.PageError: speak(f"Sorry, no Wikipedia page for {query}.", EXPR_SAD)
-                except wikipedia.exceptions.DisambiguationError as e: speak(f"'{query}' is ambiguous (e.g., {', '.join(e.options[:2])}). Be more specific?", EXPR_THINKING)
-                except Exception as e: print(f"Wiki error: {e}"); speak("Error searching Wikipedia.", EXPR_SAD)
-            else: speak("Who or what are you asking about?", EXPR_THINKING)
-
-    # --- Communication ---
-    elif "send whatsapp message" in command:
-        speak("To which 10 digit number?", EXPR_THINKING); num_q = listen()
-        phone = "".join(filter(str.isdigit, num_q or ""));
-        if len(phone) == 10:
-            speak("And what message should I send?", EXPR_THINKING); msg_c = listen()
-            if msg_c:
-                try:
-                    speak(f"Sending '{msg_c[:20]}...' to {phone}. Confirm in WhatsApp Web.", EXPR_PROCESSING)
-                    pywhatkit.sendwhatmsg_instantly(f"+91{phone}", msg_c, wait_time=30, tab_close=False, close_time=5) # Increased wait, keep tab open
-                    speak("Message has been scheduled on WhatsApp Web.", EXPR_HAPPY)
-                except Exception as e: print(f"WA error: {e}"); speak("Couldn't send WA msg. Is Web ready?", EXPR_SAD)
-            else: speak("I didn't catch the message content.", EXPR_SAD)
-        else: speak("That doesn't seem like a valid 10-digit number.", EXPR_SAD)
-
-    # --- Fun & Emotional ---
-    elif "ask for a kiss" in command or "give me a kiss" in command:
-        speak("Of course! Mwah!", EXPR_LOVELY)
-        send_gui_command(expression=EXPR_KISSING_HEART, message="<3 Sending love! <3")
-    elif "how are you" in command:
-        speak("I'm functioning optimally, thank you for asking! And you?", EXPR_HAPPY) # Engage back
-    elif "tell me a joke" in command or "joke" in command:
-        speak(pyjokes.get_joke(language='en', category='all'), EXPR_LAUGHING)
-    elif "i am sad" in command or "i feel sad" in command:
-        speak("I'm sorry to hear you're feeling down. Remember that feelings pass. I'm here if you need to vent.", EXPR_SAD)
-        send_gui_command(EXPR_SAD, "Sending virtual comfort...")
-    elif "i am happy" in command or "i feel happy" in command:
-        speak("That's wonderful to hear! What's making you happy?", EXPR_HAPPY)
-    elif "i am angry" in command:
-        speak("Oh dear, I understand anger can be tough. Try taking a few deep breaths. Is there anything I can do?", EXPR_CONCERNED)
-    # In process_command, BEFORE the general Wikipedia elif:
-    elif "what is your favorite color" in command or "what's your favorite color" in command:
-        speak("I don't have eyes to see colors, but I think all colors are beautiful in their own way!", EXPR_SMILING)
-        # ... then the existing Wikipedia elif
-    # --- Help command ---
-    elif "what can you do" in command or "help" == command.strip():
-        cmds = ["ask about my name or your name", "open YouTube or Google", "play songs", "get time or date",
-                "search Wikipedia", "send WhatsApp messages", "tell jokes or give a kiss",
-                "react to 'I am sad/happy/angry'", "shutdown or restart the system", "and say 'exit' to close me."]
-        speak("I can do several things! For example, you can:", EXPR_HAPPY)
-        # for i, c_example in enumerate(cmds[:3]): # Speak first few examples
-        #     speak(c_example, EXPR_SMILING); time.sleep(0.1)
-        print("🤖 Bot: Here are some things I can do:")
-        for c_example in cmds: print(f"  - {c_example}")
-        send_gui_command(EXPR_HAPPY, "I can help with many tasks! Try asking.")
-
-    # --- System Commands ---
-    elif "shutdown system" in command:
-        speak("Are you absolutely sure you want to shut down your computer? Say 'yes' to confirm.", EXPR_CONCERNED); conf = listen()
-        if "yes" in (conf or ""): speak("Okay, shutting down your computer in 5 seconds. Goodbye!", EXPR_SLEEPY); os.system("shutdown /s /t 5")
-        else: speak("Shutdown cancelled. Phew!", EXPR_NEUTRAL)
-    elif "restart system" in command:
-        speak("Are you sure you want to restart your computer? Say 'yes'.", EXPR_CONCERNED); conf = listen()
-        if "yes" in (conf or ""): speak("Okay, restarting your computer in 5 seconds.", EXPR_NEUTRAL); os.system("shutdown /r /t 5")
-        else: speak("Restart cancelled.", EXPR_NEUTRAL)
-
-    # --- Exit ---
-    elif "exit" in command or "stop" in command or "goodbye" in command:
-        speak("Goodbye! It was a pleasure assisting you. Have a wonderful day!", EXPR_SMILING); time.sleep(0.5)
-        return "exit_signal"
+    turn = TRACER.current()
+    with turn.span("intent") as attrs:
+        match = INTENT_ROUTER.route(command) # One pass over the command for every registered intent
+        attrs["intent"] = match.intent.name if match else "local_ai"
+    if match and match.intent.background:
+        description = " ".join([match.intent.name.replace("_", " ")] + [v for v in match.slots.values() if v])
+        run_in_background(match.intent.name, description, _run_command_task, match.intent.handler, command, match.slots,
+                          timeout=match.intent.timeout)
+        return current_user_state
+    elif match:
+        with turn.span("handler", intent=match.intent.name): outcome = match.intent.handler(command, match.slots)
+        if outcome == EXIT_SIGNAL: return EXIT_SIGNAL
+        if outcome == GUI_ALREADY_SET: return current_user_state
 
     # --- Fallback to Local AI ---
-    else:
-        if TRANSFORMERS_AVAILABLE:
-            if LOCAL_AI_PIPELINE:
-                response_ai = ask_local_model(command)
-                speak(response_ai if response_ai else "I'm not sure how to respond to that.", EXPR_TALKING)
-            else: speak("My local AI brain is still warming up or had an issue. Please try specific commands or wait a moment.", EXPR_CONCERNED)
-        else: speak("I can only handle specific commands right now as my advanced AI module isn't installed.", EXPR_SAD)
-
-    send_gui_command(EXPR_NEUTRAL, "") # Default GUI state after command if not set otherwise
+    elif TRANSFORMERS_AVAILABLE or INFERENCE_SERVER:
+        if LOCAL_CHAT_MODEL:
+            run_in_background("local_ai", f"answering {command[:30]}", _run_command_task, _answer_with_local_ai, command,
+                              timeout=LOCAL_AI_TASK_TIMEOUT_SEC)
+            return current_user_state
+        elif STARTUP_COMPONENTS.is_loading(COMPONENT_LOCAL_AI): # Answer as soon as the model is up
+            def deferred_answer():
+                with TRACER.activate(turn), turn.span("handler", intent="local_ai", deferred=True): _answer_with_local_ai(command)
+            STARTUP_COMPONENTS.when_ready(COMPONENT_LOCAL_AI, deferred_answer)
+            speak("My local AI brain is still warming up. I'll answer that as soon as it's ready; meanwhile try specific commands.", EXPR_CONCERNED)
+        else: speak("My local AI brain had an issue. Please try specific commands.", EXPR_CONCERNED)
+    else: speak("I can only handle specific commands right now as my advanced AI module isn't installed.", EXPR_SAD)
+
+    send_gui_command_after_speech(EXPR_NEUTRAL, "") # Default GUI state after command if not set otherwise
     return current_user_state # Return current user state
 
 # --- Assistant Setup and Main Loop Orchestration ---
+def _load_local_ai_component():
+    initialize_local_ai_model() # Load Hugging Face model (can take time)
+    return LOCAL_CHAT_MODEL is not None
+
+def _load_faces_component():
+    """Loads the gallery, then tries a camera check and greets by face if it finds someone."""
+    global current_user_state
+    if not load_known_faces(): # Load face recognition data
+        send_gui_command_after_speech(EXPR_NEUTRAL, "Face recognition unavailable.")
+        return False
+    recognized_name_cam = recognize_face_from_cam() # This shows a CV2 window
+    if recognized_name_cam and recognized_name_cam != current_user_state:
+        current_user_state = recognized_name_cam
+        previous = save_name(current_user_state) # Remember recognized user and load their profile
+        speak(f"Hello {current_user_state}, it's great to see your face!{_last_seen_phrase(previous)}", EXPR_HAPPY)
+    return True
+
+def _answer_with_local_ai(command: str):
+    cacheable = len(normalize_query(command).split()) <= LOCAL_AI_CACHE_MAX_WORDS
+    if cacheable:
+        cached = RESPONSE_CACHE.get("local_ai", command)
+        if cached is not None: speak(cached, EXPR_TALKING); return
+    with LOCAL_AI_LOCK: # Deferred answers may run on the loader thread while the main loop continues
+        if LOCAL_AI_STREAMING: response_ai, complete = ask_local_model_streaming(command) # Speaks as it generates
+        else:
+            response_ai = ask_local_model(command); complete = not cancel_requested()
+            speak(response_ai if response_ai else LOCAL_AI_NO_REPLY, EXPR_TALKING)
+    if not complete or not response_ai or response_ai in (LOCAL_AI_NO_REPLY, LOCAL_AI_TROUBLE_REPLY): return # Partial replies are never reused
+    if cacheable: RESPONSE_CACHE.put("local_ai", command, response_ai, LOCAL_AI_CACHE_TTL_SEC)
+    if current_user_state: get_profile_store().note_exchange(current_user_state, command, response_ai) # Per-user summary
+
 def assistant_setup():
-    """One-time setup for the assistant: loads models, greets user."""
+    """
+    Staged setup: greets from memory straight away so fast-path commands (time, date, jokes...)
+    work immediately, while the local AI model and the face gallery load on background threads.
+    """
     global current_user_state
     send_gui_command(EXPR_NEUTRAL, "Loki is waking up...")
-    initialize_local_ai_model() # Load Hugging Face model (can take time)
+    STARTUP_COMPONENTS.start(COMPONENT_LOCAL_AI, _load_local_ai_component)
+    STARTUP_COMPONENTS.start(COMPONENT_FACES, _load_faces_component)
+
+    current_user_state = load_name() # Camera check may replace this once faces are loaded
+    if current_user_state:
+        speak(f"Hi {current_user_state}, welcome back!", EXPR_HAPPY)
+    else: # No saved name either
+        speak("Hello! I'm Loki. To get to know you better, you can tell me your name by saying 'my name is ...'", EXPR_NEUTRAL)
 
-    if load_known_faces(): # Load face recognition data
-        # Attempt camera-based recognition
-        recognized_name_cam = recognize_face_from_cam() # This shows a CV2 window
-        if recognized_name_cam:
-            current_user_state = recognized_name_cam
-            save_name(current_user_state) # Remember recognized user
-            speak(f"Hello {current_user_state}, it's great to see your face!", EXPR_HAPPY)
-        else: # No face recognized by camera, try loading from memory
-            current_user_state = load_name()
-            if current_user_state:
-                speak(f"Hi {current_user_state}, welcome back!", EXPR_HAPPY)
-            else: # No saved name either
-                speak("Hello! I'm Loki. To get to know you better, you can tell me your name by saying 'my name is ...'", EXPR_NEUTRAL)
-    else: # Failed to load known faces data
-        speak("There was an issue with setting up face recognition. We can still chat!", EXPR_SAD)
-        current_user_state = load_name() # Try loading name from memory anyway
-        if current_user_state:
-            speak(f"Hi {current_user_state}, let's get started!", EXPR_HAPPY)
-        else:
-            speak("Hello! I'm Loki. How can I assist you today?", EXPR_NEUTRAL)
-    
     final_greeting = f"Hi {current_user_state}!" if current_user_state else "Hi there! How can I help?"
-    send_gui_command(EXPR_NEUTRAL, final_greeting) # Set initial GUI message
+    send_gui_command_after_speech(EXPR_NEUTRAL, final_greeting) # Set initial GUI message
+    print(f"Robot Log: Fast-path commands ready after {STARTUP_COMPONENTS.report()['_since_start_s']}s.")
+    def report_when_loaded():
+        for name in (COMPONENT_LOCAL_AI, COMPONENT_FACES): STARTUP_COMPONENTS.wait(name)
+        print(f"Robot Log: Startup readiness: {STARTUP_COMPONENTS.report()}")
+    threading.Thread(target=report_when_loaded, name="StartupReport", daemon=True).start()
 
 def assistant_main_cycle():
     """Performs one full cycle of listening, processing, and responding."""
     global current_user_state
+    TRACER.start_turn() # Spans from listen() onwards, including background work it starts, share its id
     command_heard = listen() # listen() updates GUI
     if command_heard:
         return process_command(command_heard) # process_command() updates GUI and returns signal or user state
@@ -511,10 +922,11 @@ def robot_logic_thread_function(stop_event: threading.Event):
     """Target function for the robot's logic thread."""
     print("Robot Thread: Initializing assistant logic...")
     try:
+        TTS_WORKER.start()
         assistant_setup()
         while not stop_event.is_set():
             signal = assistant_main_cycle()
-            if signal == "exit_signal":
+            if signal == EXIT_SIGNAL:
                 print("Robot Thread: Exit signal received from assistant logic."); break
             if stop_event.is_set(): # Check if main GUI thread requested stop
                 print("Robot Thread: Stop event detected from main thread."); break
@@ -525,16 +937,34 @@ def robot_logic_thread_function(stop_event: threading.Event):
     finally:
         print("Robot Thread: Shutting down assistant logic...")
         send_gui_command(EXPR_SLEEPY, "Loki is going offline...")
+        if is_loaded(face_pipeline): face_pipeline.shutdown_detect_executor() # Stop the face detection worker processes
+        TASK_RUNNER.shutdown(timeout=3.0) # Cancel in-flight background commands
+        TTS_WORKER.wait_until_idle(timeout=5.0); TTS_WORKER.stop()
+        AUDIO_CAPTURE.stop() # Close the microphone stream
+        if VAD_ENABLED: print(f"Robot Log: VAD endpointing report: {VOICE_ACTIVITY.report()}")
+        if WAKE_WORD_SPOTTER: print(f"Robot Log: Wake word report: {WAKE_WORD_SPOTTER.report()}")
+        RESPONSE_CACHE.flush(); print(f"Robot Log: Response cache: {RESPONSE_CACHE.report()}")
+        if PROFILE_STORE: PROFILE_STORE.close(); print(f"Robot Log: Profile store: {PROFILE_STORE.report()}")
+        print(f"Robot Log: Turn latency by stage: {TRACER.summary()}"); TRACER.close()
         if GUI_COMMAND_QUEUE: # Try to send a quit signal to GUI if robot thread is exiting first
-            try: GUI_COMMAND_QUEUE.put_nowait({"type": "system", "action": "quit"})
-            except queue.Full: pass
+            GUI_COMMAND_QUEUE.put_nowait({"type": "system", "action": "quit"}) # System actions are never dropped
         time.sleep(1) # Allow GUI to show final message
 
 # --- Main Application Entry Point ---
 if __name__ == "__main__":
     print("Main App: Loki Voice Assistant with GUI starting...")
-    # 1. Create communication queue (Robot Logic Thread -> GUI Main Thread)
-    shared_gui_command_queue = queue.Queue(maxsize=50) # Increased maxsize
+    # --- Import your GUI class ---
+    try:
+        gui_module = timed_import("gui", "gui") # From your new gui.py file
+        RobotFaceGUI = gui_module.RobotFaceGUI
+    except (ImportError, AttributeError) as e:
+        print(f"CRITICAL ERROR: Could not import RobotFaceGUI from gui.py: {e}")
+        print("Please ensure gui.py exists in the same directory and has no errors.")
+        exit() # Cannot proceed without the GUI component
+    write_import_report() # Startup imports now; heavy ones are appended as they are first used
+
+    # 1. Create communication channel (Robot Logic Thread -> GUI Main Thread); only the latest state is kept
+    shared_gui_command_queue = GuiCommandChannel()
 
     # 2. Provide this queue to the robot module (for send_gui_command)
     set_global_gui_queue(shared_gui_command_queue)
@@ -577,5 +1007,6 @@ if __name__ == "__main__":
                 print("Main App: Robot logic thread joined successfully.")
         else:
             print("Main App: Robot logic thread was already finished.")
+        print(f"Main App: GUI channel stats: {shared_gui_command_queue.report()}")
             
         print("Main App: Application shutdown complete.")
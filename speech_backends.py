@@ -0,0 +1,197 @@
+
+# speech_backends.py (Pluggable speech recognizers: Google, offline Vosk, file-based stand-in)
+
+import os
+import json
+
+# --- Configuration Constants ---
+VOSK_MODEL_PATH = os.environ.get("LOKI_VOSK_MODEL", "models/vosk-model-small-en-us-0.15")
+
+class SpeechNotUnderstood(Exception):
+    """Audio was received but no words could be recognized."""
+
+class SpeechServiceError(Exception):
+    """The recognizer itself failed (network down, model missing, ...)."""
+
+class RecognitionSession:
+    """
+    One utterance. feed() is called with every audio chunk as it is captured; streaming
+    backends report partial transcripts through on_partial. finish() returns the final text.
+    """
+    def __init__(self, backend, sample_rate: int, sample_width: int, on_partial=None):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.on_partial = on_partial
+        self.last_partial = ""
+
+    def _partial(self, text: str):
+        if text and text != self.last_partial:
+            self.last_partial = text
+            if self.on_partial:
+                try: self.on_partial(text)
+                except Exception as e: print(f"Robot Log: Partial transcript callback error: {e}")
+
+    def feed(self, chunk: bytes):
+        pass # Batch backends only look at the whole phrase
+
+    def finish(self, raw_audio: bytes) -> str:
+        return self.backend.recognize(raw_audio, self.sample_rate, self.sample_width)
+
+class RecognizerBackend:
+    name = "base"
+    streaming = False # True if partial transcripts are produced while the user speaks
+
+    def start_utterance(self, sample_rate: int, sample_width: int, on_partial=None) -> RecognitionSession:
+        return RecognitionSession(self, sample_rate, sample_width, on_partial)
+
+    def recognize(self, raw_audio: bytes, sample_rate: int, sample_width: int) -> str:
+        raise NotImplementedError
+
+# --- Google Web Speech (online, what listen() always used) ---
+class GoogleBackend(RecognizerBackend):
+    name = "google"
+
+    def __init__(self):
+        try: import speech_recognition as sr
+        except ImportError as e: raise SpeechServiceError(f"speech_recognition is not installed: {e}")
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+
+    def recognize(self, raw_audio, sample_rate, sample_width):
+        sr = self._sr
+        try: return self._recognizer.recognize_google(sr.AudioData(raw_audio, sample_rate, sample_width))
+        except sr.UnknownValueError: raise SpeechNotUnderstood("Google SR could not understand audio")
+        except sr.RequestError as e: raise SpeechServiceError(str(e))
+
+# --- Vosk (offline, streaming partials) ---
+class _VoskSession(RecognitionSession):
+    def __init__(self, backend, sample_rate, sample_width, on_partial=None):
+        super().__init__(backend, sample_rate, sample_width, on_partial)
+        self.recognizer = backend.new_recognizer(sample_rate)
+        self.segments = [] # Text of segments Vosk has already closed mid-utterance
+        self.fed = False
+
+    def feed(self, chunk: bytes):
+        self.fed = True
+        if self.recognizer.AcceptWaveform(chunk):
+            segment = json.loads(self.recognizer.Result()).get("text", "")
+            if segment: self.segments.append(segment)
+            self._partial(" ".join(self.segments))
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+            self._partial(" ".join(self.segments + ([partial] if partial else [])))
+
+    def finish(self, raw_audio: bytes) -> str:
+        if not self.fed: self.recognizer.AcceptWaveform(raw_audio)
+        final = json.loads(self.recognizer.FinalResult()).get("text", "")
+        text = " ".join(self.segments + ([final] if final else [])).strip()
+        if not text: raise SpeechNotUnderstood("Vosk could not understand audio")
+        return text
+
+class VoskBackend(RecognizerBackend):
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH):
+        try: import vosk
+        except ImportError as e: raise SpeechServiceError(f"vosk is not installed: {e}")
+        if not os.path.isdir(model_path):
+            raise SpeechServiceError(f"Vosk model not found at '{model_path}' (set LOKI_VOSK_MODEL)")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path) # Loaded once, shared by every utterance
+
+    def new_recognizer(self, sample_rate: int):
+        return self._vosk.KaldiRecognizer(self.model, sample_rate)
+
+    def start_utterance(self, sample_rate, sample_width, on_partial=None):
+        return _VoskSession(self, sample_rate, sample_width, on_partial)
+
+    def recognize(self, raw_audio, sample_rate, sample_width):
+        return self.start_utterance(sample_rate, sample_width).finish(raw_audio)
+
+# --- File-based stand-in for tests and offline benchmarks ---
+class _FileSession(RecognitionSession):
+    def feed(self, chunk: bytes):
+        if not self.backend.emit_partials: return
+        self.backend.fed_bytes += len(chunk)
+        words = self.backend.peek().split()
+        if words: # Reveal words in proportion to audio received so far (assume ~0.4s per word)
+            seconds = self.backend.fed_bytes / float(self.sample_rate * self.sample_width)
+            self._partial(" ".join(words[:max(1, min(len(words), int(seconds / 0.4)))]))
+
+    def finish(self, raw_audio):
+        self.backend.fed_bytes = 0
+        return self.backend.recognize(raw_audio, self.sample_rate, self.sample_width)
+
+class FileBackend(RecognizerBackend):
+    """
+    Returns scripted transcripts in order, ignoring the audio. Transcripts come from a list or
+    a text file with one utterance per line; an empty line means 'not understood'.
+    """
+    name = "file"
+    streaming = True
+
+    def __init__(self, transcripts=None, path: str = None, emit_partials: bool = True):
+        if path:
+            with open(path, encoding="utf-8") as f: transcripts = [line.rstrip("\n") for line in f]
+        self.transcripts = list(transcripts or [])
+        self.emit_partials = emit_partials
+        self.fed_bytes = 0
+        self.position = 0
+
+    def peek(self) -> str:
+        return self.transcripts[self.position] if self.position < len(self.transcripts) else ""
+
+    def start_utterance(self, sample_rate, sample_width, on_partial=None):
+        return _FileSession(self, sample_rate, sample_width, on_partial)
+
+    def recognize(self, raw_audio, sample_rate, sample_width):
+        if self.position >= len(self.transcripts): raise SpeechServiceError("FileBackend: out of transcripts")
+        text = self.transcripts[self.position]; self.position += 1
+        if not text.strip(): raise SpeechNotUnderstood("FileBackend: scripted non-understanding")
+        return text
+
+# --- Online first, offline when the network is down ---
+class _FallbackSession(RecognitionSession):
+    def __init__(self, backend, primary_session):
+        super().__init__(backend, primary_session.sample_rate, primary_session.sample_width, primary_session.on_partial)
+        self.primary_session = primary_session
+
+    def feed(self, chunk):
+        self.primary_session.feed(chunk)
+
+    def finish(self, raw_audio):
+        try: return self.primary_session.finish(raw_audio)
+        except SpeechServiceError as e:
+            print(f"Robot Log: {self.backend.primary.name} recognizer unavailable ({e}), using {self.backend.fallback.name}.")
+            return self.backend.fallback.recognize(raw_audio, self.sample_rate, self.sample_width)
+
+class FallbackBackend(RecognizerBackend):
+    def __init__(self, primary: RecognizerBackend, fallback: RecognizerBackend):
+        self.primary = primary; self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+        self.streaming = primary.streaming
+
+    def start_utterance(self, sample_rate, sample_width, on_partial=None):
+        return _FallbackSession(self, self.primary.start_utterance(sample_rate, sample_width, on_partial))
+
+    def recognize(self, raw_audio, sample_rate, sample_width):
+        return self.start_utterance(sample_rate, sample_width).finish(raw_audio)
+
+def create_backend(name: str = "auto", **kwargs) -> RecognizerBackend:
+    """
+    "google", "vosk", "google+vosk" (Google, Vosk when the network is down), "file" (kwargs:
+    transcripts= or path=), or "auto": Vosk if a model is installed (streaming, works offline),
+    otherwise Google alone. Raises SpeechServiceError if the requested recognizer can't load.
+    """
+    if name == "google": return GoogleBackend()
+    if name == "vosk": return VoskBackend(**kwargs)
+    if name == "file": return FileBackend(**kwargs)
+    if name == "google+vosk": return FallbackBackend(GoogleBackend(), VoskBackend(**kwargs))
+    if name != "auto": raise ValueError(f"Unknown speech recognition backend '{name}'")
+    try: return VoskBackend(**kwargs)
+    except SpeechServiceError as e:
+        print(f"Robot Log: Offline recognizer unavailable ({e}); using Google speech recognition.")
+        return GoogleBackend()
@@ -0,0 +1,155 @@
+
+# task_runner.py (Background execution of slow voice commands, with timeouts and cancellation)
+
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Configuration Constants ---
+TASK_WORKERS = 4
+WATCHDOG_INTERVAL_SEC = 0.25
+FILLER_WORDS = {"the", "a", "an", "that", "this", "it", "my", "task", "please"}
+
+_current = threading.local() # The BackgroundTask running on this worker thread, if any
+
+class TaskCancelled(Exception):
+    """Raised by check_cancelled() inside a task that was cancelled or timed out."""
+
+class BackgroundTask:
+    def __init__(self, task_id: int, name: str, description: str, timeout: float = None):
+        self.id = task_id
+        self.name = name
+        self.description = description or name
+        self.timeout = timeout
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event() # Cooperative: the task checks it (or passes it on)
+        self.status = "queued" # queued, running, done, failed, cancelled, timed_out
+        self.future = None
+        self.on_cancel = [] # Called once when the task is cancelled or times out
+
+    def cancel_requested(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - (self.started_at or self.submitted_at)
+
+    def __repr__(self):
+        return f"<task {self.id} {self.name} {self.status} {self.elapsed():.1f}s>"
+
+def current_task():
+    """The BackgroundTask running on this thread, or None on the main/listening thread."""
+    return getattr(_current, "task", None)
+
+def cancel_requested() -> bool:
+    task = current_task()
+    return bool(task and task.cancel_requested())
+
+def check_cancelled():
+    if cancel_requested(): raise TaskCancelled(current_task().description)
+
+class TaskRunner:
+    """
+    Runs slow command handlers (YouTube, WhatsApp, Wikipedia, local AI) on a thread pool so
+    the logic thread can go straight back to listen(). Python threads cannot be killed, so
+    cancellation and timeouts set the task's cancel_event; handlers check it between steps,
+    and on_cancel hooks stop work that can be interrupted (speech, generation).
+    """
+    def __init__(self, max_workers: int = TASK_WORKERS):
+        self.max_workers = max_workers
+        self.tasks = {} # id -> BackgroundTask, in flight only
+        self.history = [] # Finished tasks, most recent last (bounded)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Task")
+            self._watchdog = threading.Thread(target=self._watchdog_loop, name="TaskWatchdog", daemon=True)
+            self._watchdog.start()
+
+    def submit(self, name: str, func, *args, description: str = None, timeout: float = None, **kwargs) -> BackgroundTask:
+        with self._lock:
+            self._ensure_started()
+            task = BackgroundTask(next(self._ids), name, description, timeout)
+            self.tasks[task.id] = task
+            task.future = self._executor.submit(self._run, task, func, args, kwargs)
+        return task
+
+    def _run(self, task: BackgroundTask, func, args, kwargs):
+        if task.cancel_requested(): self._finish(task, "cancelled"); return None
+        task.started_at = time.monotonic(); task.status = "running"
+        _current.task = task
+        try:
+            result = func(*args, **kwargs)
+            self._finish(task, "done" if not task.cancel_requested() else task.status)
+            return result
+        except TaskCancelled:
+            self._finish(task, task.status if task.status in ("cancelled", "timed_out") else "cancelled")
+        except Exception as e:
+            print(f"Robot Error: Background task '{task.description}' failed: {e}")
+            traceback.print_exc()
+            self._finish(task, "failed")
+        finally:
+            _current.task = None
+
+    def _finish(self, task: BackgroundTask, status: str):
+        task.finished_at = time.monotonic()
+        if task.status not in ("cancelled", "timed_out"): task.status = status
+        with self._lock:
+            self.tasks.pop(task.id, None)
+            self.history.append(task); del self.history[:-50]
+        print(f"Robot Log: Task {task.id} '{task.description}' {task.status} after {task.elapsed():.2f}s.")
+
+    def _watchdog_loop(self):
+        while not self._stopping.wait(WATCHDOG_INTERVAL_SEC):
+            for task in self.in_flight():
+                if task.timeout and task.started_at and not task.cancel_requested() \
+                        and time.monotonic() - task.started_at > task.timeout:
+                    self._cancel(task, "timed_out")
+
+    def _cancel(self, task: BackgroundTask, status: str = "cancelled") -> bool:
+        if task.cancel_requested(): return False
+        task.status = status; task.cancel_event.set()
+        if task.future is not None and task.future.cancel(): self._finish(task, status) # Never started
+        for hook in task.on_cancel:
+            try: hook()
+            except Exception as e: print(f"Robot Error: Cancel hook for task {task.id} failed: {e}")
+        return True
+
+    # --- Queries and control (used by the voice commands) ---
+    def in_flight(self) -> list:
+        with self._lock: return sorted(self.tasks.values(), key=lambda t: t.id)
+
+    def cancel(self, target=None) -> list:
+        """
+        Cancels the task with this id, or the tasks whose name/description share a word with
+        target ("cancel the song"). None, or only filler words ("cancel that"), = most recent task.
+        """
+        tasks = self.in_flight()
+        words = [w for w in str(target or "").lower().split() if w not in FILLER_WORDS]
+        if isinstance(target, int): chosen = [t for t in tasks if t.id == target]
+        elif not words: chosen = tasks[-1:]
+        else:
+            chosen = [t for t in tasks if any(w in f"{t.name.replace('_', ' ')} {t.description}".lower().split() for w in words)]
+        return [t for t in chosen if self._cancel(t)]
+
+    def cancel_all(self) -> list:
+        return [t for t in self.in_flight() if self._cancel(t)]
+
+    def shutdown(self, timeout: float = 5.0):
+        self.cancel_all()
+        self._stopping.set()
+        if self._executor is not None:
+            deadline = time.monotonic() + timeout
+            for task in self.in_flight():
+                if task.future is not None:
+                    try: task.future.result(timeout=max(0.0, deadline - time.monotonic()))
+                    except Exception: pass
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,60 @@
+
+# test_speech_backends.py (Recognizer selection and online -> offline fallback, using scripted FileBackends)
+
+import pytest
+
+import robot_dialogGPT as robot
+from speech_backends import (FileBackend, FallbackBackend, SpeechNotUnderstood, SpeechServiceError,
+                             create_backend)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+AUDIO = b"\x00\x00" * SAMPLE_RATE # One second of silence; FileBackend ignores the content
+
+def test_file_backend_returns_transcripts_in_order():
+    backend = create_backend("file", transcripts=["open youtube", "what time is it"])
+    assert isinstance(backend, FileBackend)
+    assert backend.recognize(AUDIO, SAMPLE_RATE, SAMPLE_WIDTH) == "open youtube"
+    assert backend.recognize(AUDIO, SAMPLE_RATE, SAMPLE_WIDTH) == "what time is it"
+    with pytest.raises(SpeechServiceError): backend.recognize(AUDIO, SAMPLE_RATE, SAMPLE_WIDTH)
+
+def test_file_backend_empty_line_is_not_understood():
+    with pytest.raises(SpeechNotUnderstood):
+        FileBackend([""]).recognize(AUDIO, SAMPLE_RATE, SAMPLE_WIDTH)
+
+def test_fallback_used_when_primary_service_fails():
+    backend = FallbackBackend(FileBackend([]), FileBackend(["tell me a joke"]))
+    session = backend.start_utterance(SAMPLE_RATE, SAMPLE_WIDTH)
+    session.feed(AUDIO)
+    assert session.finish(AUDIO) == "tell me a joke"
+    assert backend.name == "file+file"
+
+def test_primary_result_wins_when_available():
+    primary, fallback = FileBackend(["who is alan turing"]), FileBackend(["unused"])
+    assert FallbackBackend(primary, fallback).recognize(AUDIO, SAMPLE_RATE, SAMPLE_WIDTH) == "who is alan turing"
+    assert fallback.position == 0
+
+def test_not_understood_is_not_retried_on_fallback():
+    fallback = FileBackend(["unused"])
+    with pytest.raises(SpeechNotUnderstood):
+        FallbackBackend(FileBackend([""]), fallback).recognize(AUDIO, SAMPLE_RATE, SAMPLE_WIDTH)
+    assert fallback.position == 0
+
+def test_partials_come_from_the_primary_session():
+    partials = []
+    backend = FallbackBackend(FileBackend(["play despacito on youtube"]), FileBackend([]))
+    session = backend.start_utterance(SAMPLE_RATE, SAMPLE_WIDTH, partials.append)
+    session.feed(AUDIO)
+    assert partials and "play despacito on youtube".startswith(partials[-1])
+    assert session.finish(AUDIO) == "play despacito on youtube"
+
+def test_unknown_backend_name_is_rejected():
+    with pytest.raises(ValueError): create_backend("morse")
+
+def test_robot_falls_back_to_auto_when_configured_backend_fails(monkeypatch):
+    def create(name, **kwargs):
+        if name == "auto": return FileBackend(["hello"])
+        raise SpeechServiceError(f"{name} is not installed")
+    monkeypatch.setattr(robot, "SR_BACKEND_NAME", "vosk")
+    monkeypatch.setattr(robot, "create_speech_backend", create)
+    assert robot._load_speech_backend().recognize(AUDIO, SAMPLE_RATE, SAMPLE_WIDTH) == "hello"
@@ -0,0 +1,139 @@
+
+# tracing.py (Per-turn latency spans for the voice pipeline, exported as rotating JSONL)
+
+import collections
+import contextlib
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import socket
+import statistics
+import threading
+import time
+import uuid
+
+# --- Configuration Constants ---
+TRACE_FILE = "loki_trace.jsonl"
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+STAGE_SAMPLES = 1000 # Durations kept per stage for the p50/p95 summary
+PIPELINE_STAGES = ("capture", "recognition", "intent", "handler", "generation", "tts")
+
+_local = threading.local()
+
+class Turn:
+    """
+    One user turn (listen -> reply). Spans may be added from any thread: background tasks
+    and the TTS worker carry the turn along and finish their spans after the logic thread
+    has moved on.
+    """
+    def __init__(self, tracer, turn_id: str):
+        self.tracer = tracer
+        self.id = turn_id
+        self.started_at = time.monotonic()
+        self._span_ids = itertools.count(1)
+
+    def add_span(self, stage: str, start: float, end: float, status: str = "ok", **attrs):
+        """Records a span measured elsewhere (monotonic start/end seconds)."""
+        if start is None or end is None: return
+        self.tracer._record({"turn": self.id, "span": f"{self.id}.{next(self._span_ids)}", "stage": stage,
+                             "status": status, "offset_ms": round((start - self.started_at) * 1000.0, 2),
+                             "duration_ms": round((end - start) * 1000.0, 2), **attrs})
+
+    @contextlib.contextmanager
+    def span(self, stage: str, **attrs):
+        """Times the enclosed block; exceptions mark the span 'error' and propagate."""
+        start = time.monotonic(); status = "ok"
+        try: yield attrs # The block may add attributes
+        except BaseException:
+            status = "error"; raise
+        finally:
+            self.add_span(stage, start, time.monotonic(), status, **attrs)
+
+class _NullTurn:
+    """Stands in when no turn is active, so callers never have to check."""
+    id = None
+    def add_span(self, *args, **kwargs): pass
+    @contextlib.contextmanager
+    def span(self, stage: str, **attrs): yield attrs
+
+NULL_TURN = _NullTurn()
+
+class Tracer:
+    """
+    Hands out turns, writes every finished span as one JSON line to a size-rotated trace
+    file (so traces from many robots can be collected and compared), and keeps recent
+    durations per stage for summary().
+    """
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS,
+                 enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.host = os.environ.get("LOKI_ROBOT_ID") or socket.gethostname() # Tells robots apart in merged traces
+        self.durations = collections.defaultdict(lambda: collections.deque(maxlen=STAGE_SAMPLES))
+        self.errors = collections.Counter()
+        self._lock = threading.Lock()
+        self._logger = None
+        self._max_bytes, self._backups = max_bytes, backups
+
+    def _writer(self):
+        if self._logger is None:
+            logger = logging.getLogger(f"loki.trace.{id(self)}")
+            logger.propagate = False; logger.setLevel(logging.INFO)
+            try:
+                handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=self._max_bytes,
+                                                               backupCount=self._backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            except OSError as e:
+                print(f"Robot Warning: Could not open trace file '{self.path}': {e}")
+            self._logger = logger
+        return self._logger
+
+    def _record(self, span: dict):
+        with self._lock:
+            if span["status"] == "ok": self.durations[span["stage"]].append(span["duration_ms"])
+            else: self.errors[span["stage"]] += 1
+        if self.enabled:
+            span["host"] = self.host; span["at"] = round(time.time(), 3)
+            self._writer().info(json.dumps(span, default=str))
+
+    # --- Turns ---
+    def start_turn(self) -> Turn:
+        turn = Turn(self, uuid.uuid4().hex[:12])
+        _local.turn = turn
+        return turn
+
+    def current(self):
+        return getattr(_local, "turn", None) or NULL_TURN
+
+    @contextlib.contextmanager
+    def activate(self, turn):
+        """Makes turn current on this thread (background tasks, deferred answers)."""
+        previous = getattr(_local, "turn", None)
+        _local.turn = turn if turn is not NULL_TURN else None
+        try: yield turn
+        finally: _local.turn = previous
+
+    # --- Summary ---
+    def summary(self) -> dict:
+        """{stage: {"count", "p50_ms", "p95_ms", "errors"}} over recent spans, pipeline order first."""
+        with self._lock:
+            snapshot = {stage: sorted(values) for stage, values in self.durations.items()}
+            errors = dict(self.errors)
+        stages = [s for s in PIPELINE_STAGES if s in snapshot or s in errors]
+        stages += sorted(s for s in set(snapshot) | set(errors) if s not in stages)
+        out = {}
+        for stage in stages:
+            values = snapshot.get(stage, [])
+            out[stage] = {"count": len(values), "errors": errors.get(stage, 0)}
+            if values:
+                out[stage]["p50_ms"] = round(statistics.median(values), 1)
+                out[stage]["p95_ms"] = round(values[min(len(values) - 1, int(0.95 * len(values)))], 1)
+        return out
+
+    def close(self):
+        if self._logger:
+            for handler in list(self._logger.handlers): handler.close(); self._logger.removeHandler(handler)
@@ -0,0 +1,220 @@
+
+# tts_engine.py (Dedicated text-to-speech worker with a priority queue and barge-in)
+
+import re
+import threading
+import queue
+import itertools
+import collections
+import time
+
+# --- Priorities (lower is spoken first) ---
+PRIORITY_URGENT = 0 # Prompts that expect an answer, errors
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9 # Long informational text, e.g. Wikipedia summaries
+
+# --- Configuration Constants ---
+TTS_RATE = 180 # Slightly faster
+TTS_VOICE_INDEX = 1 # Typically female voice
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;:])\s+")
+ECHO_WORD_OVERLAP = 0.8 # Heard text this similar to what we're saying is our own voice
+
+def split_sentences(text: str):
+    """Sentence-level chunks so playback starts on the first one and can stop between them."""
+    return [s.strip() for s in SENTENCE_SPLIT_RE.split(text) if s.strip()]
+
+class Utterance:
+    """One speak() request. done_event is set once it has been spoken or cancelled."""
+    def __init__(self, text: str, priority: int, on_start=None, on_done=None):
+        self.text = text
+        self.priority = priority
+        self.chunks = split_sentences(text) if text else []
+        self.on_start = on_start
+        self.on_done = on_done # Called with completed=True/False
+        self.cancelled = False
+        self.done_event = threading.Event()
+        self.queued_at = time.monotonic()
+        self.first_audio_at = None
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.done_event.wait(timeout)
+
+def _init_pyttsx3_engine():
+    import pyttsx3
+    try: # SAPI5 needs COM initialised on the thread that owns the engine
+        import pythoncom; pythoncom.CoInitialize()
+    except ImportError: pass
+    engine = pyttsx3.init()
+    try:
+        engine.setProperty("rate", TTS_RATE)
+        voices = engine.getProperty('voices')
+        if voices and len(voices) > TTS_VOICE_INDEX:
+            engine.setProperty('voice', voices[TTS_VOICE_INDEX].id)
+        elif voices:
+            print("Robot Warning: Only one TTS voice found. Using default.")
+        else:
+            print("Robot CRITICAL Warning: No TTS voices found. Speech output will not work.")
+    except Exception as e:
+        print(f"Robot Warning: Error setting up TTS engine properties: {e}")
+    return engine
+
+class NullSpeechEngine:
+    """
+    pyttsx3-compatible sink that produces no audio, for headless runs and benchmarks.
+    With words_per_minute set, runAndWait() takes as long as speaking would (divided by speed).
+    """
+    def __init__(self, words_per_minute: float = None, speed: float = 1.0):
+        self.words_per_minute = words_per_minute
+        self.speed = speed
+        self.spoken = [] # (monotonic time, text) of every chunk "spoken"
+        self._pending = []
+        self._stop = threading.Event()
+        self.properties = {"rate": TTS_RATE, "voices": []}
+
+    def setProperty(self, name, value): self.properties[name] = value
+    def getProperty(self, name): return self.properties.get(name)
+    def endLoop(self): pass
+
+    def say(self, text: str):
+        self._pending.append(text)
+
+    def runAndWait(self):
+        self._stop.clear()
+        for text in self._pending:
+            self.spoken.append((time.monotonic(), text))
+            if self.words_per_minute:
+                self._stop.wait(len(text.split()) * 60.0 / self.words_per_minute / self.speed)
+        self._pending = []
+
+    def stop(self):
+        self._stop.set()
+
+class TTSWorker:
+    """
+    Owns the pyttsx3 engine on its own thread. say() returns immediately; utterances are
+    spoken in priority order, one sentence at a time, and interrupt() cancels what is
+    playing plus everything still queued (used for barge-in from listen()).
+    """
+    def __init__(self, engine_factory=_init_pyttsx3_engine):
+        self.engine_factory = engine_factory
+        self.engine = None
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._queued_priorities = collections.Counter() # priority -> utterances waiting in _queue (under _lock)
+        self._current = None
+        self._lock = threading.Lock()
+        self._idle = threading.Event(); self._idle.set()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TTSWorker", daemon=True)
+        self._ready = threading.Event()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(timeout=10.0) # Engine init can be slow on first use
+        return self
+
+    def stop(self):
+        self.interrupt()
+        self._stop_event.set()
+        self._queue.put((-1, next(self._seq), None)) # Wake the worker
+        if self._thread.is_alive(): self._thread.join(timeout=2.0)
+
+    # --- Producer side ---
+    def say(self, text: str, priority: int = PRIORITY_NORMAL, on_start=None, on_done=None) -> Utterance:
+        utterance = Utterance(text, priority, on_start, on_done)
+        with self._lock: # Same lock the worker holds when it decides it's idle
+            self._idle.clear()
+            self._queued_priorities[priority] += 1
+            self._queue.put((priority, next(self._seq), utterance))
+        return utterance
+
+    def _dequeued(self, utterance: Utterance): # Caller holds _lock
+        self._queued_priorities[utterance.priority] -= 1
+        if self._queued_priorities[utterance.priority] <= 0: del self._queued_priorities[utterance.priority]
+
+    def after_speech(self, callback, priority: int = None) -> Utterance:
+        """
+        Runs callback once everything queued before it has been spoken. By default it takes the
+        lowest priority queued right now, so it also waits for low-priority speech. A barge-in
+        that drops the queue runs it straight away instead of losing it (e.g. a GUI reset).
+        """
+        if priority is None:
+            with self._lock: priority = max(self._queued_priorities, default=PRIORITY_NORMAL)
+        return self.say("", priority, on_done=lambda completed: callback())
+
+    def interrupt(self):
+        """Barge-in: stop the current sentence and drop everything queued."""
+        dropped = []
+        while True:
+            try: _, _, utterance = self._queue.get_nowait()
+            except queue.Empty: break
+            if utterance is None: continue
+            with self._lock: self._dequeued(utterance)
+            if not utterance.cancelled: utterance.cancelled = True; dropped.append(utterance)
+        with self._lock:
+            current = self._current
+            if current is None and self._queue.empty(): self._idle.set()
+        if current is not None:
+            current.cancelled = True
+            try:
+                if self.engine: self.engine.stop()
+            except Exception as e: print(f"Robot TTS Error stopping speech: {e}")
+        for utterance in dropped: self._finish(utterance, completed=False)
+        return current is not None or bool(dropped)
+
+    def is_speaking(self) -> bool:
+        return not self._idle.is_set()
+
+    def wait_until_idle(self, timeout: float = None) -> bool:
+        return self._idle.wait(timeout)
+
+    def is_echo(self, heard: str) -> bool:
+        """True if heard text is mostly words the robot is currently saying (mic picked up our own voice)."""
+        with self._lock: current = self._current
+        if current is None or not heard: return False
+        heard_words = set(heard.lower().split())
+        spoken_words = set(re.sub(r"[^\w\s']", " ", current.text.lower()).split())
+        return len(heard_words & spoken_words) >= ECHO_WORD_OVERLAP * len(heard_words)
+
+    # --- Worker side ---
+    def _finish(self, utterance: Utterance, completed: bool):
+        if utterance.on_done:
+            try: utterance.on_done(completed)
+            except Exception as e: print(f"Robot TTS callback error: {e}")
+        utterance.done_event.set()
+
+    def _run(self):
+        try: self.engine = self.engine_factory()
+        except Exception as e: print(f"Robot TTS Error: Could not initialise speech engine: {e}")
+        self._ready.set()
+        while not self._stop_event.is_set():
+            _, _, utterance = self._queue.get()
+            if utterance is None: continue
+            with self._lock:
+                self._dequeued(utterance)
+                if utterance.cancelled: continue # Already finished by interrupt()
+                self._current = utterance
+            if utterance.on_start:
+                try: utterance.on_start()
+                except Exception as e: print(f"Robot TTS callback error: {e}")
+            for chunk in utterance.chunks:
+                if utterance.cancelled: break
+                if utterance.first_audio_at is None: utterance.first_audio_at = time.monotonic()
+                self._speak_chunk(chunk)
+            with self._lock:
+                self._current = None
+                if self._queue.empty(): self._idle.set()
+            self._finish(utterance, completed=not utterance.cancelled)
+
+    def _speak_chunk(self, chunk: str):
+        if self.engine is None:
+            print(f"Robot TTS Fallback (no engine): {chunk}"); return
+        try:
+            if getattr(self.engine, "_inLoop", False): # If stuck from a previous call
+                self.engine.endLoop()
+            self.engine.say(chunk)
+            self.engine.runAndWait()
+        except Exception as e:
+            print(f"Robot TTS Error: {e}")
+            # Fallback if TTS fails, at least print it
+            print(f"Robot TTS Fallback (Error was {e}): {chunk}")
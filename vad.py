@@ -0,0 +1,92 @@
+
+# vad.py (Frame-level voice activity detection and adaptive endpointing for phrase capture)
+
+import collections
+import statistics
+
+# --- Configuration Constants ---
+VAD_AGGRESSIVENESS = 2 # webrtcvad mode 0-3; higher rejects more noise
+VAD_FRAME_MS = 30 # webrtcvad accepts 10, 20 or 30 ms frames
+VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000) # Rates webrtcvad can classify directly
+SPEECH_FRAME_RATIO = 0.5 # A chunk is speech if at least this share of its frames are
+MIN_SPEECH_SEC = 0.15 # Shorter bursts (door knock, click) never reach the recognizer
+MIN_END_SILENCE_SEC = 0.35 # Trailing silence that ends a short command ("what time is it")
+MAX_END_SILENCE_SEC = 0.9 # Trailing silence allowed once the user is speaking at length
+LONG_UTTERANCE_SEC = 3.0 # Speech length at which the end-of-phrase wait reaches its maximum
+TRIM_PADDING_SEC = 0.1 # Silence kept around the speech so word edges are not clipped
+MAX_ZERO_CROSSING_RATE = 0.35 # Fallback classifier: hiss and fans cross zero far more often than voice
+
+def zero_crossing_rate(chunk: bytes, sample_width: int) -> float:
+    import numpy as np
+    samples = np.frombuffer(chunk, dtype={1: np.int8, 2: np.int16, 4: np.int32}[sample_width])
+    if len(samples) < 2: return 0.0
+    return float(np.count_nonzero(np.diff(np.signbit(samples)))) / (len(samples) - 1)
+
+class VoiceActivityDetector:
+    """
+    Classifies capture chunks as speech or not (webrtcvad when installed, an energy +
+    zero-crossing test otherwise) and decides when a phrase has ended: short commands end
+    after a short pause, longer utterances are given more room. Pass it to
+    AudioCaptureService.listen_phrase(vad=...); each finished utterance is recorded here.
+    """
+    def __init__(self, aggressiveness: int = VAD_AGGRESSIVENESS, min_speech_sec: float = MIN_SPEECH_SEC,
+                 min_end_silence_sec: float = MIN_END_SILENCE_SEC, max_end_silence_sec: float = MAX_END_SILENCE_SEC):
+        self.aggressiveness = aggressiveness
+        self.min_speech_sec = min_speech_sec
+        self.min_end_silence_sec = min_end_silence_sec
+        self.max_end_silence_sec = max_end_silence_sec
+        self.padding_sec = TRIM_PADDING_SEC
+        self.sample_rate = None
+        self.sample_width = None
+        self.energy_threshold = lambda: 0 # Set by configure(); the capture service's live threshold
+        self.engine = "energy"
+        self._webrtc = None
+        self.utterances = collections.deque(maxlen=200) # Recent per-utterance endpointing records
+        self.rejected_bursts = 0
+
+    def configure(self, sample_rate: int, sample_width: int, energy_threshold=None):
+        """Called by the capture service once the stream format is known."""
+        if energy_threshold is not None: self.energy_threshold = energy_threshold
+        if (sample_rate, sample_width) == (self.sample_rate, self.sample_width): return
+        self.sample_rate, self.sample_width = sample_rate, sample_width
+        self._webrtc = None; self.engine = "energy"
+        if sample_width == 2 and sample_rate in VAD_SAMPLE_RATES:
+            try:
+                import webrtcvad
+                self._webrtc = webrtcvad.Vad(self.aggressiveness); self.engine = "webrtcvad"
+            except ImportError:
+                pass
+        if self._webrtc is None:
+            print(f"Robot Log: VAD using energy + zero-crossing classifier ({sample_rate} Hz, {8 * sample_width}-bit).")
+
+    def is_speech(self, chunk: bytes, energy: float) -> bool:
+        if self._webrtc is not None:
+            frame_bytes = int(self.sample_rate * VAD_FRAME_MS / 1000) * self.sample_width
+            frames = [chunk[i:i + frame_bytes] for i in range(0, len(chunk) - frame_bytes + 1, frame_bytes)]
+            if frames:
+                voiced = sum(1 for frame in frames if self._webrtc.is_speech(frame, self.sample_rate))
+                return voiced >= SPEECH_FRAME_RATIO * len(frames)
+        if energy <= self.energy_threshold(): return False
+        return zero_crossing_rate(chunk, self.sample_width) <= MAX_ZERO_CROSSING_RATE
+
+    def end_silence_for(self, speech_sec: float) -> float:
+        """Trailing silence that ends the phrase, growing with how long the user has been talking."""
+        progress = min(1.0, speech_sec / LONG_UTTERANCE_SEC)
+        return self.min_end_silence_sec + (self.max_end_silence_sec - self.min_end_silence_sec) * progress
+
+    # --- Per-utterance metrics ---
+    def record(self, utterance: dict):
+        self.utterances.append(utterance)
+
+    def report(self) -> dict:
+        """Endpointing latency (last speech frame -> phrase handed back) and how much audio was trimmed."""
+        items = list(self.utterances)
+        if not items: return {"engine": self.engine, "utterances": 0, "rejected_bursts": self.rejected_bursts}
+        latencies = sorted(u["endpoint_latency_ms"] for u in items)
+        return {
+            "engine": self.engine, "utterances": len(items), "rejected_bursts": self.rejected_bursts,
+            "endpoint_latency_ms_p50": round(statistics.median(latencies), 1),
+            "endpoint_latency_ms_p95": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 1),
+            "speech_sec_total": round(sum(u["speech_sec"] for u in items), 2),
+            "trimmed_sec_total": round(sum(u["trimmed_sec"] for u in items), 2),
+        }
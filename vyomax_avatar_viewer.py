@@ -1,25 +1,160 @@
-
-class FaceRecognitionSystem:
-    def __init__(self, voice_ai_speak_func=None, gui_set_expression_func=None,
-                 gui_update_webcam_func=None, shutdown_event=None):
-        self.voice_ai_speak_func = voice_ai_speak_func
-        self.gui_set_expression_func = gui_set_expression_func
-        self.gui_update_webcam_func = gui_update_webcam_func
-        self.shutdown_event = shutdown_event if shutdown_event else threading.Event()
-
-        self.known_faces_dir = "src/known_faces"
-        self.log_file_path = "src/face_recognition_log.csv"
-
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.greeted_today = set()
-        self.last_greet_reset_date = date.today() # For daily reset of greetings
-        self.known_faces_lock = threading.Lock() # Lock for known_face_encodings and known_face_names
-
-        self.log_file = None
-        self.log_writer = None
-        self.video_capture = None # For the continuous recognition loop
-        self.camera_access_lock = threading.Lock() # To manage access between continuous loop and on-demand functions
-
-        self._load_known_faces()
-        self._open_log_file()
+
+import os
+import time
+import threading
+from datetime import date
+
+import cv2
+import face_recognition
+from face_cache import FaceEncodingCache
+from face_matcher import FaceMatcher
+from face_pipeline import detect_and_encode, StageStats
+from face_tracker import FaceTracker
+from preview_buffer import PreviewBuffer
+from recognition_log import RecognitionLogWriter
+
+class FaceRecognitionSystem:
+    def __init__(self, voice_ai_speak_func=None, gui_set_expression_func=None,
+                 gui_update_webcam_func=None, shutdown_event=None, log_format: str = "csv", profile_store=None):
+        self.voice_ai_speak_func = voice_ai_speak_func
+        self.gui_set_expression_func = gui_set_expression_func
+        self.gui_update_webcam_func = gui_update_webcam_func # Called once with self.preview when the camera opens
+        self.shutdown_event = shutdown_event if shutdown_event else threading.Event()
+        self.profile_store = profile_store # profile_store.ProfileStore: gallery faces map to users, sightings update last seen
+
+        self.known_faces_dir = "src/known_faces"
+        self.log_file_path = "src/face_recognition_log.rlog" if log_format == "compact" else "src/face_recognition_log.csv"
+        self.log_format = log_format
+        self.log_repeat_interval_sec = 300.0 # Someone already greeted today is logged again at most this often
+
+        self.known_face_encodings = []
+        self.known_face_names = []
+        self.greeted_today = set()
+        self.last_greet_reset_date = date.today() # For daily reset of greetings
+        self.last_logged_at = {} # name -> time of their last log entry today
+        self.unlogged_sightings = {} # name -> sightings skipped since then (written as "repeats")
+        self.known_faces_lock = threading.Lock() # Lock for known_face_encodings and known_face_names
+        self.face_matcher = FaceMatcher(tolerance=0.55) # Same matcher robot_dialogGPT.py uses
+
+        self.recognition_log = None
+        self.video_capture = None # For the continuous recognition loop
+        self.recognition_thread = None
+        self.tracking_enabled = True # Detect every N frames / on motion, track boxes in between
+        self.detect_scale = 0.25
+        self.preview = PreviewBuffer() # The GUI reads preview.latest() / preview.surface() at its own rate
+        self.stats = {"camera": StageStats(), "recognition": StageStats()} # Frames read / detection passes
+        self.camera_access_lock = threading.Lock() # To manage access between continuous loop and on-demand functions
+
+        self._load_known_faces()
+        self._open_log_file()
+
+    def _load_known_faces(self):
+        """Loads the gallery through the shared encoding cache and rebuilds the matcher."""
+        if not os.path.isdir(self.known_faces_dir):
+            print(f"FaceRecognitionSystem Warning: Known faces directory '{self.known_faces_dir}' not found.")
+            return
+        def encode(image_path):
+            encodings = face_recognition.face_encodings(face_recognition.load_image_file(image_path))
+            return encodings[0] if encodings else None
+        encoding_cache = FaceEncodingCache(self.known_faces_dir)
+        encodings, names = encoding_cache.sync(encode)
+        if self.profile_store:
+            self.profile_store.sync_faces((filename, entry["name"], entry["hash"]) for filename, entry in encoding_cache.entries.items()
+                                          if entry["encoding"] is not None)
+        with self.known_faces_lock:
+            self.known_face_encodings = encodings
+            self.known_face_names = names
+            self.face_matcher.set_gallery(encodings, names)
+        print(f"FaceRecognitionSystem: Loaded {len(names)} known faces.")
+
+    def match_faces(self, face_encodings):
+        """Nearest (name or None, distance) for each encoding, matched as one batch."""
+        return self.face_matcher.match_batch(face_encodings)
+
+    def _open_log_file(self):
+        """Events go through a writer thread (batched, rotated daily or at 5 MB); the camera loop never touches the disk."""
+        self.recognition_log = RecognitionLogWriter(self.log_file_path, self.log_format)
+
+    # --- Continuous recognition loop ---
+    def start_continuous_recognition(self, camera_index: int = 0):
+        if self.recognition_thread and self.recognition_thread.is_alive(): return
+        self.recognition_thread = threading.Thread(target=self._continuous_recognition_loop, args=(camera_index,),
+                                                   name="FaceRecognitionLoop", daemon=True)
+        self.recognition_thread.start()
+
+    def _continuous_recognition_loop(self, camera_index: int):
+        with self.camera_access_lock:
+            self.video_capture = cv2.VideoCapture(camera_index)
+            if not self.video_capture.isOpened(): # Don't leave a dead capture behind for other methods
+                self.video_capture.release(); self.video_capture = None
+                print("FaceRecognitionSystem Error: Could not open camera for continuous recognition.")
+                return
+        tracker = FaceTracker() if self.tracking_enabled else None
+        if self.gui_update_webcam_func: self.gui_update_webcam_func(self.preview)
+        try:
+            while not self.shutdown_event.is_set():
+                with self.camera_access_lock:
+                    ret, frame = self.video_capture.read()
+                if not ret: print("FaceRecognitionSystem Warning: Camera frame grab failed."); break
+                self.stats["camera"].tick()
+                rgb_small_frame = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=self.detect_scale, fy=self.detect_scale),
+                                               cv2.COLOR_BGR2RGB)
+                if tracker is None or tracker.needs_detection(rgb_small_frame):
+                    skip_boxes = tracker.identified_boxes() if tracker else None
+                    locations, encodings = detect_and_encode(rgb_small_frame, "hog", skip_boxes)
+                    self.stats["recognition"].tick()
+                    if tracker:
+                        to_identify = tracker.apply_detections(rgb_small_frame, locations, encodings)
+                    else:
+                        to_identify = [(None, e) for e in encodings if e is not None]
+                    matches = self.match_faces([e for _, e in to_identify])
+                    for (track_id, _), (name, distance) in zip(to_identify, matches):
+                        if not name: continue
+                        if tracker: tracker.set_identity(track_id, name, distance)
+                        self._on_face_recognized(name, distance)
+                    boxes = [box for _, box, _ in tracker.snapshot()] if tracker else locations
+                else:
+                    boxes = [box for _, box, _ in tracker.follow(rgb_small_frame)]
+                self.preview.publish(frame, boxes, self.detect_scale) # Boxes drawn on the preview, not the full frame
+        finally:
+            with self.camera_access_lock:
+                self.video_capture.release(); self.video_capture = None
+            if tracker: print(f"FaceRecognitionSystem: Encodes per frame {tracker.encode_ratio():.3f} "
+                              f"({tracker.stats['detections']} detections over {tracker.stats['frames']} frames).")
+            print(f"FaceRecognitionSystem: Rates {self.report()}")
+
+    def _on_face_recognized(self, name: str, distance: float):
+        if date.today() != self.last_greet_reset_date: # New day, greet (and log) everyone again
+            self.greeted_today.clear(); self.last_greet_reset_date = date.today()
+            self.last_logged_at.clear(); self.unlogged_sightings.clear()
+        self._log_recognition(name, distance)
+        if self.profile_store: self.profile_store.touch(name) # Cache update only; written behind
+        if name in self.greeted_today: return
+        self.greeted_today.add(name)
+        if self.gui_set_expression_func: self.gui_set_expression_func("happy")
+        if self.voice_ai_speak_func: self.voice_ai_speak_func(f"Hello {name}!")
+
+    def _log_recognition(self, name: str, distance: float):
+        """First sighting of the day is always logged; after that, one entry per log_repeat_interval_sec carrying the skipped count."""
+        now = time.time()
+        first_today = name not in self.greeted_today
+        if not first_today and now - self.last_logged_at.get(name, 0.0) < self.log_repeat_interval_sec:
+            self.unlogged_sightings[name] = self.unlogged_sightings.get(name, 0) + 1; return
+        if self.recognition_log:
+            self.recognition_log.log(name, distance, "greeted" if first_today else "seen",
+                                     self.unlogged_sightings.pop(name, 0), timestamp=now)
+        self.last_logged_at[name] = now
+
+    def report(self) -> dict:
+        """Camera and recognition rates, and the preview's own published/displayed rates."""
+        return {"camera_fps": round(self.stats["camera"].fps(), 1), "recognition_fps": round(self.stats["recognition"].fps(), 1),
+                "frames": self.stats["camera"].total, "detections": self.stats["recognition"].total,
+                "preview": self.preview.report()}
+
+    def stop(self):
+        """Stops the camera loop and writes out any pending log entries."""
+        self.shutdown_event.set()
+        if self.recognition_thread: self.recognition_thread.join(timeout=3.0)
+        if self.recognition_log:
+            self.recognition_log.close()
+            print(f"FaceRecognitionSystem: Recognition log {self.recognition_log.report()}")
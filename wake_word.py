@@ -0,0 +1,283 @@
+
+# wake_word.py (Always-on "Loki" keyword spotter that gates full speech recognition)
+
+import os
+import json
+import time
+import wave
+import collections
+
+# --- Configuration Constants ---
+WAKE_WORD = "loki"
+WAKE_SENSITIVITY = 0.5 # 0 = hardest to trigger (fewest false accepts), 1 = easiest (fewest misses)
+WAKE_TEMPLATES_DIR = "wake_word/" # WAV recordings of someone saying the wake word (template spotter)
+VOSK_MODEL_PATH = os.environ.get("LOKI_VOSK_MODEL", "models/vosk-model-small-en-us-0.15")
+WAKE_PREFIXES = ("hey", "hi", "ok", "okay") # Dropped along with the wake word from the transcript
+# Template spotter (MFCC + subsequence DTW, numpy only)
+FRAME_SEC = 0.025
+HOP_SEC = 0.010
+N_FFT = 512
+N_MELS = 26
+N_CEPS = 13 # c0 (loudness) is dropped before matching
+MEL_FLOOR_DB = 30.0 # Mel energies more than this far below the loudest band are floored (background noise)
+TRIM_RATIO = 0.05 # Template edges quieter than this share of the peak level are trimmed
+EVAL_INTERVAL_SEC = 0.15 # Re-score the voiced segment this often while someone is talking
+MAX_SEGMENT_SEC = 2.0 # Only the most recent voiced audio is searched for the wake word
+DEFAULT_REFERENCE_DISTANCE = 5.0 # Used when there is only one template to calibrate against
+# Accept if best distance < reference * (ACCEPT_BASE + ACCEPT_RANGE * sensitivity)
+ACCEPT_BASE = 0.75
+ACCEPT_RANGE = 0.35
+PARTIAL_TRIGGER_SENSITIVITY = 0.8 # Vosk spotter: at or above this, trigger on partial results (faster, less sure)
+
+def strip_wake_word(text: str, keyword: str = WAKE_WORD) -> str:
+    """'hey loki what time is it' -> 'what time is it'."""
+    words = text.split()
+    for i, word in enumerate(words[:3]):
+        if word.strip(",.!?").lower() == keyword and all(w.strip(",.!?").lower() in WAKE_PREFIXES for w in words[:i]):
+            return " ".join(words[i + 1:]).lstrip(",.!? ")
+    return text
+
+def load_wav_samples(path: str):
+    """(float64 mono samples, sample_rate) of a 16-bit WAV file."""
+    import numpy as np
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2: raise ValueError(f"{path}: only 16-bit WAV files are supported")
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).astype(np.float64)
+        if w.getnchannels() > 1: samples = samples.reshape(-1, w.getnchannels()).mean(axis=1)
+        return samples, w.getframerate()
+
+def _resample(samples, from_rate: int, to_rate: int):
+    import numpy as np
+    if from_rate == to_rate: return samples
+    positions = np.arange(0, len(samples), from_rate / to_rate)
+    return np.interp(positions, np.arange(len(samples)), samples)
+
+# --- Features ---
+_MEL_BANKS = {}
+
+def _mel_filterbank(sample_rate: int):
+    import numpy as np
+    if sample_rate not in _MEL_BANKS:
+        def hz_to_mel(hz): return 2595.0 * np.log10(1.0 + hz / 700.0)
+        def mel_to_hz(mel): return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+        edges = mel_to_hz(np.linspace(hz_to_mel(60.0), hz_to_mel(min(4000.0, sample_rate / 2)), N_MELS + 2))
+        bins = np.floor((N_FFT + 1) * edges / sample_rate).astype(int)
+        bank = np.zeros((N_MELS, N_FFT // 2 + 1))
+        for m in range(1, N_MELS + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            if center > left: bank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center: bank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+        n = np.arange(N_MELS)
+        dct = np.cos(np.pi / N_MELS * (n + 0.5)[None, :] * np.arange(N_CEPS)[:, None]) # DCT-II basis
+        _MEL_BANKS[sample_rate] = (bank, dct)
+    return _MEL_BANKS[sample_rate]
+
+def trim_silence(samples, sample_rate: int):
+    """Cuts leading/trailing audio quieter than TRIM_RATIO of the peak 10 ms level."""
+    import numpy as np
+    hop = int(HOP_SEC * sample_rate)
+    levels = np.array([np.sqrt(np.mean(samples[i:i + hop] ** 2)) for i in range(0, len(samples) - hop + 1, hop)])
+    if not len(levels): return samples
+    loud = np.nonzero(levels > TRIM_RATIO * levels.max())[0]
+    return samples[loud[0] * hop:(loud[-1] + 1) * hop]
+
+def mfcc(samples, sample_rate: int):
+    """
+    (frames, N_CEPS - 1) MFCCs without c0; empty if the audio is shorter than a frame. No
+    cepstral mean subtraction: templates and live audio come through the same microphone, and
+    the mean of a short word differs too much from that of a longer sentence containing it.
+    """
+    import numpy as np
+    frame, hop = int(FRAME_SEC * sample_rate), int(HOP_SEC * sample_rate)
+    if len(samples) < frame: return np.zeros((0, N_CEPS - 1))
+    count = 1 + (len(samples) - frame) // hop
+    idx = np.arange(frame)[None, :] + hop * np.arange(count)[:, None]
+    frames = samples[idx] * np.hamming(frame)
+    power = np.abs(np.fft.rfft(frames, N_FFT)) ** 2
+    bank, dct = _mel_filterbank(sample_rate)
+    mel = power @ bank.T
+    ceps = np.log(mel + mel.max() * 10 ** (-MEL_FLOOR_DB / 10.0) + 1e-6) @ dct.T
+    return ceps[:, 1:]
+
+def subsequence_dtw(template, query) -> float:
+    """
+    Lowest average frame distance of the template aligned against any stretch of query (start
+    and end free, query up to 2x faster or slower). Each row is one vector op, so a ~0.5 s
+    template against 2 s of audio is well under a millisecond.
+    """
+    import numpy as np
+    if len(template) == 0 or len(query) == 0: return float("inf")
+    cost = np.sqrt(((template[:, None, :] - query[None, :, :]) ** 2).sum(axis=2))
+    acc = cost[0].copy()
+    for i in range(1, len(template)):
+        prev = acc
+        best = prev.copy() # Query frame repeats (template slower)
+        best[1:] = np.minimum(best[1:], prev[:-1]) # Diagonal
+        best[2:] = np.minimum(best[2:], prev[:-2]) # Skip a query frame (template faster)
+        acc = cost[i] + best
+    return float(acc.min() / len(template))
+
+# --- Spotters ---
+class WakeWordSpotter:
+    """
+    feed(chunk, speech) -> True when the wake word has just been heard. Only voiced chunks
+    (plus a short hangover) reach the actual detector, so silence costs one comparison.
+    Call configure() with the stream format first; report() has the trigger count and the
+    CPU spent detecting versus audio seen.
+    """
+    name = "base"
+    hangover_sec = 0.3
+
+    def __init__(self, keyword: str = WAKE_WORD, sensitivity: float = WAKE_SENSITIVITY):
+        self.keyword = keyword.lower()
+        self.sensitivity = min(1.0, max(0.0, sensitivity))
+        self.sample_rate = None
+        self.sample_width = None
+        self.stats = {"chunks": 0, "voiced_chunks": 0, "triggers": 0, "audio_sec": 0.0, "detector_cpu_sec": 0.0,
+                      "idle_wall_sec": 0.0, "idle_process_cpu_sec": 0.0}
+        self._hangover = 0.0
+
+    def configure(self, sample_rate: int, sample_width: int):
+        if (sample_rate, sample_width) != (self.sample_rate, self.sample_width):
+            self.sample_rate, self.sample_width = sample_rate, sample_width
+            self._configure()
+
+    def feed(self, chunk: bytes, speech: bool) -> bool:
+        seconds = len(chunk) / (self.sample_width * self.sample_rate)
+        self.stats["chunks"] += 1; self.stats["audio_sec"] += seconds
+        if speech: self._hangover = self.hangover_sec
+        elif self._hangover <= 0: return False
+        else: self._hangover -= seconds
+        self.stats["voiced_chunks"] += 1
+        started = time.thread_time()
+        try: triggered = self._process(chunk, speech)
+        finally: self.stats["detector_cpu_sec"] += time.thread_time() - started
+        if triggered:
+            self.stats["triggers"] += 1; self.reset()
+        return triggered
+
+    def note_idle(self, wall_sec: float, process_cpu_sec: float):
+        """Time spent waiting for the wake word, and the whole process's CPU over it."""
+        self.stats["idle_wall_sec"] += wall_sec; self.stats["idle_process_cpu_sec"] += process_cpu_sec
+
+    def reset(self):
+        self._hangover = 0.0
+
+    def report(self) -> dict:
+        s = self.stats
+        return {"spotter": self.name, "sensitivity": self.sensitivity, "triggers": s["triggers"],
+                "audio_sec": round(s["audio_sec"], 1), "voiced_share": round(s["voiced_chunks"] / s["chunks"], 3) if s["chunks"] else 0.0,
+                "detector_cpu_per_audio_sec_ms": round(1000.0 * s["detector_cpu_sec"] / s["audio_sec"], 3) if s["audio_sec"] else 0.0,
+                "idle_process_cpu_percent": round(100.0 * s["idle_process_cpu_sec"] / s["idle_wall_sec"], 2) if s["idle_wall_sec"] else None}
+
+    def _configure(self): pass
+    def _process(self, chunk: bytes, speech: bool) -> bool: raise NotImplementedError
+
+class TemplateWakeWord(WakeWordSpotter):
+    """
+    Matches recent voiced audio against a few recordings of the wake word (MFCC features,
+    subsequence DTW). Needs only numpy. The accept threshold is calibrated from how far the
+    templates are from each other, scaled by sensitivity.
+    """
+    name = "template"
+
+    def __init__(self, templates, keyword: str = WAKE_WORD, sensitivity: float = WAKE_SENSITIVITY):
+        """templates: [(float samples, sample_rate)], e.g. from load_templates()."""
+        super().__init__(keyword, sensitivity)
+        if not templates: raise ValueError("TemplateWakeWord needs at least one wake word recording")
+        self.templates = templates
+        self.features = []
+        self.reference_distance = DEFAULT_REFERENCE_DISTANCE
+        self.last_distance = None
+        self._buffer = collections.deque()
+        self._buffered = 0
+        self._since_eval = 0
+
+    @property
+    def threshold(self) -> float:
+        return self.reference_distance * (ACCEPT_BASE + ACCEPT_RANGE * self.sensitivity)
+
+    def _configure(self):
+        self.features = [mfcc(trim_silence(_resample(samples, rate, self.sample_rate), self.sample_rate), self.sample_rate)
+                         for samples, rate in self.templates]
+        self.features = [f for f in self.features if len(f)]
+        pairs = [subsequence_dtw(a, b) for i, a in enumerate(self.features) for b in self.features[i + 1:]]
+        pairs += [subsequence_dtw(b, a) for i, a in enumerate(self.features) for b in self.features[i + 1:]]
+        if pairs: self.reference_distance = max(sorted(pairs)[len(pairs) // 2], 1e-3)
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self._buffer.clear(); self._buffered = 0; self._since_eval = 0
+
+    def _process(self, chunk: bytes, speech: bool) -> bool:
+        import numpy as np
+        samples = np.frombuffer(chunk, dtype={1: np.int8, 2: np.int16, 4: np.int32}[self.sample_width]).astype(np.float64)
+        self._buffer.append(samples); self._buffered += len(samples); self._since_eval += len(samples)
+        limit = int(MAX_SEGMENT_SEC * self.sample_rate)
+        while self._buffered - len(self._buffer[0]) >= limit: self._buffered -= len(self._buffer.popleft())
+        segment_ending = not speech and self._hangover <= 0
+        if self._since_eval < EVAL_INTERVAL_SEC * self.sample_rate and not segment_ending: return False
+        self._since_eval = 0
+        query = mfcc(np.concatenate(self._buffer), self.sample_rate)
+        self.last_distance = min(subsequence_dtw(template, query) for template in self.features)
+        if segment_ending: self._buffer.clear(); self._buffered = 0
+        return self.last_distance < self.threshold
+
+class VoskWakeWord(WakeWordSpotter):
+    """
+    Vosk restricted to a two-entry grammar (the wake word or [unk]), which is far cheaper than
+    open recognition. Final results are accepted when the word confidence clears
+    1 - sensitivity; very high sensitivities also accept partial results.
+    """
+    name = "vosk"
+    hangover_sec = 0.6 # Vosk needs some trailing silence to close a segment
+
+    def __init__(self, keyword: str = WAKE_WORD, sensitivity: float = WAKE_SENSITIVITY, model_path: str = VOSK_MODEL_PATH):
+        super().__init__(keyword, sensitivity)
+        import vosk # ImportError if not installed
+        if not os.path.isdir(model_path): raise FileNotFoundError(f"Vosk model not found at '{model_path}'")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+        self.recognizer = None
+
+    def _configure(self):
+        self.recognizer = self._vosk.KaldiRecognizer(self.model, self.sample_rate, json.dumps([self.keyword, "[unk]"]))
+        self.recognizer.SetWords(True)
+
+    def reset(self):
+        super().reset()
+        if self.recognizer is not None: self.recognizer.Reset()
+
+    def _process(self, chunk: bytes, speech: bool) -> bool:
+        if self.recognizer.AcceptWaveform(chunk):
+            words = json.loads(self.recognizer.Result()).get("result", [])
+            return any(w.get("word") == self.keyword and w.get("conf", 0.0) >= 1.0 - self.sensitivity for w in words)
+        if self.sensitivity >= PARTIAL_TRIGGER_SENSITIVITY:
+            return self.keyword in json.loads(self.recognizer.PartialResult()).get("partial", "").split()
+        return False
+
+def load_templates(templates_dir: str = WAKE_TEMPLATES_DIR):
+    """[(samples, sample_rate)] for every .wav in templates_dir (empty if the directory is missing)."""
+    if not os.path.isdir(templates_dir): return []
+    return [load_wav_samples(os.path.join(templates_dir, name)) for name in sorted(os.listdir(templates_dir))
+            if name.lower().endswith(".wav")]
+
+def create_wake_word(kind: str = "auto", keyword: str = WAKE_WORD, sensitivity: float = WAKE_SENSITIVITY,
+                     templates_dir: str = WAKE_TEMPLATES_DIR):
+    """
+    "template", "vosk", or "auto" (templates if recordings exist, else Vosk if a model is
+    installed). Returns None, with a warning, if nothing usable is available.
+    """
+    if kind in ("auto", "template"):
+        templates = load_templates(templates_dir)
+        if templates: return TemplateWakeWord(templates, keyword, sensitivity)
+        if kind == "template":
+            print(f"Robot Warning: No wake word recordings (*.wav) in '{templates_dir}'."); return None
+    if kind in ("auto", "vosk"):
+        try: return VoskWakeWord(keyword, sensitivity)
+        except (ImportError, FileNotFoundError) as e:
+            print(f"Robot Warning: Vosk wake word spotter unavailable: {e}")
+            return None
+    raise ValueError(f"Unknown wake word spotter '{kind}'. Choose auto, template or vosk.")